@@ -0,0 +1,232 @@
+"""
+Multi-Source Agreement Matrix
+
+analysis.py and compare_to_llm.py compare one pair of label sources per
+run.  This script loads any number of sources for a dataset once (human,
+GPT-5.2, GPT-OSS, the S-BERT baseline, ...), keeps the transcripts present
+in all of them, and computes every pairwise metric in one pass with the
+metrics.py kernel:
+
+    START F1, END F1         exact line match of start / end markers
+    SEGMENT F1, SEGMENT IoU  line-level segment membership (analysis.py's toggle)
+    Kappa                    Cohen's kappa on segment membership
+    Pk, WinDiff              mean over transcripts (compare_to_llm.py's k)
+
+plus Krippendorff's alpha across all sources for start, end and segment
+membership.  F1, IoU and kappa are pooled over all rows of the dataset.
+In every matrix the row source is the reference and the column source the
+prediction (only Pk and WinDiff are asymmetric).
+
+A source is a directory of 4-column labeled CSVs (in/out/ambiguous, start,
+end, Transcript); files are aligned by transcript name with the
+_labeled / _joined / _segmented suffixes removed.  With no --source, each
+dataset folder under data/ contributes all its subfolders except the
+*-compare-* ones.  One matrix CSV per dataset is written to
+agreement-out/<dataset>.csv.
+
+Usage:
+    python agreement.py [DATASET_DIR ...] [--source NAME=DIR ...]
+                        [--output-dir DIR]
+"""
+
+import os
+import csv
+import glob
+import time
+import argparse
+
+import numpy as np
+
+from metrics import (cohen_kappa, flags, krippendorff_alpha, pairwise_confusion, pk_windiff_matrix,
+                     rates, segment_membership)
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(SCRIPT_DIR, "..", "data")
+OUTPUT_DIR = os.path.join(SCRIPT_DIR, "agreement-out")
+
+SUFFIXES = ('_labeled', '_joined', '_segmented')
+MATRICES = ('start_f1', 'end_f1', 'segment_f1', 'segment_iou', 'kappa', 'pk', 'windiff')
+
+
+def transcript_name(path):
+    """File name without extension and pipeline suffix (dyad04_labeled.csv -> dyad04)."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    for suffix in SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def load_source(directory):
+    """{transcript: (starts, ends)} flag arrays for every CSV in a directory."""
+    labels = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.csv"))):
+        with open(path, 'r', encoding='utf-8') as file:
+            rows = [r for r in list(csv.reader(file))[1:] if len(r) >= 3]
+        labels[transcript_name(path)] = (flags([r[1] for r in rows], ignore_case=True),
+                                         flags([r[2] for r in rows], ignore_case=True))
+    return labels
+
+
+def dataset_sources(dataset_dir):
+    """[(source name, directory)] of a data/<dataset>/ folder, compare folders excluded.
+
+    The dataset prefix is dropped from the names (siblings-gpt-5.2 -> gpt-5.2).
+    """
+    dataset = os.path.basename(os.path.normpath(dataset_dir))
+    sources = []
+    for directory in sorted(glob.glob(os.path.join(dataset_dir, "*"))):
+        name = os.path.basename(directory)
+        if not os.path.isdir(directory) or '-compare-' in name:
+            continue
+        sources.append((name[len(dataset) + 1:] if name.startswith(dataset + '-') else name, directory))
+    return sources
+
+
+def align(loaded):
+    """Stack the transcripts every source has, with equal row counts.
+
+    Returns:
+        (transcripts, starts, ends, lengths) — starts / ends are (S, N)
+        over the concatenated rows, lengths the rows per transcript.
+    """
+    shared = sorted(set.intersection(*(set(labels) for labels in loaded)))
+    transcripts, starts, ends, lengths = [], [], [], []
+    for name in shared:
+        sizes = {len(labels[name][0]) for labels in loaded}
+        if len(sizes) != 1:
+            print(f"  Skipping {name}: sources have different row counts {sorted(sizes)}")
+            continue
+        transcripts.append(name)
+        starts.append(np.stack([labels[name][0] for labels in loaded]))
+        ends.append(np.stack([labels[name][1] for labels in loaded]))
+        lengths.append(sizes.pop())
+    if not transcripts:
+        empty = np.zeros((len(loaded), 0), dtype=bool)
+        return [], empty, empty, np.zeros(0, dtype=int)
+    return transcripts, np.concatenate(starts, axis=1), np.concatenate(ends, axis=1), np.array(lengths)
+
+
+def agreement(starts, ends, lengths):
+    """All pairwise matrices and the Krippendorff alphas for aligned sources.
+
+    Returns:
+        ({metric: (S, S) array for metric in MATRICES}, {family: alpha})
+    """
+    segment = segment_membership(starts, ends, lengths)
+    matrices = {}
+    for family, x in (('start', starts), ('end', ends), ('segment', segment)):
+        counts = pairwise_confusion(x)
+        family_rates = rates(counts['tp'], counts['tn'], counts['fp'], counts['fn'])
+        matrices[f"{family}_f1"] = family_rates['f1']
+        if family == 'segment':
+            matrices['segment_iou'] = family_rates['iou']
+            matrices['kappa'] = cohen_kappa(counts['tp'], counts['tn'], counts['fp'], counts['fn'])
+
+    # Pk / WinDiff per transcript (start rows, first-row "boundary" dropped),
+    # then averaged over the transcripts where the reference has boundaries
+    sources = len(starts)
+    pk_sum, wd_sum, defined = np.zeros((sources, sources)), np.zeros((sources, sources)), np.zeros((sources, 1))
+    bounds = np.concatenate(([0], np.cumsum(lengths)))
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        boundaries = starts[:, lo:hi].astype(np.int64)
+        boundaries[:, 0] = 0
+        pk_m, wd_m = pk_windiff_matrix(boundaries)
+        valid = ~np.isnan(pk_m[:, :1])
+        pk_sum += np.where(valid, pk_m, 0)
+        wd_sum += np.where(valid, wd_m, 0)
+        defined += valid
+    with np.errstate(invalid='ignore', divide='ignore'):
+        matrices['pk'] = np.where(defined > 0, pk_sum / defined, np.nan)
+        matrices['windiff'] = np.where(defined > 0, wd_sum / defined, np.nan)
+
+    alphas = {family: krippendorff_alpha(x) for family, x in
+              (('start', starts), ('end', ends), ('segment', segment))}
+    return matrices, alphas
+
+
+def write_matrices(path, names, matrices, alphas):
+    """One CSV: a block of rows per metric (metric, reference, one column per prediction)."""
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['metric', 'reference', *names])
+        for metric in MATRICES:
+            for name, row in zip(names, matrices[metric]):
+                writer.writerow([metric, name, *(f"{v:.6f}" for v in row)])
+        for family, alpha in alphas.items():
+            writer.writerow([f"krippendorff_alpha_{family}", 'all', f"{alpha:.6f}"])
+
+
+def _print_matrix(metric, names, matrix):
+    width = max(9, *(len(n) + 1 for n in names))
+    print(f"\n  {metric.upper()} (row = reference)")
+    print(f"  {'':<{width}}" + "".join(f"{n:>{width}}" for n in names))
+    for name, row in zip(names, matrix):
+        print(f"  {name:<{width}}" + "".join(f"{v:>{width}.4f}" for v in row))
+
+
+def build_parser():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("dataset_dirs", nargs='*', metavar="DATASET_DIR",
+                   help="Dataset folders whose subfolders are sources (default: every folder under data/).")
+    p.add_argument("--source", action='append', default=[], metavar="NAME=DIR",
+                   help="Add a source (repeatable).  With no DATASET_DIR, the given sources form one "
+                        "dataset named 'sources'.")
+    p.add_argument("--output-dir", default=OUTPUT_DIR,
+                   help="Where to write <dataset>.csv (default: agreement-out/).")
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    extra = []
+    for spec in args.source:
+        name, sep, directory = spec.partition('=')
+        if not sep:
+            raise SystemExit(f"--source expects NAME=DIR, got {spec!r}")
+        extra.append((name, directory))
+
+    if args.dataset_dirs:
+        datasets = [(os.path.basename(os.path.normpath(d)), dataset_sources(d) + extra) for d in args.dataset_dirs]
+    elif extra:
+        datasets = [('sources', extra)]
+    else:
+        datasets = [(os.path.basename(d), dataset_sources(d))
+                    for d in sorted(glob.glob(os.path.join(DATA_DIR, "*"))) if os.path.isdir(d)]
+    if not datasets:
+        print(f"No datasets found under {DATA_DIR}/")
+        return
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    for dataset, sources in datasets:
+        print(f"\n{'='*80}")
+        print(f"{dataset}: {len(sources)} source(s)")
+        print(f"{'='*80}")
+        if len(sources) < 2:
+            print("  Need at least two sources; skipping")
+            continue
+        for name, directory in sources:
+            print(f"  {name:<20} {directory}")
+
+        started = time.perf_counter()
+        names = [name for name, _ in sources]
+        transcripts, starts, ends, lengths = align([load_source(directory) for _, directory in sources])
+        if not transcripts:
+            print("  No transcripts shared by all sources; skipping")
+            continue
+        matrices, alphas = agreement(starts, ends, lengths)
+        elapsed = time.perf_counter() - started
+
+        print(f"  {len(transcripts)} shared transcript(s), {int(lengths.sum())} rows, {elapsed:.2f} s")
+        for metric in MATRICES:
+            _print_matrix(metric, names, matrices[metric])
+        print("\n  Krippendorff's alpha (all sources): "
+              + ", ".join(f"{family} {alpha:.4f}" for family, alpha in alphas.items()))
+
+        path = os.path.join(args.output_dir, f"{dataset}.csv")
+        write_matrices(path, names, matrices, alphas)
+        print(f"  Matrix written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,15 +9,22 @@ For each transcript, this script:
        or joined-out/).
     2. Merges them into a single comparison CSV (labeled-compare/) with
        side-by-side start/end columns and derived segment membership columns.
-    3. Computes three families of metrics:
+       Both inputs are streamed in lockstep and the comparison CSV is
+       written once, after membership is derived; --metrics-only skips it.
+    3. Computes three families of metrics (with the shared NumPy kernel in
+       metrics.py):
        a) START detection  — line-level exact match of start=TRUE markers
        b) END detection    — line-level exact match of end=TRUE markers
        c) SEGMENT overlap  — line-level agreement on whether each line falls
           inside any story segment, plus Intersection-over-Union (IoU)
+       d) BOUNDARY TOLERANCE — START/END precision, recall and F1 when a
+          boundary within ±k lines counts (metrics.TOLERANCES), both as a
+          window ("some human boundary is near") and as an optimal
+          one-to-one matching; k = 0 matched equals the exact numbers.
 
-    Segment membership is determined by a toggle: a line is "inside" a story
-    from the row where start=TRUE through the row where end=TRUE (inclusive
-    of both endpoints).
+    Segment membership is determined by a toggle (metrics.segment_membership):
+    a line is "inside" a story from the row where start=TRUE through the row
+    where end=TRUE (inclusive of both endpoints).
 
 Metrics computed:
     - True Positives (TP), True Negatives (TN), False Positives (FP),
@@ -25,17 +32,43 @@ Metrics computed:
     - Accuracy, Precision, Recall, F1 score
     - IoU (Intersection over Union) for segment overlap
 
+Transcripts are analyzed on a process pool.  Per-transcript metrics are
+cached in analysis-cache.json, keyed by the content hashes of the human and
+LLM files, so a rerun only recomputes pairs whose files changed.  Each entry
+also records the hash of the comparison CSV it wrote, and a pair is
+recomputed when that CSV is missing or no longer matches (e.g. another
+--llm-dir was compared into the same --compare-dir since).  The
+per-file and overall metrics are also written to analysis-summary.json
+(or a .csv given with --summary) next to the console tables.
+
+--shard-out writes the run's totals as a metrics.MetricsAccumulator (JSON);
+reduce_metrics.py merges any number of them, from runs over disjoint sets
+of transcripts, into the report a single run over all of them prints.
+
 Output CSV columns (labeled-compare/*_compare.csv):
     in/out/ambiguous, start_human, start_llm, end_human, end_llm,
     Transcript, story_seg_human, story_seg_llm, intersection, union
 
 Usage:
-    python analysis.py
+    python analysis.py [--metrics-only] [--human-dir DIR] [--llm-dir DIR]
+                       [--compare-dir DIR] [--jobs N] [--no-cache]
+                       [--summary PATH] [--shard-out PATH]
 """
 
 import csv
 import os
 import glob
+import io
+import json
+import hashlib
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from metrics import (COUNT_KEYS, TOLERANCES, MetricsAccumulator, compare_labels, family_metrics, pk_windiff,
+                     tolerance_counts, tolerance_rates)
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -43,188 +76,90 @@ HUMAN_LABELED_DIR = os.path.join(SCRIPT_DIR, "to-label")
 LLM_LABELED_DIR = os.path.join(SCRIPT_DIR, "labeled-out")
 COMPARE_DIR = os.path.join(SCRIPT_DIR, "labeled-compare")
 
+# Per-transcript metrics, keyed by the content hashes of the human and LLM
+# files, so unchanged pairs are not recomputed on the next run.
+CACHE_PATH = os.path.join(SCRIPT_DIR, "analysis-cache.json")
+CACHE_VERSION = 4
+
+# Machine-readable copy of the per-file and overall metrics (.json or .csv).
+SUMMARY_PATH = os.path.join(SCRIPT_DIR, "analysis-summary.json")
+
 
-def analyze_transcript(human_path, llm_path, compare_path):
+COMPARE_HEADER = ['in/out/ambiguous', 'start_human', 'start_llm', 'end_human', 'end_llm', 'Transcript',
+                  'story_seg_human', 'story_seg_llm', 'intersection', 'union']
+
+
+def analyze_transcript(human_path, llm_path, compare_path=None):
     """Compare human and LLM labels for a single transcript.
 
-    Produces a comparison CSV and returns a dict of metric families:
-        {'start': {...}, 'end': {...}, 'segment': {...}}
+    Reads the human and LLM files in lockstep, derives segment membership
+    from the collected start/end flags with metrics.segment_membership()
+    (through compare_labels()), and writes the comparison CSV once.
+    With compare_path=None (metrics-only mode) nothing is written.
+
+    Returns a dict of metric families:
+        {'start': {...}, 'end': {...}, 'segment': {...}, 'tolerance': {...}}
     Each family contains: tp, tn, fp, fn, accuracy, precision, recall, f1.
-    The 'segment' family also includes 'iou'.
+    The 'segment' family also includes 'iou'.  'tolerance' holds the
+    boundary counts of metrics.tolerance_counts() for 'start' and 'end';
+    'pk' / 'windiff' are None when the human labels have no boundary.
     """
     print(f"\n{'='*60}")
     print(f"Analyzing: {os.path.basename(human_path)}")
     print(f"  Human labels: {human_path}")
     print(f"  LLM labels: {llm_path}")
-    print(f"  Output: {compare_path}")
+    print(f"  Output: {compare_path or '(metrics only)'}")
     print(f"{'='*60}")
-    
-    # Read the human-labeled data
-    with open(human_path, 'r', encoding='utf-8') as file:
-        reader = csv.reader(file)
-        human_rows = list(reader)
-    
-    # Read the LLM-generated data
-    with open(llm_path, 'r', encoding='utf-8') as file:
-        reader = csv.reader(file)
-        llm_rows = list(reader)
-    
-    # Create the comparison file
-    with open(compare_path, 'w', encoding='utf-8', newline='') as file:
-        writer = csv.writer(file)
-        
-        # Write header
-        writer.writerow(['in/out/ambiguous', 'start_human', 'start_llm', 'end_human', 'end_llm', 'Transcript', 'story_seg_human', 'story_seg_llm', 'intersection', 'union'])
-        
-        # Write data rows
-        index = 1
-        while index < len(human_rows):
-            human_row = human_rows[index]
-            llm_row = llm_rows[index]
-            
-            writer.writerow([
-                human_row[0],      # in/out/ambiguous
-                human_row[1],      # start_human
-                llm_row[1],        # start_llm
-                human_row[2],      # end_human
-                llm_row[2],        # end_llm
-                human_row[3],      # Transcript
-                'FALSE',           # story_seg_human (initialized to FALSE)
-                'FALSE',           # story_seg_llm (initialized to FALSE)
-                'FALSE',           # intersection (initialized to FALSE)
-                'FALSE'            # union (initialized to FALSE)
-            ])
-            index += 1
-
-    # Read the comparison file we just created
-    with open(compare_path, 'r', encoding='utf-8') as file:
-        reader = csv.reader(file)
-        rows = list(reader)
-    
-    index = 1
-    toggle_human = False
-    toggle_llm = False
-    run_length = len(rows) - 1
-    while index <= run_length:
-        # Human: turn on at start
-        if rows[index][1] == 'TRUE':
-            toggle_human = True
-        # Mark row before turning off (so end row is included)
-        if toggle_human:
-            rows[index][6] = 'TRUE'
-        # Human: turn off at end
-        if rows[index][3] == 'TRUE':
-            toggle_human = False
-        
-        # LLM: turn on at start
-        if rows[index][2] == 'TRUE':
-            toggle_llm = True
-        # Mark row before turning off (so end row is included)
-        if toggle_llm:
-            rows[index][7] = 'TRUE'
-        # LLM: turn off at end
-        if rows[index][4] == 'TRUE':
-            toggle_llm = False
-        
-        index += 1
-
-    # =========================================
-    # 1. START DETECTION METRICS
-    # =========================================
-    start_tp = 0  # Both say start=TRUE
-    start_tn = 0  # Both say start=FALSE
-    start_fp = 0  # LLM says TRUE, Human says FALSE
-    start_fn = 0  # LLM says FALSE, Human says TRUE
-    
-    index = 1
-    while index <= run_length:
-        human_start = rows[index][1] == 'TRUE'
-        llm_start = rows[index][2] == 'TRUE'
-        
-        if human_start and llm_start:
-            start_tp += 1
-        elif not human_start and not llm_start:
-            start_tn += 1
-        elif llm_start and not human_start:
-            start_fp += 1
-        elif not llm_start and human_start:
-            start_fn += 1
-        index += 1
-    
-    # =========================================
-    # 2. END DETECTION METRICS
-    # =========================================
-    end_tp = 0
-    end_tn = 0
-    end_fp = 0
-    end_fn = 0
-    
-    index = 1
-    while index <= run_length:
-        human_end = rows[index][3] == 'TRUE'
-        llm_end = rows[index][4] == 'TRUE'
-        
-        if human_end and llm_end:
-            end_tp += 1
-        elif not human_end and not llm_end:
-            end_tn += 1
-        elif llm_end and not human_end:
-            end_fp += 1
-        elif not llm_end and human_end:
-            end_fn += 1
-        index += 1
-    
-    # =========================================
-    # 3. SEGMENT OVERLAP METRICS
-    # =========================================
-    seg_tp = 0  # Both say story segment
-    seg_tn = 0  # Both say not story segment
-    seg_fp = 0  # LLM says segment, Human says no
-    seg_fn = 0  # LLM says no, Human says segment
-    intersection_count = 0
-    union_count = 0
-    
-    index = 1
-    while index <= run_length:
-        human_seg = rows[index][6] == 'TRUE'
-        llm_seg = rows[index][7] == 'TRUE'
-        
-        # Intersection and Union
-        if human_seg and llm_seg:
-            rows[index][8] = 'TRUE'
-            intersection_count += 1
-        if human_seg or llm_seg:
-            rows[index][9] = 'TRUE'
-            union_count += 1
-        
-        # Confusion matrix for segments
-        if human_seg and llm_seg:
-            seg_tp += 1
-        elif not human_seg and not llm_seg:
-            seg_tn += 1
-        elif llm_seg and not human_seg:
-            seg_fp += 1
-        elif not llm_seg and human_seg:
-            seg_fn += 1
-        
-        index += 1
-    
-    # =========================================
-    # CALCULATE ALL METRICS
-    # =========================================
-    def calc_metrics(tp, tn, fp, fn):
-        total = tp + tn + fp + fn
-        accuracy = (tp + tn) / total if total > 0 else 0
-        precision = tp / (tp + fp) if (tp + fp) > 0 else 0
-        recall = tp / (tp + fn) if (tp + fn) > 0 else 0
-        f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
-        return {'tp': tp, 'tn': tn, 'fp': fp, 'fn': fn,
-                'accuracy': accuracy, 'precision': precision, 'recall': recall, 'f1': f1}
-    
-    start_metrics = calc_metrics(start_tp, start_tn, start_fp, start_fn)
-    end_metrics = calc_metrics(end_tp, end_tn, end_fp, end_fn)
-    seg_metrics = calc_metrics(seg_tp, seg_tn, seg_fp, seg_fn)
-    seg_metrics['iou'] = intersection_count / union_count if union_count > 0 else 0
+
+    start_human, start_llm, end_human, end_llm = [], [], [], []
+    rows = []
+
+    with open(human_path, 'r', encoding='utf-8') as human_file, \
+            open(llm_path, 'r', encoding='utf-8') as llm_file:
+        human_reader = csv.reader(human_file)
+        llm_reader = csv.reader(llm_file)
+
+        # Skip both headers
+        next(human_reader, None)
+        next(llm_reader, None)
+        for human_row in human_reader:
+            llm_row = next(llm_reader, None)
+            if llm_row is None:
+                raise ValueError(f"{llm_path} has fewer rows than {human_path}")
+            start_human.append(human_row[1] == 'TRUE')
+            start_llm.append(llm_row[1] == 'TRUE')
+            end_human.append(human_row[2] == 'TRUE')
+            end_llm.append(llm_row[2] == 'TRUE')
+            if compare_path is not None:
+                # in/out/ambiguous, start_human, start_llm, end_human, end_llm, Transcript
+                rows.append((human_row[0], human_row[1], llm_row[1], human_row[2], llm_row[2], human_row[3]))
+
+    # All three confusion matrices from the collected flags, with segment
+    # membership derived by metrics.segment_membership()
+    result = compare_labels(start_human, end_human, start_llm, end_llm)
+
+    if compare_path is not None:
+        seg_human = result['human_segment']
+        seg_llm = result['llm_segment']
+        with open(compare_path, 'w', encoding='utf-8', newline='') as compare_file:
+            writer = csv.writer(compare_file)
+            writer.writerow(COMPARE_HEADER)
+            for row, h_seg, l_seg in zip(rows, seg_human, seg_llm):
+                writer.writerow([
+                    *row,
+                    'TRUE' if h_seg else 'FALSE',             # story_seg_human
+                    'TRUE' if l_seg else 'FALSE',             # story_seg_llm
+                    'TRUE' if h_seg and l_seg else 'FALSE',   # intersection
+                    'TRUE' if h_seg or l_seg else 'FALSE',    # union
+                ])
+
+    metrics = family_metrics(result)
+    start_metrics = metrics['start']
+    end_metrics = metrics['end']
+    seg_metrics = metrics['segment']
+    start_tp, start_tn, start_fp, start_fn = (start_metrics[k] for k in COUNT_KEYS)
+    end_tp, end_tn, end_fp, end_fn = (end_metrics[k] for k in COUNT_KEYS)
+    seg_tp, seg_tn, seg_fp, seg_fn = (seg_metrics[k] for k in COUNT_KEYS)
     
     # Print metrics
     print(f"\n  START DETECTION:")
@@ -238,91 +173,165 @@ def analyze_transcript(human_path, llm_path, compare_path):
     print(f"\n  SEGMENT OVERLAP:")
     print(f"    TP: {seg_tp}, TN: {seg_tn}, FP: {seg_fp}, FN: {seg_fn}")
     print(f"    Acc: {seg_metrics['accuracy']:.4f}, Prec: {seg_metrics['precision']:.4f}, Rec: {seg_metrics['recall']:.4f}, F1: {seg_metrics['f1']:.4f}, IoU: {seg_metrics['iou']:.4f}")
-    
-    # Write the updated rows back to the file
-    with open(compare_path, 'w', encoding='utf-8', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerows(rows)
-    
+
+    tolerance = {
+        'start': tolerance_counts(start_human, start_llm),
+        'end': tolerance_counts(end_human, end_llm),
+    }
+    print(f"\n  BOUNDARY TOLERANCE (F1, window / matched):")
+    for family in ('start', 'end'):
+        cells = []
+        for k, counts in tolerance[family].items():
+            r = tolerance_rates(counts)
+            cells.append(f"±{k}: {r['window']['f1']:.4f}/{r['matched']['f1']:.4f}")
+        print(f"    {family.upper():<6} " + ", ".join(cells))
+
+    # Pk / WinDiff on start rows, first-row "boundary" dropped (as bootstrap.py)
+    reference = np.array(start_human, dtype=int)
+    hypothesis = np.array(start_llm, dtype=int)
+    if len(reference):
+        reference[0] = hypothesis[0] = 0
+    pk_value, windiff_value = pk_windiff(reference, hypothesis)
+    if np.isnan(pk_value):
+        pk_value = windiff_value = None
+    else:
+        print(f"    Pk: {pk_value:.4f}, WinDiff: {windiff_value:.4f}")
+
     return {
         'start': start_metrics,
         'end': end_metrics,
-        'segment': seg_metrics
+        'segment': seg_metrics,
+        'tolerance': tolerance,
+        'pk': pk_value,
+        'windiff': windiff_value,
     }
 
 
-def main():
-    # Ensure output directory exists
-    os.makedirs(COMPARE_DIR, exist_ok=True)
-    
-    # Find all CSV files in the human-labeled directory
-    human_files = glob.glob(os.path.join(HUMAN_LABELED_DIR, "*.csv"))
-    
-    if not human_files:
-        print(f"No CSV files found in {HUMAN_LABELED_DIR}/")
-        return
-    
-    print(f"Found {len(human_files)} file(s) to analyze:")
-    for f in human_files:
-        print(f"  - {os.path.basename(f)}")
-    
-    # Track overall stats for each metric type
-    totals = {
-        'start': {'tp': 0, 'tn': 0, 'fp': 0, 'fn': 0},
-        'end': {'tp': 0, 'tn': 0, 'fp': 0, 'fn': 0},
-        'segment': {'tp': 0, 'tn': 0, 'fp': 0, 'fn': 0}
-    }
-    results = []
-    
-    # Process each file
-    for human_path in human_files:
-        filename = os.path.basename(human_path)
-        name, ext = os.path.splitext(filename)
-        
-        # Find corresponding LLM-labeled file (try _labeled, then _joined)
-        llm_path = None
-        for suffix in ['_labeled', '_joined', '']:
-            llm_filename = f"{name}{suffix}{ext}"
-            candidate = os.path.join(LLM_LABELED_DIR, llm_filename)
-            if os.path.exists(candidate):
-                llm_path = candidate
-                break
-        
-        if llm_path is None:
-            print(f"\nWarning: LLM-labeled file not found for: {filename}")
-            print(f"  Tried: {name}_labeled{ext}, {name}_joined{ext}, {name}{ext}")
-            print(f"  Skipping {filename}")
-            continue
-        
-        # Create comparison output path
-        compare_filename = f"{name}_compare{ext}"
-        compare_path = os.path.join(COMPARE_DIR, compare_filename)
-        
-        # Analyze this transcript
+def file_hash(path):
+    """sha256 of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(human_path, llm_path):
+    """Cache key for a (human, LLM) pair: both content hashes plus the cache version."""
+    return f"{CACHE_VERSION}:{file_hash(human_path)}:{file_hash(llm_path)}"
+
+
+def load_cache(path):
+    """Load the metrics cache ({key: entry}); empty if missing or from another version.
+
+    Each entry is {'metrics': ..., 'compare_hash': sha256 of the comparison
+    CSV written with those metrics, or None in metrics-only mode}.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    if data.get('version') != CACHE_VERSION:
+        return {}
+    return data['entries']
+
+
+def save_cache(path, entries):
+    """Write the metrics cache atomically."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump({'version': CACHE_VERSION, 'entries': entries}, file)
+    os.replace(tmp_path, path)
+
+
+def _analyze_job(human_path, llm_path, compare_path):
+    """Run analyze_transcript() in a worker, returning its metrics and printed report."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
         metrics = analyze_transcript(human_path, llm_path, compare_path)
+    return metrics, output.getvalue()
+
+
+def _cached(entry, compare_path):
+    """Whether a cache entry can stand in for analyzing a pair into compare_path."""
+    if entry is None:
+        return False
+    if compare_path is None:
+        return True
+    return os.path.exists(compare_path) and file_hash(compare_path) == entry['compare_hash']
+
+
+def analyze_all(jobs, workers=None, cache=None):
+    """Analyze (filename, human_path, llm_path, compare_path) jobs.
+
+    Pairs whose cache key is in `cache` (and, if a comparison CSV is
+    requested, whose CSV exists with the hash the entry recorded) are not
+    recomputed.  The rest run on a
+    process pool of `workers` processes (inline when workers <= 1); their
+    reports are printed in job order, as a sequential run would.  `cache`
+    is updated in place.
+
+    Returns:
+        A list of (filename, metrics) in job order.
+    """
+    cache = {} if cache is None else cache
+    keys = [cache_key(human_path, llm_path) for _, human_path, llm_path, _ in jobs]
+    pending = [i for i, (job, key) in enumerate(zip(jobs, keys)) if not _cached(cache.get(key), job[3])]
+
+    if workers is not None and workers <= 1:
+        outputs = [_analyze_job(*jobs[i][1:]) for i in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outputs = list(pool.map(_analyze_job, *zip(*(jobs[i][1:] for i in pending)))) if pending else []
+    computed = dict(zip(pending, outputs))
+
+    results = []
+    for i, (filename, _, _, _) in enumerate(jobs):
+        if i in computed:
+            metrics, report = computed[i]
+            print(report, end='')
+            compare_path = jobs[i][3]
+            cache[keys[i]] = {'metrics': metrics,
+                              'compare_hash': file_hash(compare_path) if compare_path is not None else None}
+        else:
+            metrics = cache[keys[i]]['metrics']
+            print(f"\nUnchanged: {filename} (metrics from cache)")
         results.append((filename, metrics))
-        
-        # Accumulate totals
-        for metric_type in ['start', 'end', 'segment']:
-            for key in ['tp', 'tn', 'fp', 'fn']:
-                totals[metric_type][key] += metrics[metric_type][key]
-    
-    # Helper function for calculating metrics
-    def calc_overall(t):
-        total = t['tp'] + t['tn'] + t['fp'] + t['fn']
-        acc = (t['tp'] + t['tn']) / total if total > 0 else 0
-        prec = t['tp'] / (t['tp'] + t['fp']) if (t['tp'] + t['fp']) > 0 else 0
-        rec = t['tp'] / (t['tp'] + t['fn']) if (t['tp'] + t['fn']) > 0 else 0
-        f1 = 2 * (prec * rec) / (prec + rec) if (prec + rec) > 0 else 0
-        return {'accuracy': acc, 'precision': prec, 'recall': rec, 'f1': f1, **t}
-    
-    overall_start = calc_overall(totals['start'])
-    overall_end = calc_overall(totals['end'])
-    overall_seg = calc_overall(totals['segment'])
-    # IoU for segment
-    seg_t = totals['segment']
-    overall_seg['iou'] = seg_t['tp'] / (seg_t['tp'] + seg_t['fp'] + seg_t['fn']) if (seg_t['tp'] + seg_t['fp'] + seg_t['fn']) > 0 else 0
-    
+    print(f"\nAnalyzed {len(pending)} file(s), {len(jobs) - len(pending)} unchanged and taken from the cache")
+    return results
+
+
+def write_summary(path, results, overall):
+    """Write per-file and overall metrics as JSON or CSV (by path extension)."""
+    if path.endswith('.csv'):
+        # Tolerance rows use family "start±k" / "end±k", with the one-to-one
+        # matching as tp/fp/fn and its precision/recall/F1
+        fields = ['file', 'family', *COUNT_KEYS, 'accuracy', 'precision', 'recall', 'f1', 'iou']
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=fields)
+            writer.writeheader()
+            for filename, metrics in [*results, ('OVERALL', overall)]:
+                for family in ('start', 'end', 'segment'):
+                    writer.writerow({'file': filename, 'family': family, **metrics[family]})
+                for family in ('start', 'end'):
+                    for k, counts in metrics['tolerance'][family].items():
+                        matched = counts['matched']
+                        writer.writerow({'file': filename, 'family': f"{family}±{k}", 'tp': matched,
+                                         'fp': counts['pred'] - matched, 'fn': counts['truth'] - matched,
+                                         **tolerance_rates(counts)['matched']})
+    else:
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'files': dict(results), 'overall': overall}, file, indent=2)
+
+
+def print_report(accumulator):
+    """Per-file tables and overall metrics of an accumulator (one run or merged shards)."""
+    results = list(accumulator.files.items())
+    totals = accumulator.counts
+    overall = accumulator.overall()
+    overall_start, overall_end, overall_seg = overall['start'], overall['end'], overall['segment']
+    tolerance_totals = overall['tolerance']
+
     # Print summary
     print(f"\n{'='*80}")
     print("SUMMARY - START DETECTION")
@@ -332,7 +341,7 @@ def main():
     for filename, metrics in results:
         m = metrics['start']
         print(f"  {filename:<20} {m['accuracy']:>8.4f} {m['precision']:>8.4f} {m['recall']:>8.4f} {m['f1']:>8.4f}")
-    
+
     print(f"\n{'='*80}")
     print("SUMMARY - END DETECTION")
     print(f"{'='*80}")
@@ -341,7 +350,7 @@ def main():
     for filename, metrics in results:
         m = metrics['end']
         print(f"  {filename:<20} {m['accuracy']:>8.4f} {m['precision']:>8.4f} {m['recall']:>8.4f} {m['f1']:>8.4f}")
-    
+
     print(f"\n{'='*80}")
     print("SUMMARY - SEGMENT OVERLAP")
     print(f"{'='*80}")
@@ -350,27 +359,134 @@ def main():
     for filename, metrics in results:
         m = metrics['segment']
         print(f"  {filename:<20} {m['accuracy']:>8.4f} {m['precision']:>8.4f} {m['recall']:>8.4f} {m['f1']:>8.4f} {m['iou']:>8.4f}")
-    
+
     print(f"\n{'='*80}")
     print("OVERALL METRICS")
     print(f"{'='*80}")
-    
+
     total_samples = totals['segment']['tp'] + totals['segment']['tn'] + totals['segment']['fp'] + totals['segment']['fn']
     print(f"  Total samples: {total_samples}")
-    
+
     print(f"\n  START DETECTION:")
     print(f"    TP: {totals['start']['tp']}, TN: {totals['start']['tn']}, FP: {totals['start']['fp']}, FN: {totals['start']['fn']}")
     print(f"    Accuracy: {overall_start['accuracy']:.4f}, Precision: {overall_start['precision']:.4f}, Recall: {overall_start['recall']:.4f}, F1: {overall_start['f1']:.4f}")
-    
+
     print(f"\n  END DETECTION:")
     print(f"    TP: {totals['end']['tp']}, TN: {totals['end']['tn']}, FP: {totals['end']['fp']}, FN: {totals['end']['fn']}")
     print(f"    Accuracy: {overall_end['accuracy']:.4f}, Precision: {overall_end['precision']:.4f}, Recall: {overall_end['recall']:.4f}, F1: {overall_end['f1']:.4f}")
-    
+
     print(f"\n  SEGMENT OVERLAP:")
     print(f"    TP: {totals['segment']['tp']}, TN: {totals['segment']['tn']}, FP: {totals['segment']['fp']}, FN: {totals['segment']['fn']}")
     print(f"    Accuracy: {overall_seg['accuracy']:.4f}, Precision: {overall_seg['precision']:.4f}, Recall: {overall_seg['recall']:.4f}, F1: {overall_seg['f1']:.4f}, IoU: {overall_seg['iou']:.4f}")
+
+    print(f"\n{'='*80}")
+    print("OVERALL BOUNDARY TOLERANCE (a boundary within ±k lines counts)")
+    print(f"{'='*80}")
+    print(f"  {'Family':<8} {'k':>3} {'Win Prec':>9} {'Win Rec':>9} {'Win F1':>9} "
+          f"{'Match Prec':>11} {'Match Rec':>10} {'Match F1':>9}")
+    print(f"  {'-'*8} {'-'*3} {'-'*9} {'-'*9} {'-'*9} {'-'*11} {'-'*10} {'-'*9}")
+    for family in ('start', 'end'):
+        for k, counts in tolerance_totals[family].items():
+            r = tolerance_rates(counts)
+            w, m = r['window'], r['matched']
+            print(f"  {family.upper():<8} {k:>3} {w['precision']:>9.4f} {w['recall']:>9.4f} {w['f1']:>9.4f} "
+                  f"{m['precision']:>11.4f} {m['recall']:>10.4f} {m['f1']:>9.4f}")
+    print(f"  (k = 0 matched equals the exact-match START/END numbers above; "
+          f"tolerances: {', '.join(map(str, TOLERANCES))})")
+    if overall['pk'] is not None:
+        print(f"\n  Pk: {overall['pk']:.4f}, WinDiff: {overall['windiff']:.4f} "
+              f"(mean over {accumulator.pk_sums()[2]} transcript(s) with human boundaries)")
+
+
+def build_parser():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--metrics-only", action="store_true",
+                   help="Compute and print metrics without writing comparison CSVs.")
+    p.add_argument("--human-dir", default=HUMAN_LABELED_DIR,
+                   help="Directory of human-labeled CSVs (default: to-label/).")
+    p.add_argument("--llm-dir", default=LLM_LABELED_DIR,
+                   help="Directory of LLM-labeled CSVs (default: labeled-out/).")
+    p.add_argument("--compare-dir", default=COMPARE_DIR,
+                   help="Directory for comparison CSVs (default: labeled-compare/).")
+    p.add_argument("--jobs", type=int, default=None,
+                   help="Worker processes (default: one per CPU; 1 = no pool).")
+    p.add_argument("--cache", default=CACHE_PATH,
+                   help="Metrics cache file (default: analysis-cache.json).")
+    p.add_argument("--no-cache", action="store_true",
+                   help="Recompute every transcript and leave the cache untouched.")
+    p.add_argument("--summary", default=SUMMARY_PATH,
+                   help="Write per-file and overall metrics here (.json or .csv).")
+    p.add_argument("--shard-out", default=None,
+                   help="Also write this run's mergeable metrics accumulator (JSON) for reduce_metrics.py.")
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # Ensure output directory exists
+    if not args.metrics_only:
+        os.makedirs(args.compare_dir, exist_ok=True)
+    
+    # Find all CSV files in the human-labeled directory
+    human_files = glob.glob(os.path.join(args.human_dir, "*.csv"))
+    
+    if not human_files:
+        print(f"No CSV files found in {args.human_dir}/")
+        return
+    
+    print(f"Found {len(human_files)} file(s) to analyze:")
+    for f in human_files:
+        print(f"  - {os.path.basename(f)}")
     
-    print(f"\nComparison files saved to {COMPARE_DIR}/")
+    jobs = []
+    
+    # Pair each file with its LLM output
+    for human_path in human_files:
+        filename = os.path.basename(human_path)
+        name, ext = os.path.splitext(filename)
+        
+        # Find corresponding LLM-labeled file (try _labeled, then _joined)
+        llm_path = None
+        for suffix in ['_labeled', '_joined', '']:
+            llm_filename = f"{name}{suffix}{ext}"
+            candidate = os.path.join(args.llm_dir, llm_filename)
+            if os.path.exists(candidate):
+                llm_path = candidate
+                break
+        
+        if llm_path is None:
+            print(f"\nWarning: LLM-labeled file not found for: {filename}")
+            print(f"  Tried: {name}_labeled{ext}, {name}_joined{ext}, {name}{ext}")
+            print(f"  Skipping {filename}")
+            continue
+        
+        # Create comparison output path (none in metrics-only mode)
+        compare_filename = f"{name}_compare{ext}"
+        compare_path = None if args.metrics_only else os.path.join(args.compare_dir, compare_filename)
+        jobs.append((filename, human_path, llm_path, compare_path))
+
+    # Analyze changed transcripts in parallel; unchanged ones come from the cache
+    cache = {} if args.no_cache else load_cache(args.cache)
+    results = analyze_all(jobs, args.jobs, cache)
+    if not args.no_cache:
+        save_cache(args.cache, cache)
+
+    # Accumulate totals; the accumulator merges with other shards' (reduce_metrics.py)
+    accumulator = MetricsAccumulator()
+    for filename, metrics in results:
+        accumulator.add(filename, metrics)
+    if args.shard_out:
+        accumulator.save(args.shard_out)
+        print(f"\nShard accumulator written to {args.shard_out}")
+    print_report(accumulator)
+
+    if not args.metrics_only:
+        print(f"\nComparison files saved to {args.compare_dir}/")
+
+    if args.summary:
+        write_summary(args.summary, results, accumulator.overall())
+        print(f"Summary written to {args.summary}")
 
 
 if __name__ == "__main__":
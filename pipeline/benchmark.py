@@ -0,0 +1,361 @@
+"""
+Load / Throughput Benchmark for the LLM Labeling Pipeline
+
+Drives the labeling step (process_data.label_rows) and the join step
+(join_fixed.process_transcript) against a simulated model, so the effect
+of a change to either on batch throughput can be measured in minutes
+without spending API time.
+
+Simulated model (SimulatedClient):
+    - Per-request latency is log-normal around --latency-median-ms with
+      shape --latency-sigma, plus a token-proportional part:
+      --ms-per-input-token × prompt tokens + --ms-per-output-token × reply
+      tokens (tokens estimated at 4 characters each).
+    - With probability --error-rate / --throttle-rate an attempt fails
+      (server error / 429).  Like the OpenAI SDK, failed attempts are
+      retried up to MAX_RETRIES times with exponential backoff; a request
+      that still fails raises SimulatedAPIError and the transcript counts
+      as failed.
+    - Summaries return ~SUMMARY_TOKENS tokens of text; different-story
+      verdicts answer TRUE with probability --boundary-rate; combine
+      questions answer TRUE with probability --merge-rate.
+    - Each transcript gets its own seeded client, so runs are repeatable.
+
+All simulated delays are multiplied by --time-scale before sleeping, and
+only they are scaled back: each client adds up the simulated time it
+slept, and the pipeline's own work is measured as real CPU time, unscaled.
+A transcript's latency is its simulated LLM time plus the CPU time of the
+thread that ran it; a cell's wall time has the process CPU time taken out
+before it is divided by --time-scale, and added back unscaled.  Any
+--time-scale gives the same numbers up to scheduling noise (1.0 runs in
+real time).
+
+Sweep:
+    For every transcript size (--sizes, in lines; real to-label/ files are
+    truncated or tiled to that length) and every concurrency level
+    (--concurrency), a batch of --batch transcripts is labeled and joined
+    on a thread pool of that size.  For each cell the report gives
+    transcripts/hour, LLM calls/transcript, p50 / p95 transcript latency,
+    real CPU seconds/transcript and peak traced memory.  Memory is traced
+    in a second, untimed pass over the same batch with identically seeded
+    clients, since tracemalloc slows the pipeline's Python code severalfold.
+
+Results are written to bench-results/<commit>.json (override with --out)
+and can be compared against an earlier run with --compare OLD.json.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --sizes 100 700 --concurrency 1 8 --batch 16
+    python benchmark.py --compare bench-results/abc1234.json
+"""
+
+import os
+import io
+import glob
+import json
+import math
+import time
+import random
+import argparse
+import tempfile
+import threading
+import contextlib
+import subprocess
+import tracemalloc
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+# The real clients built at import time are never called; a placeholder
+# key lets the benchmark run on machines without API keys.
+os.environ.setdefault("HF_TOKEN", "simulated")
+
+import process_data
+import join_fixed
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+INPUT_DIR = os.path.join(SCRIPT_DIR, "to-label")
+RESULTS_DIR = os.path.join(SCRIPT_DIR, "bench-results")
+
+SUMMARY_TOKENS = 60
+MAX_RETRIES = 2
+BACKOFF_MS = 500
+
+
+class SimulatedAPIError(Exception):
+    """A simulated request that failed on every retry."""
+
+
+class _Completions:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, **kwargs):
+        return self._client.create(**kwargs)
+
+
+class SimulatedClient:
+    """OpenAI-client stand-in with configurable latency and failure rates."""
+
+    def __init__(self, seed, latency_median_ms=800.0, latency_sigma=0.5,
+                 ms_per_input_token=0.2, ms_per_output_token=20.0,
+                 error_rate=0.0, throttle_rate=0.0,
+                 boundary_rate=0.2, merge_rate=0.3, time_scale=0.01):
+        self.rng = random.Random(seed)
+        self.latency_median_ms = latency_median_ms
+        self.latency_sigma = latency_sigma
+        self.ms_per_input_token = ms_per_input_token
+        self.ms_per_output_token = ms_per_output_token
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.boundary_rate = boundary_rate
+        self.merge_rate = merge_rate
+        self.time_scale = time_scale
+        self.chat = SimpleNamespace(completions=_Completions(self))
+        self.calls = 0
+        self.retries = 0
+        self.simulated_s = 0.0
+
+    def _sleep_ms(self, ms):
+        self.simulated_s += ms / 1000
+        time.sleep(ms * self.time_scale / 1000)
+
+    def _reply(self, prompt):
+        if 'different story than' in prompt:
+            return 'TRUE' if self.rng.random() < self.boundary_rate else 'FALSE'
+        if 'part of the same story' in prompt:
+            return 'TRUE' if self.rng.random() < self.merge_rate else 'FALSE'
+        return ' '.join(['word'] * SUMMARY_TOKENS)
+
+    def create(self, model, messages, **kwargs):
+        self.calls += 1
+        prompt = messages[-1]['content']
+        input_tokens = len(prompt) // 4 + 1
+        for attempt in range(MAX_RETRIES + 1):
+            roll = self.rng.random()
+            if roll < self.error_rate + self.throttle_rate:
+                if roll >= self.error_rate:
+                    # Throttled requests are rejected quickly ...
+                    self._sleep_ms(self.latency_median_ms * 0.05)
+                else:
+                    # ... server errors after a full round trip.
+                    self._sleep_ms(self.rng.lognormvariate(math.log(self.latency_median_ms),
+                                                           self.latency_sigma))
+                if attempt == MAX_RETRIES:
+                    raise SimulatedAPIError(f"request failed after {MAX_RETRIES} retries")
+                self.retries += 1
+                self._sleep_ms(BACKOFF_MS * 2 ** attempt)
+                continue
+            reply = self._reply(prompt)
+            output_tokens = len(reply) // 4 + 1
+            self._sleep_ms(self.rng.lognormvariate(math.log(self.latency_median_ms), self.latency_sigma)
+                           + self.ms_per_input_token * input_tokens
+                           + self.ms_per_output_token * output_tokens)
+            message = SimpleNamespace(content=reply)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message, logprobs=None)])
+
+
+def load_sources(input_dir):
+    """Parse every CSV in input_dir once; returns a list of row lists."""
+    sources = []
+    for path in sorted(glob.glob(os.path.join(input_dir, "*.csv"))):
+        sources.append(process_data.read_rows(path))
+    if not sources:
+        raise FileNotFoundError(f"No CSV files found in {input_dir}/")
+    return sources
+
+
+def sized_transcript(rows, size):
+    """Truncate or tile a parsed transcript to `size` data rows."""
+    body = rows[1:]
+    tiled = (body * (size // len(body) + 1))[:size]
+    return [rows[0]] + tiled
+
+
+def run_transcript(rows, client, workdir, index):
+    """Label and join one transcript with a fresh client.
+
+    Returns (latency, cpu): simulated LLM seconds plus the real CPU seconds
+    of this thread, and those CPU seconds alone.
+    """
+    labeled_path = os.path.join(workdir, f"{index}_labeled.csv")
+    joined_path = os.path.join(workdir, f"{index}_joined.csv")
+    started = time.thread_time()
+    out_rows, _, segments = process_data.label_rows(rows, llm_client=client)
+    process_data.write_rows(labeled_path, out_rows)
+    process_data.write_segments(labeled_path, segments)
+    join_fixed.process_transcript(labeled_path, joined_path, client)
+    cpu = time.thread_time() - started
+    return client.simulated_s + cpu, cpu
+
+
+def run_batch(transcripts, clients, concurrency):
+    """Label and join transcripts[i] with clients[i] on a thread pool.
+
+    Returns:
+        (latencies, cpu, failed) — (latency, cpu) of run_transcript() for
+        every transcript that completed, and the number that failed.
+    """
+    latencies = []
+    cpu = []
+    failed = 0
+    lock = threading.Lock()
+
+    def job(i, workdir):
+        nonlocal failed
+        try:
+            latency, seconds = run_transcript(transcripts[i], clients[i], workdir, i)
+        except SimulatedAPIError:
+            with lock:
+                failed += 1
+            return
+        with lock:
+            latencies.append(latency)
+            cpu.append(seconds)
+
+    with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda i: job(i, workdir), range(len(transcripts))))
+    return latencies, cpu, failed
+
+
+def run_cell(sources, size, concurrency, batch, client_kwargs, seed):
+    """Run one (size, concurrency) cell of the sweep."""
+    transcripts = [sized_transcript(sources[i % len(sources)], size) for i in range(batch)]
+    clients = [SimulatedClient(seed + i, **client_kwargs) for i in range(batch)]
+
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    latencies, cpu, failed = run_batch(transcripts, clients, concurrency)
+    process_cpu = time.process_time() - cpu_started
+    wall = time.perf_counter() - started
+    # Only the sleeping part of the wall time is simulated
+    elapsed = max(wall - process_cpu, 0.0) / client_kwargs['time_scale'] + process_cpu
+
+    # Peak memory from an untimed second pass; same seeds, same calls
+    tracemalloc.start()
+    run_batch(transcripts, [SimulatedClient(seed + i, **client_kwargs) for i in range(batch)], concurrency)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    completed = len(latencies)
+
+    def percentile(q):
+        if not latencies:
+            return float('nan')
+        return latencies[min(completed - 1, int(math.ceil(q * completed)) - 1)]
+
+    return {
+        'size': size,
+        'concurrency': concurrency,
+        'transcripts': batch,
+        'failed': failed,
+        'transcripts_per_hour': completed / elapsed * 3600 if elapsed > 0 else 0.0,
+        'calls_per_transcript': sum(c.calls for c in clients) / batch,
+        'retries_per_transcript': sum(c.retries for c in clients) / batch,
+        'p50_latency_s': percentile(0.50),
+        'p95_latency_s': percentile(0.95),
+        'cpu_s_per_transcript': sum(cpu) / completed if completed else float('nan'),
+        'peak_memory_mb': peak / 2 ** 20,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_results(results, baseline=None):
+    """Print the sweep table, with deltas against a baseline run if given."""
+    previous = {}
+    if baseline:
+        previous = {(r['size'], r['concurrency']): r for r in baseline['results']}
+    print(f"\n{'='*105}")
+    print("BENCHMARK RESULTS (simulated LLM time + real CPU time)")
+    print(f"{'='*105}")
+    print(f"  {'Lines':>6} {'Conc':>5} {'Done':>5} {'Fail':>5} {'Trans/h':>10} {'Calls/tr':>9} "
+          f"{'p50 s':>8} {'p95 s':>8} {'CPU s/tr':>8} {'Peak MB':>8} {'Δ Trans/h':>10}")
+    print(f"  {'-'*6} {'-'*5} {'-'*5} {'-'*5} {'-'*10} {'-'*9} {'-'*8} {'-'*8} {'-'*8} {'-'*8} {'-'*10}")
+    for r in results:
+        old = previous.get((r['size'], r['concurrency']))
+        delta = ''
+        if old and old['transcripts_per_hour']:
+            delta = f"{(r['transcripts_per_hour'] / old['transcripts_per_hour'] - 1) * 100:+.1f}%"
+        print(f"  {r['size']:>6} {r['concurrency']:>5} {r['transcripts'] - r['failed']:>5} {r['failed']:>5} "
+              f"{r['transcripts_per_hour']:>10.1f} {r['calls_per_transcript']:>9.1f} "
+              f"{r['p50_latency_s']:>8.1f} {r['p95_latency_s']:>8.1f} {r['cpu_s_per_transcript']:>8.3f} "
+              f"{r['peak_memory_mb']:>8.2f} {delta:>10}")
+
+
+def build_parser():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--input-dir", default=INPUT_DIR, help="Source transcripts (default: to-label/).")
+    p.add_argument("--sizes", type=int, nargs="+", default=[100, 300, 700],
+                   help="Transcript sizes in lines (default: 100 300 700).")
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8],
+                   help="Concurrent transcripts (default: 1 4 8).")
+    p.add_argument("--batch", type=int, default=8, help="Transcripts per cell (default: 8).")
+    p.add_argument("--latency-median-ms", type=float, default=800.0)
+    p.add_argument("--latency-sigma", type=float, default=0.5)
+    p.add_argument("--ms-per-input-token", type=float, default=0.2)
+    p.add_argument("--ms-per-output-token", type=float, default=20.0)
+    p.add_argument("--error-rate", type=float, default=0.01)
+    p.add_argument("--throttle-rate", type=float, default=0.02)
+    p.add_argument("--boundary-rate", type=float, default=0.2,
+                   help="P(TRUE) for different-story verdicts (default: 0.2).")
+    p.add_argument("--merge-rate", type=float, default=0.3,
+                   help="P(TRUE) for combine questions (default: 0.3).")
+    p.add_argument("--time-scale", type=float, default=0.01,
+                   help="Real seconds slept per simulated second (default: 0.01).")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--out", default=None, help="Results JSON (default: bench-results/<commit>.json).")
+    p.add_argument("--compare", default=None, help="Earlier results JSON to compare against.")
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sources = load_sources(args.input_dir)
+    client_kwargs = {
+        'latency_median_ms': args.latency_median_ms,
+        'latency_sigma': args.latency_sigma,
+        'ms_per_input_token': args.ms_per_input_token,
+        'ms_per_output_token': args.ms_per_output_token,
+        'error_rate': args.error_rate,
+        'throttle_rate': args.throttle_rate,
+        'boundary_rate': args.boundary_rate,
+        'merge_rate': args.merge_rate,
+        'time_scale': args.time_scale,
+    }
+
+    results = []
+    for size in args.sizes:
+        for concurrency in args.concurrency:
+            print(f"  Running {args.batch} transcript(s) of {size} lines at concurrency {concurrency} ...")
+            results.append(run_cell(sources, size, concurrency, args.batch, client_kwargs, args.seed))
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {**client_kwargs, 'batch': args.batch, 'seed': args.seed},
+        'results': results,
+    }
+    out_path = args.out or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+    print(f"\nResults saved to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Bootstrap Confidence Intervals for Agreement Metrics
+
+analysis.py and compare_to_llm.py report point estimates only.  This script
+resamples transcripts (or, with --unit story, human-annotated stories) with
+replacement and reports percentile confidence intervals for
+
+    START F1, END F1, SEGMENT F1, SEGMENT IoU    (pooled counts, as analysis.py)
+    Pk, WinDiff                                   (mean over transcripts, as
+                                                   compare_to_llm.py)
+
+Given two comparison directories, it also reports a paired-difference CI
+(second minus first): every resample draws the same transcripts for both
+methods, so per-transcript difficulty cancels out.
+
+Everything works on per-unit count arrays: each unit's confusion counts
+(3 families x tp/tn/fp/fn) and Pk/WinDiff are computed once with the
+metrics.py kernel.  A resample is then a vector of multiplicities, and
+all resamples' pooled counts are one matrix product, so 10k resamples of
+the whole corpus take well under a second.
+
+Input: comparison CSVs as written by analysis.py (labeled-compare/ or the
+*-compare-* folders under data/).
+
+Usage:
+    python bootstrap.py COMPARE_DIR [OTHER_COMPARE_DIR]
+                        [--resamples N] [--confidence C] [--seed S]
+                        [--unit transcript|story]
+"""
+
+import os
+import csv
+import glob
+import time
+import argparse
+
+import numpy as np
+
+from metrics import FAMILIES, COUNT_KEYS, compare_labels, flags, pk_windiff, rates
+
+N_RESAMPLES = 10000
+CONFIDENCE = 0.95
+SEED = 0
+
+METRICS = ('start_f1', 'end_f1', 'segment_f1', 'segment_iou', 'pk', 'windiff')
+
+
+def load_compare_dir(compare_dir, unit='transcript'):
+    """Per-unit counts and Pk/WinDiff for every *_compare.csv in a directory.
+
+    Returns:
+        (names, counts, pk, windiff) — counts has shape (units, 3, 4)
+        (families x tp/tn/fp/fn); pk / windiff have shape (units,) and are
+        nan where undefined (no reference boundary, or story units).
+        With unit='story', each transcript is split at its human start
+        rows; rows before the first story form their own unit.
+    """
+    names, counts, pks, windiffs = [], [], [], []
+    for path in sorted(glob.glob(os.path.join(compare_dir, "*_compare.csv"))):
+        name = os.path.basename(path).rsplit("_compare.csv", 1)[0]
+        with open(path, 'r', encoding='utf-8') as file:
+            rows = [r for r in list(csv.reader(file))[1:] if len(r) >= 10]
+        if not rows:
+            continue
+        sh, sl, eh, el, hseg, lseg = (flags([r[c] for r in rows], ignore_case=True)
+                                      for c in (1, 2, 3, 4, 6, 7))
+
+        if unit == 'story':
+            cuts = np.flatnonzero(sh)
+            cuts = cuts[cuts > 0]
+            lengths = np.diff(np.concatenate(([0], cuts, [len(rows)])))
+        else:
+            lengths = np.array([len(rows)])
+        result = compare_labels(sh, eh, sl, el, lengths=lengths, human_segment=hseg, llm_segment=lseg)
+        unit_counts = np.stack([np.stack([result[f][k] for k in COUNT_KEYS], axis=-1) for f in FAMILIES],
+                               axis=1)
+
+        if unit == 'story':
+            names.extend(f"{name}#{j}" for j in range(len(lengths)))
+            pks.extend([np.nan] * len(lengths))
+            windiffs.extend([np.nan] * len(lengths))
+        else:
+            # Boundaries for Pk/WinDiff: start rows, first-row "boundary" dropped
+            ref, hyp = sh.astype(int), sl.astype(int)
+            ref[0] = hyp[0] = 0
+            _pk, _wd = pk_windiff(ref, hyp)
+            names.append(name)
+            pks.append(_pk)
+            windiffs.append(_wd)
+        counts.append(unit_counts)
+
+    if not counts:
+        return [], np.zeros((0, len(FAMILIES), len(COUNT_KEYS)), dtype=np.int64), np.zeros(0), np.zeros(0)
+    return names, np.concatenate(counts), np.array(pks, dtype=float), np.array(windiffs, dtype=float)
+
+
+def resample_weights(num_units, n_resamples, rng):
+    """(n_resamples, num_units) multiplicities of units drawn with replacement."""
+    draws = rng.integers(0, num_units, size=(n_resamples, num_units))
+    draws += np.arange(n_resamples)[:, None] * num_units
+    return np.bincount(draws.ravel(), minlength=n_resamples * num_units).reshape(n_resamples, num_units)
+
+
+def statistics(weights, counts, pk, windiff):
+    """All METRICS for each row of `weights`; returns {metric: (rows,) array}."""
+    weights = np.asarray(weights, dtype=float)
+    pooled = (weights @ counts.reshape(len(counts), -1).astype(float)).reshape(
+        len(weights), len(FAMILIES), len(COUNT_KEYS))
+    out = {}
+    for f, family in enumerate(FAMILIES):
+        family_rates = rates(*(pooled[:, f, c] for c in range(len(COUNT_KEYS))))
+        out[f"{family}_f1"] = family_rates['f1']
+        if family == 'segment':
+            out['segment_iou'] = family_rates['iou']
+    for metric, values in (('pk', pk), ('windiff', windiff)):
+        valid = ~np.isnan(values)
+        total = weights @ np.where(valid, values, 0.0)
+        n = weights @ valid.astype(float)
+        out[metric] = np.divide(total, n, out=np.full(len(weights), np.nan), where=n > 0)
+    return out
+
+
+def _interval(samples, confidence):
+    alpha = (1 - confidence) / 2
+    samples = samples[~np.isnan(samples)]
+    if len(samples) == 0:
+        return float('nan'), float('nan')
+    low, high = np.quantile(samples, [alpha, 1 - alpha])
+    return float(low), float(high)
+
+
+def bootstrap_ci(counts, pk, windiff, n_resamples=None, confidence=None, seed=None):
+    """Point estimate and percentile CI for every metric.
+
+    Returns:
+        {metric: (point, low, high)}
+    """
+    n_resamples = n_resamples or N_RESAMPLES
+    confidence = confidence or CONFIDENCE
+    rng = np.random.default_rng(SEED if seed is None else seed)
+    point = statistics(np.ones((1, len(counts))), counts, pk, windiff)
+    samples = statistics(resample_weights(len(counts), n_resamples, rng), counts, pk, windiff)
+    return {m: (float(point[m][0]), *_interval(samples[m], confidence)) for m in METRICS}
+
+
+def paired_difference_ci(first, second, n_resamples=None, confidence=None, seed=None):
+    """CI of (second - first) for every metric, resampling units jointly.
+
+    `first` and `second` are (counts, pk, windiff) tuples over the same
+    units in the same order.
+
+    Returns:
+        {metric: (difference, low, high)}
+    """
+    n_resamples = n_resamples or N_RESAMPLES
+    confidence = confidence or CONFIDENCE
+    rng = np.random.default_rng(SEED if seed is None else seed)
+    num_units = len(first[0])
+    ones = np.ones((1, num_units))
+    point_a, point_b = statistics(ones, *first), statistics(ones, *second)
+    weights = resample_weights(num_units, n_resamples, rng)
+    samples_a, samples_b = statistics(weights, *first), statistics(weights, *second)
+    return {m: (float(point_b[m][0] - point_a[m][0]), *_interval(samples_b[m] - samples_a[m], confidence))
+            for m in METRICS}
+
+
+def _align(loaded_a, loaded_b):
+    """Restrict two load_compare_dir() results to their shared units."""
+    names_a, names_b = loaded_a[0], loaded_b[0]
+    shared = sorted(set(names_a) & set(names_b))
+    index_a = {n: i for i, n in enumerate(names_a)}
+    index_b = {n: i for i, n in enumerate(names_b)}
+    ia = np.array([index_a[n] for n in shared], dtype=int)
+    ib = np.array([index_b[n] for n in shared], dtype=int)
+    return shared, tuple(x[ia] for x in loaded_a[1:]), tuple(x[ib] for x in loaded_b[1:])
+
+
+def build_parser():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("compare_dirs", nargs='+', metavar="COMPARE_DIR",
+                   help="One comparison directory, or two for a paired difference.")
+    p.add_argument("--resamples", type=int, default=N_RESAMPLES,
+                   help=f"Bootstrap resamples (default: {N_RESAMPLES}).")
+    p.add_argument("--confidence", type=float, default=CONFIDENCE,
+                   help=f"Confidence level (default: {CONFIDENCE}).")
+    p.add_argument("--seed", type=int, default=SEED, help=f"Random seed (default: {SEED}).")
+    p.add_argument("--unit", choices=['transcript', 'story'], default='transcript',
+                   help="Resample whole transcripts or human-annotated stories (default: transcript).")
+    return p
+
+
+def _print_rows(rows):
+    print(f"  {'Metric':<14} {'Estimate':>9} {'Low':>9} {'High':>9}")
+    print(f"  {'-'*14} {'-'*9} {'-'*9} {'-'*9}")
+    for metric, (point, low, high) in rows.items():
+        if np.isnan(point):
+            continue
+        print(f"  {metric:<14} {point:>9.4f} {low:>9.4f} {high:>9.4f}")
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if len(args.compare_dirs) > 2:
+        raise SystemExit("Give one comparison directory, or two for a paired difference.")
+
+    loaded = [load_compare_dir(d, args.unit) for d in args.compare_dirs]
+    level = f"{args.confidence:.0%}"
+    started = time.perf_counter()
+    for directory, (names, counts, pk, windiff) in zip(args.compare_dirs, loaded):
+        if not names:
+            raise SystemExit(f"No *_compare.csv files in {directory}/")
+        print(f"\n{'='*60}")
+        print(f"{directory}: {len(names)} {args.unit}(s), {args.resamples} resamples, {level} CI")
+        print(f"{'='*60}")
+        _print_rows(bootstrap_ci(counts, pk, windiff, args.resamples, args.confidence, args.seed))
+
+    if len(loaded) == 2:
+        shared, first, second = _align(*loaded)
+        print(f"\n{'='*60}")
+        print(f"Paired difference (second - first) over {len(shared)} shared {args.unit}(s), {level} CI")
+        print(f"{'='*60}")
+        _print_rows(paired_difference_ci(first, second, args.resamples, args.confidence, args.seed))
+    print(f"\nResampling time: {time.perf_counter() - started:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Small-Model-First LLM Cascade (Step 2 variant of the pipeline)
+
+Runs the same story-boundary algorithm as process_data.py, but routes each
+call through a two-tier model cascade instead of sending everything to the
+large model:
+
+    1. Summaries go to SUMMARY_TIER ("small" by default).
+    2. Every different-story verdict is first asked of the small tier in
+       constrained mode (see process_data.llm_verdict), which returns
+       P(TRUE) as a confidence score.
+    3. The verdict escalates to the large tier when
+       - the small model's confidence max(P, 1 - P) is below
+         CONFIDENCE_THRESHOLD, or
+       - the verdict falls in the audit sample (AUDIT_RATE of all
+         verdicts, seeded by AUDIT_SEED) and the large model disagrees.
+       In both cases the large model's verdict is used.
+
+    Small models that don't return logprobs report a confidence of 1.0,
+    so only the audit sample escalates for them.
+
+After labeling, every cascade output is compared against the single-large-
+model labels in BASELINE_DIR (a previous process_data.py run) using
+analysis.analyze_transcript(), with the baseline in the "human" slot.  The
+per-tier call counts / latency and the overall agreement are printed.
+
+One verdict call can cost more than one API request (a retry when the
+backend rejects logprobs, and the free-form fallback when the capped reply
+does not parse), so each tier's client counts the requests it actually
+sends, and the report shows requests next to calls.
+
+Input:    to-label/*.csv
+Baseline: labeled-out/*.csv               (single-large-model labels)
+Output:   cascade-out/*_labeled.csv
+          cascade-compare/*_compare.csv   (cascade vs baseline)
+
+Usage:
+    python cascade.py
+"""
+
+import os
+import glob
+import time
+import random
+from openai import OpenAI
+from dotenv import load_dotenv
+
+import analysis
+from join_parallel import CountingClient
+from process_data import llm_summary, llm_verdict, process_transcript
+
+load_dotenv()
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+INPUT_DIR = os.path.join(SCRIPT_DIR, "to-label")
+OUTPUT_DIR = os.path.join(SCRIPT_DIR, "cascade-out")
+BASELINE_DIR = os.path.join(SCRIPT_DIR, "labeled-out")
+COMPARE_DIR = os.path.join(SCRIPT_DIR, "cascade-compare")
+
+# Each tier: model name, OpenAI-compatible endpoint (None = api.openai.com)
+# and the environment variable holding its API key.
+TIERS = {
+    'small': {
+        'model': "openai/gpt-oss-20b",
+        'base_url': "https://router.huggingface.co/v1",
+        'api_key_env': "HF_TOKEN",
+    },
+    'large': {
+        'model': "openai/gpt-oss-120b",
+        'base_url': "https://router.huggingface.co/v1",
+        'api_key_env': "HF_TOKEN",
+    },
+}
+
+SUMMARY_TIER = 'small'
+CONFIDENCE_THRESHOLD = 0.9
+AUDIT_RATE = 0.05
+AUDIT_SEED = 0
+
+
+class Tier:
+    """One model of the cascade, with per-kind call, request and latency counters."""
+
+    def __init__(self, name, model, base_url=None, api_key_env="OPENAI_API_KEY"):
+        self.name = name
+        self.model = model
+        self.client = CountingClient(OpenAI(base_url=base_url, api_key=os.getenv(api_key_env)))
+        self.calls = {'summary': 0, 'verdict': 0}
+        self.requests = {'summary': 0, 'verdict': 0}
+        self.seconds = {'summary': 0.0, 'verdict': 0.0}
+
+    def _timed(self, kind, fn, *args, **kwargs):
+        sent = self.client.calls
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.calls[kind] += 1
+            self.requests[kind] += self.client.calls - sent
+            self.seconds[kind] += time.perf_counter() - started
+
+    def summary(self, content):
+        return self._timed('summary', llm_summary, content,
+                           llm_client=self.client, model=self.model)
+
+    def verdict(self, summary, content):
+        return self._timed('verdict', llm_verdict, summary, content, mode='constrained',
+                           llm_client=self.client, model=self.model)
+
+
+class Cascade:
+    """Small-first verdicts with confidence- and audit-based escalation."""
+
+    def __init__(self, small, large, summary_tier=None, threshold=None, audit_rate=None, seed=None):
+        self.small = small
+        self.large = large
+        self.summary_tier = small if (summary_tier or SUMMARY_TIER) == 'small' else large
+        self.threshold = CONFIDENCE_THRESHOLD if threshold is None else threshold
+        self.audit_rate = AUDIT_RATE if audit_rate is None else audit_rate
+        self.rng = random.Random(AUDIT_SEED if seed is None else seed)
+        self.escalated = 0
+        self.audited = 0
+        self.audit_disagreements = 0
+
+    def summary(self, content):
+        return self.summary_tier.summary(content)
+
+    def verdict(self, summary, content):
+        verdict, p_true = self.small.verdict(summary, content)
+        confidence = max(p_true, 1 - p_true)
+        if confidence < self.threshold:
+            self.escalated += 1
+            print(f"    Escalating (small-model confidence {confidence:.3f})")
+            return self.large.verdict(summary, content)
+        if self.rng.random() < self.audit_rate:
+            self.audited += 1
+            large_verdict, large_p_true = self.large.verdict(summary, content)
+            if large_verdict != verdict:
+                self.audit_disagreements += 1
+                print(f"    Audit disagreement: small={verdict}, large={large_verdict}")
+                return large_verdict, large_p_true
+        return verdict, p_true
+
+
+def print_tier_report(cascade, num_verdicts):
+    print(f"\n{'='*80}")
+    print("CASCADE - CALLS AND LATENCY PER TIER")
+    print(f"{'='*80}")
+    print(f"  {'Tier':<8} {'Model':<24} {'Kind':<8} {'Calls':>8} {'Requests':>9} {'Total s':>10} {'s/call':>8} "
+          f"{'s/req':>8}")
+    print(f"  {'-'*8} {'-'*24} {'-'*8} {'-'*8} {'-'*9} {'-'*10} {'-'*8} {'-'*8}")
+    for tier in (cascade.small, cascade.large):
+        for kind in ('summary', 'verdict'):
+            calls = tier.calls[kind]
+            requests = tier.requests[kind]
+            seconds = tier.seconds[kind]
+            per_call = seconds / calls if calls else 0
+            per_request = seconds / requests if requests else 0
+            print(f"  {tier.name:<8} {tier.model:<24} {kind:<8} {calls:>8} {requests:>9} {seconds:>10.1f} "
+                  f"{per_call:>8.3f} {per_request:>8.3f}")
+    print(f"\n  Verdicts: {num_verdicts}, escalated on low confidence: {cascade.escalated}, "
+          f"audited: {cascade.audited}, audit disagreements: {cascade.audit_disagreements}")
+
+
+def print_agreement_report(results):
+    """Aggregate analysis.analyze_transcript() results against the baseline."""
+    totals = {family: {'tp': 0, 'tn': 0, 'fp': 0, 'fn': 0} for family in ('start', 'end', 'segment')}
+    for _, metrics in results:
+        for family in totals:
+            for key in totals[family]:
+                totals[family][key] += metrics[family][key]
+
+    print(f"\n{'='*80}")
+    print("CASCADE - AGREEMENT WITH SINGLE-LARGE-MODEL LABELS")
+    print(f"{'='*80}")
+    print(f"  Files compared: {len(results)}")
+    for family in ('start', 'end', 'segment'):
+        t = totals[family]
+        total = t['tp'] + t['tn'] + t['fp'] + t['fn']
+        acc = (t['tp'] + t['tn']) / total if total > 0 else 0
+        prec = t['tp'] / (t['tp'] + t['fp']) if (t['tp'] + t['fp']) > 0 else 0
+        rec = t['tp'] / (t['tp'] + t['fn']) if (t['tp'] + t['fn']) > 0 else 0
+        f1 = 2 * (prec * rec) / (prec + rec) if (prec + rec) > 0 else 0
+        line = f"  {family.upper():<8} Acc: {acc:.4f}, Prec: {prec:.4f}, Rec: {rec:.4f}, F1: {f1:.4f}"
+        if family == 'segment':
+            denom = t['tp'] + t['fp'] + t['fn']
+            line += f", IoU: {t['tp'] / denom if denom > 0 else 0:.4f}"
+        print(line)
+
+
+def main():
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    os.makedirs(COMPARE_DIR, exist_ok=True)
+
+    input_files = glob.glob(os.path.join(INPUT_DIR, "*.csv"))
+    if not input_files:
+        print(f"No CSV files found in {INPUT_DIR}/")
+        return
+
+    cascade = Cascade(Tier('small', **TIERS['small']), Tier('large', **TIERS['large']))
+
+    num_verdicts = 0
+    results = []
+    for input_path in sorted(input_files):
+        name, ext = os.path.splitext(os.path.basename(input_path))
+        output_path = os.path.join(OUTPUT_DIR, f"{name}_labeled{ext}")
+        verdicts = process_transcript(input_path, output_path,
+                                      summarize=cascade.summary, verdict=cascade.verdict)
+        num_verdicts += len(verdicts)
+
+        # Same lookup order as analysis.main(): _labeled, _joined, exact name
+        baseline_path = None
+        for suffix in ['_labeled', '_joined', '']:
+            candidate = os.path.join(BASELINE_DIR, f"{name}{suffix}{ext}")
+            if os.path.exists(candidate):
+                baseline_path = candidate
+                break
+        if baseline_path is None:
+            print(f"\nWarning: no single-model baseline for {name}{ext} in {BASELINE_DIR}/")
+            continue
+        compare_path = os.path.join(COMPARE_DIR, f"{name}_compare{ext}")
+        results.append((name, analysis.analyze_transcript(baseline_path, output_path, compare_path)))
+
+    print_tier_report(cascade, num_verdicts)
+    print_agreement_report(results)
+
+
+if __name__ == "__main__":
+    main()
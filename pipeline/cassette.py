@@ -0,0 +1,187 @@
+"""
+Record / Replay Cassettes for the LLM Layer
+
+Lets process_data.py and join_fixed.py run against recorded LLM traffic
+instead of the network, so analysis reruns, profiling of the non-LLM code
+and scheduling benchmarks use real call patterns, run at local speed, are
+fully reproducible, and need no API keys.
+
+Modes (environment variable LLM_CASSETTE_MODE):
+    "off"    (default) — talk to the real client, record nothing.
+    "record" — talk to the real client and log every request/response pair
+               to one cassette per transcript.
+    "replay" — serve responses from the cassettes; no client (and no API
+               key) is needed.  A request that was never recorded raises
+               CassetteMiss.
+
+Cassettes live under LLM_CASSETTE_DIR (default: pipeline/cassettes/), one
+gzipped JSON file per script and transcript, e.g.
+cassettes/process_data/10.json.gz.  Each interaction stores a hash of the
+request (model, messages and parameters), the model name, and only the
+parts of the response the pipeline reads: the message text and the first
+token's top logprobs.  Rejected requests (BadRequestError, e.g. a backend
+refusing logprobs) are recorded too and re-raised on replay.
+
+When the same request is made several times in a transcript, replay serves
+the recorded responses in order and then repeats the last one.
+
+Usage (from a script):
+    with open_cassette("process_data", name, client) as llm_client:
+        ...  # pass llm_client wherever an OpenAI client is expected
+"""
+
+import os
+import json
+import gzip
+import hashlib
+from collections import defaultdict, deque
+from types import SimpleNamespace
+
+from openai import BadRequestError
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off")
+CASSETTE_DIR = os.getenv("LLM_CASSETTE_DIR", os.path.join(SCRIPT_DIR, "cassettes"))
+
+if CASSETTE_MODE not in ('off', 'record', 'replay'):
+    raise ValueError(f"Unknown LLM_CASSETTE_MODE: {CASSETTE_MODE}")
+
+REPLAYING = CASSETTE_MODE == 'replay'
+
+CASSETTE_VERSION = 1
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode for a request that is not in the cassette."""
+
+
+def request_key(kwargs):
+    """Stable hash of a chat.completions.create() request."""
+    canonical = json.dumps(kwargs, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:24]
+
+
+def _from_response(response):
+    """Keep only what the pipeline reads from a completion."""
+    choice = response.choices[0]
+    top_logprobs = None
+    logprobs = getattr(choice, 'logprobs', None)
+    content = getattr(logprobs, 'content', None) if logprobs else None
+    if content:
+        top_logprobs = [[c.token, c.logprob] for c in content[0].top_logprobs or []]
+    return {'content': choice.message.content, 'top_logprobs': top_logprobs}
+
+
+def _to_response(data):
+    """Rebuild a minimal completion object from a recorded response."""
+    logprobs = None
+    if data['top_logprobs'] is not None:
+        top = [SimpleNamespace(token=token, logprob=logprob) for token, logprob in data['top_logprobs']]
+        logprobs = SimpleNamespace(content=[SimpleNamespace(top_logprobs=top)])
+    choice = SimpleNamespace(message=SimpleNamespace(content=data['content']), logprobs=logprobs)
+    return SimpleNamespace(choices=[choice])
+
+
+class ReplayedBadRequest(BadRequestError):
+    """A recorded BadRequestError, re-raised on replay without an HTTP response."""
+
+    def __init__(self, message):
+        Exception.__init__(self, message)
+        self.message = message
+        self.status_code = 400
+
+
+class _Completions:
+    def __init__(self, cassette):
+        self._cassette = cassette
+
+    def create(self, **kwargs):
+        return self._cassette.create(**kwargs)
+
+
+class Cassette:
+    """An OpenAI-client stand-in that records to or replays from one file.
+
+    Only `chat.completions.create(**kwargs)` is provided, which is all the
+    pipeline uses.
+    """
+
+    def __init__(self, path, mode, client=None):
+        self.path = path
+        self.mode = mode
+        self.client = client
+        self.chat = SimpleNamespace(completions=_Completions(self))
+        self.interactions = []
+        self._replay = defaultdict(deque)
+        self._last = {}
+        self.hits = 0
+        if mode == 'replay':
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No cassette to replay: {path}")
+            with gzip.open(path, 'rt', encoding='utf-8') as file:
+                data = json.load(file)
+            for interaction in data['interactions']:
+                self._replay[interaction['key']].append(interaction)
+
+    def create(self, **kwargs):
+        key = request_key(kwargs)
+        if self.mode == 'replay':
+            queue = self._replay.get(key)
+            if queue:
+                interaction = queue.popleft()
+                self._last[key] = interaction
+            elif key in self._last:
+                interaction = self._last[key]
+            else:
+                raise CassetteMiss(f"{self.path}: no recorded response for {kwargs.get('model')} request {key}")
+            self.hits += 1
+            if 'error' in interaction:
+                raise ReplayedBadRequest(interaction['error'])
+            return _to_response(interaction['response'])
+
+        interaction = {'key': key, 'model': kwargs.get('model')}
+        try:
+            response = self.client.chat.completions.create(**kwargs)
+        except BadRequestError as e:
+            interaction['error'] = str(e)
+            self.interactions.append(interaction)
+            raise
+        interaction['response'] = _from_response(response)
+        self.interactions.append(interaction)
+        return response
+
+    def save(self):
+        """Write recorded interactions (record mode only)."""
+        if self.mode != 'record':
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with gzip.open(self.path, 'wt', encoding='utf-8') as file:
+            json.dump({'version': CASSETTE_VERSION, 'interactions': self.interactions},
+                      file, separators=(',', ':'), ensure_ascii=False)
+
+
+class open_cassette:
+    """Context manager yielding the client to use for one transcript.
+
+    In "off" mode this is `client` itself; otherwise a Cassette for
+    CASSETTE_DIR/<script>/<name>.json.gz that is saved on exit (also after
+    an error, so a partial recording is kept).
+    """
+
+    def __init__(self, script, name, client, mode=None):
+        self.mode = mode or CASSETTE_MODE
+        self.path = os.path.join(CASSETTE_DIR, script, f"{name}.json.gz")
+        self.client = client
+        self.cassette = None
+
+    def __enter__(self):
+        if self.mode == 'off':
+            return self.client
+        self.cassette = Cassette(self.path, self.mode, self.client)
+        return self.cassette
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.cassette is not None:
+            self.cassette.save()
+        return False
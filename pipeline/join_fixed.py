@@ -12,22 +12,48 @@ See join.py module docstring for a full description of the algorithm.
 Input:  labeled-out/*_labeled.csv   (from process_data.py)
 Output: joined-out/*_joined.csv
 
+Segment summaries go through a SummaryMemo, keyed by (start_row, end_row)
+and kept for the lifetime of a transcript, so rescans after a merge never
+summarise the same span twice.  The memo is seeded from the segment sidecar
+process_data.py leaves next to the labeled CSV (*_labeled.segments.json),
+so a labeled segment is not summarised again.  A sidecar summary is the
+labeling step's last running summary, which stops just before the segment's
+end row; it is used for the whole segment as an approximation (see
+process_data.segment_summaries()).  The number of avoided calls is
+printed per run.  After a merge the scan restarts at the second segment's
+start row, so this join never asks for a merged span; summarising merged
+spans from their parts (MERGE_FROM_PARTS) applies only to join_parallel.py,
+which shares the SummaryMemo.
+
+With PREMERGE = True, each adjacent pair is first scored by a local
+sentence-embedding similarity (premerge.py); clear-cut pairs are merged or
+kept apart without an llm_combine_stories() call, and the number of
+combine calls avoided is printed per transcript.
+
+LLM traffic can be recorded to / replayed from per-transcript cassettes by
+setting LLM_CASSETTE_MODE=record|replay (see cassette.py).
+
 Usage:
     python join_fixed.py
 """
 
 import os
-import csv
 import glob
+import threading
 from openai import OpenAI
 from dotenv import load_dotenv
 
+from cassette import REPLAYING, open_cassette
+from premerge import PreMerger
+from process_data import read_rows, write_rows, read_segments
+
 load_dotenv()
 
 # To use OpenAI directly, uncomment and swap with the HF block below.
 # client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-client = OpenAI(
+# No client (and no API key) is needed when replaying cassettes.
+client = None if REPLAYING else OpenAI(
     base_url="https://router.huggingface.co/v1",
     api_key=os.getenv("HF_TOKEN")
 )
@@ -36,9 +62,17 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 INPUT_DIR = os.path.join(SCRIPT_DIR, "labeled-out")
 OUTPUT_DIR = os.path.join(SCRIPT_DIR, "joined-out")
 
-def llm_summary(content):
+# Summarise a merged span from its two parts' summaries rather than its lines
+# (join_parallel.py; join_rows() below never asks for a merged span).
+MERGE_FROM_PARTS = True
+
+# Decide clear-cut pairs from embeddings before asking the LLM (see
+# premerge.py; needs sentence-transformers).
+PREMERGE = False
+
+def llm_summary(content, llm_client=None):
     """Summarize a transcript excerpt (same prompt as process_data.py)."""
-    response = client.chat.completions.create(
+    response = (llm_client or client).chat.completions.create(
         model="openai/gpt-oss-120b",
         messages=[
             {"role": "user", "content": f'''What is the following story about? Note that the story is complete,
@@ -53,17 +87,18 @@ def llm_summary(content):
     )
     return response.choices[0].message.content
 
-def llm_combine_stories(summary1, summary2):
+def llm_combine_stories(summary1, summary2, llm_client=None):
     """Ask the LLM whether two segment summaries describe the same story.
 
     Args:
         summary1: Summary of the first (earlier) segment.
         summary2: Summary of the second (later) segment.
+        llm_client: OpenAI-compatible client to use (default: module `client`).
 
     Returns:
         'TRUE' if the LLM considers them the same story, 'FALSE' otherwise.
     """
-    response = client.chat.completions.create(
+    response = (llm_client or client).chat.completions.create(
         model="openai/gpt-oss-120b",
         messages=[
             {"role": "user", "content": f'''Consider the following summary of a story: {summary1}. \n Now
@@ -76,52 +111,89 @@ def llm_combine_stories(summary1, summary2):
     )
     return response.choices[0].message.content
 
-def create_output_file(input_path, output_path):
-    """Copy the labeled CSV to the output path (preserving existing labels)."""
-    with open(input_path, 'r', encoding='utf-8') as file:
-        reader = csv.reader(file)
-        rows = list(reader)
-    
-    with open(output_path, 'w', encoding='utf-8', newline='') as file:
-        writer = csv.writer(file)
-        
-        # Write header row as-is
-        writer.writerow(rows[0])
-        
-        # Write data rows with start and end set to FALSE
-        index = 1
-        while index < len(rows):
-            row = rows[index]
-            writer.writerow(row)
-            index += 1
-
-
-def update_output_row(output_path, row_index, start_value=None, end_value=None):
-    """Update a specific row in the output file."""
-    with open(output_path, 'r', encoding='utf-8') as file:
-        reader = csv.reader(file)
-        rows = list(reader)
-    
-    # row_index is 1-based (matching the data), rows[0] is header
-    if start_value is not None:
-        rows[row_index][1] = start_value
-    if end_value is not None:
-        rows[row_index][2] = end_value
-    
-    with open(output_path, 'w', encoding='utf-8', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerows(rows)
+class SummaryMemo:
+    """Span-keyed segment summaries for the lifetime of one transcript.
+
+    Spans are (start_row, end_row) pairs, both inclusive, with rows[0]
+    being the header.  Counters:
+        sidecar    — lookups served by a process_data.py sidecar summary
+        memo       — lookups served by a summary computed earlier here
+        requested  — llm_summary() calls made
+        from_parts — of those, merged spans summarised from their parts
+    """
+
+    def __init__(self, rows, llm_client=None, known=None, merge_from_parts=None):
+        self.rows = rows
+        self.llm_client = llm_client
+        self.merge_from_parts = MERGE_FROM_PARTS if merge_from_parts is None else merge_from_parts
+        self.summaries = dict(known or {})
+        self.sidecar_spans = set(self.summaries)
+        self.parts = {}
+        self.lock = threading.Lock()
+        self.stats = {'sidecar': 0, 'memo': 0, 'requested': 0, 'from_parts': 0}
+
+    def record_merge(self, first, second):
+        """Remember that span first+second was formed by merging two spans."""
+        self.parts[(first[0], second[1])] = (first, second)
+
+    def lines(self, start, end):
+        """Transcript lines of a span."""
+        return [row[3] for row in self.rows[start:end+1]]
+
+    def get(self, start, end):
+        span = (start, end)
+        with self.lock:
+            if span in self.summaries:
+                kind = 'sidecar' if span in self.sidecar_spans else 'memo'
+                self.stats[kind] += 1
+                print(f"    Reusing {kind} summary for lines {start}-{end}")
+                return self.summaries[span]
+        if self.merge_from_parts and span in self.parts:
+            first, second = self.parts[span]
+            content = self.get(*first) + '\n' + self.get(*second)
+            kind = 'from_parts'
+        else:
+            content = '\n'.join(self.lines(start, end))
+            kind = None
+        summary = llm_summary(content, self.llm_client)
+        with self.lock:
+            self.stats['requested'] += 1
+            if kind:
+                self.stats[kind] += 1
+            self.summaries[span] = summary
+        return summary
+
+
+def combine_segments(memo, first, second, summary1, summary2, llm_client=None, premerger=None):
+    """Same-story verdict for two adjacent spans, pre-merging clear-cut pairs."""
+    if premerger is not None:
+        verdict = premerger.decide((summary1, memo.lines(*first)), (summary2, memo.lines(*second)))
+        if verdict is not None:
+            return verdict
+    return llm_combine_stories(summary1, summary2, llm_client)
+
+
+def join_rows(rows, llm_client=None, known=None, premerger=None):
+    """Merge over-segmented stories in one labeled transcript, in memory.
+
+    Args:
+        rows: Labeled rows (rows[0] is the header); not modified.
+        llm_client: OpenAI-compatible client to use (default: module `client`).
+        known: {(start, end): summary} already computed for spans, e.g.
+            from process_data.segment_summaries() (whose summaries
+            approximate their segments).
+        premerger: Optional PreMerger deciding clear-cut pairs.
+
+    Returns:
+        (out_rows, stats) — the joined rows and the SummaryMemo stats dict
+        (sidecar / memo / requested counts; from_parts stays 0), plus the
+        PreMerger's counters prefixed with "pre_" when one is given.
+    """
+    out_rows = [list(row) for row in rows]
+    memo = SummaryMemo(rows, llm_client, known=known)
 
-def process_transcript(input_path, output_path):
-    # Create the output file
-    create_output_file(input_path, output_path)
-    
-    # Read the rows
-    with open(input_path, 'r', encoding='utf-8') as file:
-        reader = csv.reader(file)
-        rows = list(reader)
-    
     summary1 = 'EMP'
+    summary1_start = None
     start_index = None
     end_index = None
     
@@ -134,30 +206,50 @@ def process_transcript(input_path, output_path):
                 print(f"  Line {i}: Found segment END (segment: lines {start_index}-{i})")
                 if summary1 == 'EMP':
                     print(f"    Summarizing first segment...")
-                    summary1 = llm_summary('\n'.join(row[3] for row in rows[start_index:i+1]))
+                    summary1 = memo.get(start_index, i)
+                    summary1_start = start_index
                     end_index = i
                     print(f"    Summary1: {summary1[:80]}...")
                 else:
                     print(f"    Summarizing second segment...")
-                    summary2 = llm_summary('\n'.join(row[3] for row in rows[start_index:i+1]))
+                    summary2 = memo.get(start_index, i)
                     print(f"    Summary2: {summary2[:80]}...")
                     print(f"    Comparing summaries...")
-                    combine_stories = llm_combine_stories(summary1, summary2)
+                    combine_stories = combine_segments(memo, (summary1_start, end_index), (start_index, i),
+                                                       summary1, summary2, llm_client, premerger)
                     print(f"    Same story? {combine_stories}")
                     if combine_stories == 'TRUE':
                         print(f"    MERGING: Removing boundary at lines {end_index} (end) and {start_index} (start)")
-                        update_output_row(output_path, start_index, start_value='FALSE')
-                        update_output_row(output_path, end_index, end_value='FALSE')
+                        out_rows[start_index][1] = 'FALSE'
+                        out_rows[end_index][2] = 'FALSE'
                         summary1 = 'EMP'
                         i = start_index
                         print(f"    Resetting to line {start_index} to re-scan merged segment")
                     else:
                         summary1 = summary2
+                        summary1_start = start_index
                         end_index = i
                         print(f"    Different stories. Moving on.")
                         
         i += 1
 
+    stats = dict(memo.stats)
+    if premerger is not None:
+        stats.update({f"pre_{key}": value for key, value in premerger.stats.items()})
+    return out_rows, stats
+
+
+def process_transcript(input_path, output_path, llm_client=None, premerger=None):
+    """Join one labeled CSV and write its _joined.csv once.
+
+    Summaries are seeded from the process_data.py sidecar if present.
+    Returns the stats dict from join_rows().
+    """
+    rows = read_rows(input_path)
+    out_rows, stats = join_rows(rows, llm_client, known=read_segments(input_path), premerger=premerger)
+    write_rows(output_path, out_rows)
+    return stats
+
 
 def main():
     # Create output directory if it doesn't exist
@@ -168,11 +260,25 @@ def main():
     csv_files.sort()
     
     # Process each CSV file
+    totals = {'sidecar': 0, 'memo': 0, 'requested': 0}
     for csv_file in csv_files:
         filename = os.path.basename(csv_file)
         output_path = os.path.join(OUTPUT_DIR, filename.replace('_labeled', '_joined'))
         print(f"Processing: {filename}")
-        process_transcript(csv_file, output_path)
+        name = os.path.splitext(filename)[0].replace('_labeled', '')
+        with open_cassette('join_fixed', name, client) as llm_client:
+            premerger = PreMerger() if PREMERGE else None
+            stats = process_transcript(csv_file, output_path, llm_client, premerger)
+        if premerger is not None:
+            avoided = stats['pre_merged'] + stats['pre_split']
+            print(f"  Pre-merge: {stats['pre_merged']} merged, {stats['pre_split']} kept apart, "
+                  f"{stats['pre_asked']} sent to the LLM ({avoided} combine calls avoided)")
+        for key in totals:
+            totals[key] += stats[key]
+
+    avoided = totals['sidecar'] + totals['memo']
+    print(f"Segment summaries: {totals['requested']} requested, {avoided} calls avoided "
+          f"({totals['sidecar']} from process_data sidecars, {totals['memo']} from the span memo)")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,310 @@
+"""
+Round-Based Parallel Join (Step 3 variant of the pipeline)
+
+join_fixed.py compares adjacent segments strictly left to right: every
+comparison waits on two summaries and an llm_combine_stories() call, so a
+transcript with S segments costs O(S) sequential round trips (more after
+the rescans that follow a merge).  This script makes the same kind of
+decisions in rounds instead:
+
+    1. Summarise every current segment concurrently (through the same
+       span-keyed SummaryMemo as join_fixed.py, seeded from the
+       process_data.py sidecar); a merged group is summarised from its
+       parts' summaries (join_fixed.MERGE_FROM_PARTS).
+    2. Ask every adjacent pair whose answer is not yet known whether the
+       two segments are the same story, concurrently.
+    3. Merge all positive pairs with a union-find; each merged group
+       becomes one segment for the next round.
+
+Rounds repeat until a round merges nothing.  Pairs answered FALSE are
+remembered by their spans and not asked again while neither side changes.
+With S segments the number of sequential round trips drops from O(S) to
+two per round, and most transcripts settle within a few rounds.
+
+The output has exactly the _joined.csv format of join_fixed.py: the
+labeled rows with the end marker of A and the start marker of B cleared
+for every merged boundary, written once per transcript.
+
+With --compare, join_fixed.process_transcript() is also run on each file
+(into a temporary directory) and the rounds, LLM calls and wall time of
+both algorithms are reported side by side, together with the number of
+files whose boundaries differ.
+
+With --premerge, each round's pairs are first scored locally by embedding
+similarity (premerge.py) and only pairs inside the ambiguity band are sent
+to the LLM; the number of combine calls avoided is reported per file.
+
+Input:  labeled-out/*_labeled.csv   (from process_data.py)
+Output: joined-out/*_joined.csv
+
+Usage:
+    python join_parallel.py [--workers N] [--compare]
+                            [--premerge [--merge-above X] [--split-below Y] [--embed-source S]]
+"""
+
+import os
+import glob
+import time
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import join_fixed
+import premerge
+from cassette import open_cassette
+from join_fixed import SummaryMemo, llm_combine_stories
+from premerge import PreMerger
+from process_data import read_rows, write_rows, read_segments
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+INPUT_DIR = os.path.join(SCRIPT_DIR, "labeled-out")
+OUTPUT_DIR = os.path.join(SCRIPT_DIR, "joined-out")
+
+# Concurrent in-flight LLM requests per transcript.
+MAX_WORKERS = 8
+
+
+class CountingClient:
+    """Wraps an OpenAI-compatible client and counts chat completions."""
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = self
+        self.completions = self
+
+    def create(self, **kwargs):
+        with self._lock:
+            self.calls += 1
+        return self.client.chat.completions.create(**kwargs)
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1; find() returns the smallest member."""
+
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, x):
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # Keep the leftmost segment as the representative
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def find_segments(rows):
+    """(start_row, end_row) spans of the labeled segments, as join_fixed reads them."""
+    segments = []
+    start_index = None
+    for i in range(1, len(rows)):
+        if rows[i][1] == 'TRUE':
+            start_index = i
+        if rows[i][2] == 'TRUE' and start_index is not None:
+            segments.append((start_index, i))
+    return segments
+
+
+def join_rows(rows, llm_client=None, known=None, workers=None, premerger=None):
+    """Merge adjacent same-story segments in rounds.
+
+    Returns:
+        (out_rows, stats) — the joined rows (header included) and a dict of
+        rounds, merges, combine calls and SummaryMemo counters (plus the
+        PreMerger's counters prefixed with "pre_" when one is given).
+    """
+    memo = SummaryMemo(rows, llm_client, known=known)
+    segments = find_segments(rows)
+    different = set()  # (span_a, span_b) pairs already answered FALSE
+    merged_boundaries = []
+    stats = {'rounds': 0, 'merges': 0, 'combine': 0}
+
+    with ThreadPoolExecutor(max_workers=workers or MAX_WORKERS) as pool:
+        while len(segments) > 1:
+            stats['rounds'] += 1
+            summaries = list(pool.map(lambda span: memo.get(*span), segments))
+
+            pairs = [k for k in range(len(segments) - 1)
+                     if (segments[k], segments[k + 1]) not in different]
+            if not pairs:
+                break
+
+            # Embedding decisions are local, so they run before the LLM fan-out
+            answers = {}
+            if premerger is not None:
+                for k in pairs:
+                    answer = premerger.decide((summaries[k], memo.lines(*segments[k])),
+                                              (summaries[k + 1], memo.lines(*segments[k + 1])))
+                    if answer is not None:
+                        answers[k] = answer
+            asked = [k for k in pairs if k not in answers]
+            answers.update(zip(asked, pool.map(
+                lambda k: llm_combine_stories(summaries[k], summaries[k + 1], llm_client), asked)))
+            stats['combine'] += len(asked)
+
+            uf = UnionFind(len(segments))
+            for k in pairs:
+                answer = answers[k]
+                if answer == 'TRUE':
+                    uf.union(k, k + 1)
+                else:
+                    different.add((segments[k], segments[k + 1]))
+
+            # Groups are contiguous runs, so walking left to right and
+            # extending the current group rebuilds the segment list.
+            next_segments = []
+            for k, span in enumerate(segments):
+                if next_segments and uf.find(k) == uf.find(k - 1):
+                    previous = next_segments[-1]
+                    merged_boundaries.append((previous[1], span[0]))
+                    merged = (previous[0], span[1])
+                    memo.record_merge(previous, span)
+                    next_segments[-1] = merged
+                else:
+                    next_segments.append(span)
+
+            round_merges = len(segments) - len(next_segments)
+            print(f"  Round {stats['rounds']}: {len(segments)} segments, {len(pairs)} pairs asked, "
+                  f"{round_merges} merged")
+            if round_merges == 0:
+                break
+            stats['merges'] += round_merges
+            segments = next_segments
+
+    out_rows = [list(row) for row in rows]
+    for end_index, start_index in merged_boundaries:
+        out_rows[end_index][2] = 'FALSE'
+        out_rows[start_index][1] = 'FALSE'
+
+    stats.update(memo.stats)
+    if premerger is not None:
+        stats.update({f"pre_{key}": value for key, value in premerger.stats.items()})
+    return out_rows, stats
+
+
+def process_transcript(input_path, output_path, llm_client=None, workers=None, premerger=None):
+    """Join one labeled transcript and write its _joined.csv once."""
+    rows = read_rows(input_path)
+    out_rows, stats = join_rows(rows, llm_client, known=read_segments(input_path), workers=workers,
+                                premerger=premerger)
+    write_rows(output_path, out_rows)
+    return stats
+
+
+def boundaries(path):
+    rows = read_rows(path)
+    return [(row[1], row[2]) for row in rows[1:]]
+
+
+def run_sequential(csv_file, llm_client, premerger=None):
+    """Run join_fixed on one file into a temp dir; returns (calls, seconds, output rows)."""
+    counting = CountingClient(llm_client)
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = os.path.join(tmp, os.path.basename(csv_file))
+        started = time.perf_counter()
+        join_fixed.process_transcript(csv_file, output_path, counting, premerger)
+        elapsed = time.perf_counter() - started
+        return counting.calls, elapsed, boundaries(output_path)
+
+
+def build_parser():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--input-dir", default=INPUT_DIR,
+                   help="Directory of labeled CSVs (default: labeled-out/).")
+    p.add_argument("--workers", type=int, default=MAX_WORKERS,
+                   help=f"Concurrent LLM requests per transcript (default: {MAX_WORKERS}).")
+    p.add_argument("--compare", action="store_true",
+                   help="Also run the sequential join_fixed algorithm and report both.")
+    p.add_argument("--premerge", action="store_true",
+                   help="Decide clear-cut pairs from embeddings before asking the LLM.")
+    p.add_argument("--merge-above", type=float, default=premerge.MERGE_ABOVE,
+                   help=f"Merge without the LLM at or above this similarity (default: {premerge.MERGE_ABOVE}).")
+    p.add_argument("--split-below", type=float, default=premerge.SPLIT_BELOW,
+                   help=f"Keep apart without the LLM below this similarity (default: {premerge.SPLIT_BELOW}).")
+    p.add_argument("--embed-source", choices=['summary', 'lines'], default=premerge.EMBED_SOURCE,
+                   help=f"What to embed per segment (default: {premerge.EMBED_SOURCE}).")
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    csv_files = sorted(glob.glob(os.path.join(args.input_dir, '*.csv')))
+    if not csv_files:
+        print(f"No CSV files found in {args.input_dir}/")
+        return
+
+    results = []
+    for csv_file in csv_files:
+        filename = os.path.basename(csv_file)
+        output_path = os.path.join(OUTPUT_DIR, filename.replace('_labeled', '_joined'))
+        name = os.path.splitext(filename)[0].replace('_labeled', '')
+        print(f"Processing: {filename}")
+
+        def new_premerger():
+            if not args.premerge:
+                return None
+            return PreMerger(args.merge_above, args.split_below, args.embed_source)
+
+        with open_cassette('join_parallel', name, join_fixed.client) as llm_client:
+            counting = CountingClient(llm_client)
+            started = time.perf_counter()
+            stats = process_transcript(csv_file, output_path, counting, args.workers, new_premerger())
+            stats['calls'] = counting.calls
+            stats['seconds'] = time.perf_counter() - started
+
+        if args.compare:
+            with open_cassette('join_fixed', name, join_fixed.client) as llm_client:
+                calls, seconds, sequential = run_sequential(csv_file, llm_client, new_premerger())
+            stats['seq_calls'] = calls
+            stats['seq_seconds'] = seconds
+            stats['same_output'] = sequential == boundaries(output_path)
+        results.append((name, stats))
+
+    print(f"\n{'='*80}")
+    print("ROUND-BASED JOIN SUMMARY")
+    print(f"{'='*80}")
+    header = f"  {'File':<12} {'Rounds':>6} {'Merges':>6} {'Calls':>6} {'Wall s':>8}"
+    if args.compare:
+        header += f" {'Seq calls':>9} {'Seq s':>8} {'Speedup':>8} {'Same':>5}"
+    if args.premerge:
+        header += f" {'Pre-merged':>10} {'Pre-split':>9} {'Avoided':>7}"
+    print(header)
+    for name, stats in results:
+        line = (f"  {name:<12} {stats['rounds']:>6} {stats['merges']:>6} "
+                f"{stats['calls']:>6} {stats['seconds']:>8.2f}")
+        if args.compare:
+            speedup = stats['seq_seconds'] / stats['seconds'] if stats['seconds'] > 0 else 0
+            line += (f" {stats['seq_calls']:>9} {stats['seq_seconds']:>8.2f} {speedup:>7.1f}x "
+                     f"{'yes' if stats['same_output'] else 'no':>5}")
+        if args.premerge:
+            line += (f" {stats['pre_merged']:>10} {stats['pre_split']:>9} "
+                     f"{stats['pre_merged'] + stats['pre_split']:>7}")
+        print(line)
+
+    total_calls = sum(s['calls'] for _, s in results)
+    total_seconds = sum(s['seconds'] for _, s in results)
+    print(f"\n  Total: {total_calls} calls, {total_seconds:.1f} s wall")
+    if args.premerge:
+        avoided = sum(s['pre_merged'] + s['pre_split'] for _, s in results)
+        print(f"  Combine calls avoided by the embedding pre-merge: {avoided}")
+    if args.compare:
+        seq_calls = sum(s['seq_calls'] for _, s in results)
+        seq_seconds = sum(s['seq_seconds'] for _, s in results)
+        differing = sum(1 for _, s in results if not s['same_output'])
+        print(f"  Sequential join_fixed: {seq_calls} calls, {seq_seconds:.1f} s wall")
+        print(f"  Files with different boundaries: {differing} of {len(results)}")
+
+
+if __name__ == "__main__":
+    main()
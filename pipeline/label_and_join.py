@@ -0,0 +1,137 @@
+"""
+Fused Label-and-Join Pipeline (Steps 2 + 3 in one command)
+
+Running process_data.py and then join_fixed.py writes every labeled CSV,
+re-reads it, and only starts joining once the whole batch is labeled.
+This command runs both steps per transcript, in memory:
+
+    1. The input CSV is read once (process_data.read_rows).
+    2. process_data.label_rows() labels it; the labeled CSV and its
+       segment sidecar are written once, for analysis.py and reruns.
+    3. The labeled rows and the segment summaries label_rows() computed
+       go straight to the joiner (join_fixed.join_rows, or
+       join_parallel.join_rows with --joiner rounds), with no CSV round
+       trip, and the joined CSV is written once.
+
+Transcripts run concurrently on TRANSCRIPT_WORKERS threads, so a
+transcript's join starts as soon as its own labeling finishes rather than
+after the whole batch.
+
+The output files are the same as those of the two separate steps:
+labeled-out/{name}_labeled.csv (+ .segments.json) and
+joined-out/{name}_joined.csv.  With LLM_CASSETTE_MODE set, the labeling
+and join phases use the process_data / join_fixed (or join_parallel)
+cassettes, so recordings made by the separate scripts replay here.
+
+Usage:
+    python label_and_join.py [--joiner sequential|rounds] [--jobs N]
+                             [--detector summary|sliding] [--premerge]
+"""
+
+import os
+import glob
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import process_data
+import join_fixed
+import join_parallel
+from cassette import open_cassette
+from premerge import PreMerger
+from process_data import read_rows, write_rows, write_segments, label_rows, segment_summaries
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+INPUT_DIR = os.path.join(SCRIPT_DIR, "to-label")
+LABELED_DIR = os.path.join(SCRIPT_DIR, "labeled-out")
+JOINED_DIR = os.path.join(SCRIPT_DIR, "joined-out")
+
+# Transcripts labeled and joined at the same time.
+TRANSCRIPT_WORKERS = 4
+
+
+def label_and_join(input_path, joiner='sequential', detector=None, premerge=False):
+    """Label and join one transcript; returns a dict of counts and timings."""
+    name, ext = os.path.splitext(os.path.basename(input_path))
+    labeled_path = os.path.join(LABELED_DIR, f"{name}_labeled{ext}")
+    joined_path = os.path.join(JOINED_DIR, f"{name}_joined{ext}")
+    print(f"Processing: {input_path}")
+
+    started = time.perf_counter()
+    rows = read_rows(input_path)
+    with open_cassette('process_data', name, process_data.client) as llm_client:
+        labeled, verdicts, segments = label_rows(rows, detector=detector, llm_client=llm_client)
+    write_rows(labeled_path, labeled)
+    write_segments(labeled_path, segments)
+    labeled_at = time.perf_counter()
+
+    premerger = PreMerger() if premerge else None
+    known = segment_summaries(segments)
+    if joiner == 'rounds':
+        with open_cassette('join_parallel', name, join_fixed.client) as llm_client:
+            joined, stats = join_parallel.join_rows(labeled, llm_client, known=known, premerger=premerger)
+    else:
+        with open_cassette('join_fixed', name, join_fixed.client) as llm_client:
+            joined, stats = join_fixed.join_rows(labeled, llm_client, known=known, premerger=premerger)
+    write_rows(joined_path, joined)
+    finished = time.perf_counter()
+
+    print(f"  [{name}] wrote {labeled_path} and {joined_path}")
+    return {
+        'name': name,
+        'verdicts': len(verdicts),
+        'segments': len(segments),
+        'merges': sum(1 for a, b in zip(labeled[1:], joined[1:]) if a[1] != b[1]),
+        'summaries_requested': stats['requested'],
+        'label_seconds': labeled_at - started,
+        'join_seconds': finished - labeled_at,
+    }
+
+
+def build_parser():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--input-dir", default=INPUT_DIR,
+                   help="Directory of human-labeled CSVs (default: to-label/).")
+    p.add_argument("--joiner", choices=['sequential', 'rounds'], default='sequential',
+                   help="join_fixed's left-to-right join or join_parallel's rounds (default: sequential).")
+    p.add_argument("--jobs", type=int, default=TRANSCRIPT_WORKERS,
+                   help=f"Transcripts processed at once (default: {TRANSCRIPT_WORKERS}).")
+    p.add_argument("--detector", choices=['summary', 'sliding'], default=None,
+                   help="Detector mode (default: process_data.DETECTOR_MODE).")
+    p.add_argument("--premerge", action="store_true",
+                   help="Apply the embedding pre-merge (premerge.py) in the join.")
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    os.makedirs(LABELED_DIR, exist_ok=True)
+    os.makedirs(JOINED_DIR, exist_ok=True)
+
+    input_files = sorted(glob.glob(os.path.join(args.input_dir, "*.csv")))
+    if not input_files:
+        print(f"No CSV files found in {args.input_dir}/")
+        return
+
+    started = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(label_and_join, path, args.joiner, args.detector, args.premerge)
+                   for path in input_files]
+        for future in as_completed(futures):
+            results.append(future.result())
+    elapsed = time.perf_counter() - started
+
+    print(f"\n{'='*80}")
+    print("LABEL + JOIN SUMMARY")
+    print(f"{'='*80}")
+    print(f"  {'File':<12} {'Verdicts':>9} {'Segments':>9} {'Merges':>7} {'Summaries':>10} "
+          f"{'Label s':>8} {'Join s':>8}")
+    for r in sorted(results, key=lambda r: r['name']):
+        print(f"  {r['name']:<12} {r['verdicts']:>9} {r['segments']:>9} {r['merges']:>7} "
+              f"{r['summaries_requested']:>10} {r['label_seconds']:>8.1f} {r['join_seconds']:>8.1f}")
+    print(f"\n  Joiner: {args.joiner}, wall time: {elapsed:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
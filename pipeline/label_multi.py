@@ -0,0 +1,225 @@
+"""
+Concurrent Multi-Model Labeling (Step 2 variant of the pipeline)
+
+Labels the same human CSVs with several models in one run, instead of one
+sequential process_data.py run per model with manual client swapping.
+
+    1. Each input CSV in INPUT_DIR is parsed once (process_data.read_rows).
+    2. Every (target, transcript) pair becomes one job running
+       process_data.label_rows() on the shared rows with that target's
+       client and model.  Jobs run concurrently on a thread pool.
+    3. API calls are throttled per provider: all targets sharing an
+       endpoint share one semaphore sized by PROVIDER_LIMITS (or
+       DEFAULT_PROVIDER_LIMIT), so e.g. Hugging Face and OpenAI traffic
+       are limited independently.
+    4. Each target writes to its own directory, OUTPUT_DIR_TEMPLATE
+       formatted with the target's name (e.g. labeled-out-gpt-5.2/), using
+       the usual {name}_labeled.csv file names.
+
+Targets are (model, endpoint) pairs.  The default TARGETS reproduce the
+two models used for data/: GPT-5.2 via OpenAI and GPT-OSS-120B via Hugging
+Face.  They can be overridden on the command line:
+
+    python label_multi.py \\
+        --target gpt-5.2 \\
+        --target openai/gpt-oss-120b@https://router.huggingface.co/v1
+
+A target's endpoint defaults to api.openai.com; its API key is read from
+the environment variable in API_KEY_ENVS for that endpoint.
+
+Usage:
+    python label_multi.py [--input-dir DIR] [--target MODEL[@ENDPOINT] ...]
+"""
+
+import os
+import glob
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from openai import OpenAI
+from dotenv import load_dotenv
+
+import process_data
+from process_data import (
+    llm_summary, llm_verdict, llm_context_verdict, read_rows, label_rows, write_rows, write_segments,
+)
+
+load_dotenv()
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+INPUT_DIR = os.path.join(SCRIPT_DIR, "to-label")
+OUTPUT_DIR_TEMPLATE = os.path.join(SCRIPT_DIR, "labeled-out-{name}")
+
+HF_ENDPOINT = "https://router.huggingface.co/v1"
+
+TARGETS = [
+    {'model': "gpt-5.2", 'base_url': None},
+    {'model': "openai/gpt-oss-120b", 'base_url': HF_ENDPOINT},
+]
+
+# Environment variable holding the API key for each endpoint
+# (None = api.openai.com).
+API_KEY_ENVS = {
+    None: "OPENAI_API_KEY",
+    HF_ENDPOINT: "HF_TOKEN",
+}
+
+# Maximum concurrent in-flight requests per endpoint.
+PROVIDER_LIMITS = {
+    None: 8,
+    HF_ENDPOINT: 4,
+}
+DEFAULT_PROVIDER_LIMIT = 4
+
+
+class Target:
+    """One (model, endpoint) pair, throttled by its provider's semaphore."""
+
+    def __init__(self, model, base_url, limit):
+        self.model = model
+        self.base_url = base_url
+        # Output directory name: the part of the model name after any "org/"
+        self.name = model.split('/')[-1]
+        api_key_env = API_KEY_ENVS.get(base_url, "OPENAI_API_KEY")
+        self.client = OpenAI(base_url=base_url, api_key=os.getenv(api_key_env))
+        self.limit = limit
+        self.output_dir = OUTPUT_DIR_TEMPLATE.format(name=self.name)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.seconds = 0.0
+
+    def _call(self, fn, *args, **kwargs):
+        with self.limit:
+            started = time.perf_counter()
+            try:
+                return fn(*args, llm_client=self.client, model=self.model, **kwargs)
+            finally:
+                with self._lock:
+                    self.calls += 1
+                    self.seconds += time.perf_counter() - started
+
+    def summary(self, content):
+        return self._call(llm_summary, content)
+
+    def verdict(self, summary, content):
+        return self._call(llm_verdict, summary, content)
+
+    def context_verdict(self, context, content):
+        return self._call(llm_context_verdict, context, content)
+
+
+def parse_target(spec):
+    """Parse a --target value of the form MODEL[@ENDPOINT]."""
+    model, _, base_url = spec.partition('@')
+    return {'model': model, 'base_url': base_url or None}
+
+
+def build_targets(target_specs):
+    """Create Target objects, sharing one semaphore per endpoint."""
+    limits = {}
+    targets = []
+    for spec in target_specs:
+        base_url = spec['base_url']
+        if base_url not in limits:
+            limits[base_url] = threading.BoundedSemaphore(
+                PROVIDER_LIMITS.get(base_url, DEFAULT_PROVIDER_LIMIT))
+        targets.append(Target(spec['model'], base_url, limits[base_url]))
+    names = [t.name for t in targets]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Targets must have distinct model names: {names}")
+    return targets
+
+
+def label_job(target, name, ext, rows, detector=None):
+    """Label one parsed transcript with one target and write its output."""
+    output_path = os.path.join(target.output_dir, f"{name}_labeled{ext}")
+    # Resolved here, as label_rows() would, so the verdict matches the detector
+    detector = detector or process_data.DETECTOR_MODE
+    verdict = target.context_verdict if detector == 'sliding' else target.verdict
+    out_rows, verdicts, segments = label_rows(rows, summarize=target.summary, verdict=verdict,
+                                              detector=detector)
+    write_rows(output_path, out_rows)
+    write_segments(output_path, segments)
+    return output_path, len(verdicts)
+
+
+def run(input_files, targets, detector=None):
+    """Label every input with every target concurrently.
+
+    Returns:
+        A list of (target name, output path, verdict count, seconds) tuples.
+    """
+    for target in targets:
+        os.makedirs(target.output_dir, exist_ok=True)
+
+    # Parse each input once; the rows are shared read-only by all targets.
+    parsed = []
+    for input_path in sorted(input_files):
+        name, ext = os.path.splitext(os.path.basename(input_path))
+        parsed.append((name, ext, read_rows(input_path)))
+
+    # Each job holds at most one request at a time, so more workers than
+    # the total provider capacity would only queue on the semaphores.
+    endpoints = {t.base_url for t in targets}
+    max_workers = sum(PROVIDER_LIMITS.get(e, DEFAULT_PROVIDER_LIMIT) for e in endpoints)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
+        for name, ext, rows in parsed:
+            for target in targets:
+                future = pool.submit(label_job, target, name, ext, rows, detector)
+                futures[future] = (target, time.perf_counter())
+        for future in as_completed(futures):
+            target, submitted = futures[future]
+            output_path, num_verdicts = future.result()
+            results.append((target.name, output_path, num_verdicts, time.perf_counter() - submitted))
+            print(f"  [{target.name}] wrote {output_path}")
+    return results
+
+
+def build_parser():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--input-dir", default=INPUT_DIR,
+                   help="Directory of human-labeled CSVs (default: to-label/).")
+    p.add_argument("--target", action="append", default=None, metavar="MODEL[@ENDPOINT]",
+                   help="Model to label with; repeat for several (default: TARGETS).")
+    p.add_argument("--detector", choices=['summary', 'sliding'], default=None,
+                   help="Detector mode (default: process_data.DETECTOR_MODE).")
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    input_files = glob.glob(os.path.join(args.input_dir, "*.csv"))
+    if not input_files:
+        print(f"No CSV files found in {args.input_dir}/")
+        return
+
+    target_specs = [parse_target(t) for t in args.target] if args.target else TARGETS
+    targets = build_targets(target_specs)
+
+    print(f"Labeling {len(input_files)} file(s) with {len(targets)} model(s):")
+    for target in targets:
+        print(f"  - {target.model} @ {target.base_url or 'api.openai.com'} -> {target.output_dir}/")
+
+    started = time.perf_counter()
+    results = run(input_files, targets, args.detector)
+    elapsed = time.perf_counter() - started
+
+    print(f"\n{'='*80}")
+    print("MULTI-MODEL LABELING SUMMARY")
+    print(f"{'='*80}")
+    print(f"  {'Model':<24} {'Files':>6} {'Verdicts':>9} {'Calls':>7} {'Call s':>9}")
+    print(f"  {'-'*24} {'-'*6} {'-'*9} {'-'*7} {'-'*9}")
+    for target in targets:
+        mine = [r for r in results if r[0] == target.name]
+        num_verdicts = sum(r[2] for r in mine)
+        print(f"  {target.name:<24} {len(mine):>6} {num_verdicts:>9} {target.calls:>7} {target.seconds:>9.1f}")
+    print(f"\n  Wall time: {elapsed:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,644 @@
+"""
+Vectorised Agreement Metrics Kernel
+
+One NumPy implementation of the START / END / SEGMENT confusion matrices
+and segment IoU used by analysis.py, and (through
+unsupervised_topic_segmentation/pipeline_metrics.py, which loads this file
+by path) by unsupervised_topic_segmentation/eval.py and compare_to_llm.py.
+
+Labels are boolean arrays.  Several transcripts are handled in one call by
+concatenating their rows and passing `lengths` (rows per transcript);
+counts then come back per transcript.  Prediction arrays may carry extra
+leading axes, e.g. shape (num_prediction_sets, num_rows), to score several
+label sets against the same reference in one pass.
+
+Segment membership follows analysis.py's toggle: a row is inside a story
+from a start=TRUE row through the next end=TRUE row, inclusive of both.
+It is derived without a Python loop: the toggle state after each row is
+that of the last row with an event (start, end, or first row of a
+transcript), found with a running maximum over row indices.
+
+Pk and WinDiff are computed from boundary arrays with the same windows and
+k conventions as nltk.metrics.segmentation and
+unsupervised_topic_segmentation/compare_to_llm.py, without nltk.
+
+Usage:
+    from metrics import flags, compare_labels, family_metrics
+    result = compare_labels(flags(h_start), flags(h_end), flags(l_start), flags(l_end))
+    family_metrics(result)  # {'start': {...}, 'end': {...}, 'segment': {...}}
+"""
+
+import os
+import json
+import math
+
+import numpy as np
+
+FAMILIES = ('start', 'end', 'segment')
+COUNT_KEYS = ('tp', 'tn', 'fp', 'fn')
+
+
+def flags(values, ignore_case=False):
+    """Boolean array from a column of 'TRUE' / 'FALSE' strings.
+
+    analysis.py compares exactly; the unsupervised_topic_segmentation
+    scripts upper-case first (ignore_case=True).
+    """
+    if ignore_case:
+        return np.array([str(v).upper() == 'TRUE' for v in values], dtype=bool)
+    return np.array([v == 'TRUE' for v in values], dtype=bool)
+
+
+def _offsets(lengths, n):
+    """First row of each transcript (rows past the end dropped)."""
+    if lengths is None:
+        return np.array([0]) if n else np.array([], dtype=int)
+    bounds = np.concatenate(([0], np.cumsum(lengths)))[:-1]
+    return bounds[bounds < n]
+
+
+def segment_membership(starts, ends, lengths=None):
+    """Per-row "inside a story" flags from start/end markers.
+
+    A row is inside if it is a start row, or if the toggle was on after the
+    previous row of the same transcript.  The toggle turns on at a start
+    and off at an end (an end on the same row as a start wins, so that row
+    is inside but the next one is not).
+    """
+    starts = np.asarray(starts, dtype=bool)
+    ends = np.asarray(ends, dtype=bool)
+    n = starts.shape[-1]
+    if n == 0:
+        return starts.copy()
+    first = np.zeros(n, dtype=bool)
+    first[_offsets(lengths, n)] = True
+
+    # Index of the last event at or before each row (row 0 is always one)
+    event = starts | ends | first
+    last = np.maximum.accumulate(np.where(event, np.arange(n), 0), axis=-1)
+    state = np.take_along_axis(np.broadcast_to(starts & ~ends, last.shape), last, axis=-1)
+
+    previous = np.zeros_like(state)
+    previous[..., 1:] = state[..., :-1]
+    previous[..., first] = False
+    return starts | previous
+
+
+def _group_sums(x, lengths):
+    """Sum boolean rows per transcript along the last axis."""
+    x = np.asarray(x, dtype=np.int64)
+    if lengths is None:
+        return x.sum(axis=-1)
+    bounds = np.concatenate(([0], np.cumsum(lengths)))
+    zeros = np.zeros(x.shape[:-1] + (1,), dtype=np.int64)
+    cumulative = np.concatenate((zeros, np.cumsum(x, axis=-1)), axis=-1)
+    return cumulative[..., bounds[1:]] - cumulative[..., bounds[:-1]]
+
+
+def confusion(truth, pred, lengths=None):
+    """tp / tn / fp / fn counts of pred against truth.
+
+    Returns a dict of integer arrays; scalars when `lengths` is None and
+    pred is 1-D, otherwise shaped (..., num_transcripts).
+    """
+    truth = np.asarray(truth, dtype=bool)
+    pred = np.asarray(pred, dtype=bool)
+    return {
+        'tp': _group_sums(truth & pred, lengths),
+        'tn': _group_sums(~truth & ~pred, lengths),
+        'fp': _group_sums(~truth & pred, lengths),
+        'fn': _group_sums(truth & ~pred, lengths),
+    }
+
+
+def compare_labels(human_starts, human_ends, llm_starts, llm_ends, lengths=None,
+                   human_segment=None, llm_segment=None):
+    """All three metric families in one pass.
+
+    human_segment / llm_segment override the toggle-derived membership
+    (e.g. columns already stored in a compare CSV).
+
+    Returns:
+        {'start': counts, 'end': counts, 'segment': counts,
+         'human_segment': bool array, 'llm_segment': bool array}
+        where each counts dict is as returned by confusion().  For the
+        segment family, intersection = tp and union = tp + fp + fn.
+    """
+    if human_segment is None:
+        human_segment = segment_membership(human_starts, human_ends, lengths)
+    if llm_segment is None:
+        llm_segment = segment_membership(llm_starts, llm_ends, lengths)
+    return {
+        'start': confusion(human_starts, llm_starts, lengths),
+        'end': confusion(human_ends, llm_ends, lengths),
+        'segment': confusion(human_segment, llm_segment, lengths),
+        'human_segment': np.asarray(human_segment, dtype=bool),
+        'llm_segment': np.asarray(llm_segment, dtype=bool),
+    }
+
+
+def metrics_from_counts(tp, tn, fp, fn, iou=False):
+    """Accuracy / precision / recall / F1 (and optionally IoU) from counts.
+
+    Same formulas and zero-division guards as analysis.py; counts are
+    returned as plain ints alongside the rates.
+    """
+    tp, tn, fp, fn = int(tp), int(tn), int(fp), int(fn)
+    total = tp + tn + fp + fn
+    accuracy = (tp + tn) / total if total > 0 else 0
+    precision = tp / (tp + fp) if (tp + fp) > 0 else 0
+    recall = tp / (tp + fn) if (tp + fn) > 0 else 0
+    f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
+    out = {'tp': tp, 'tn': tn, 'fp': fp, 'fn': fn,
+           'accuracy': accuracy, 'precision': precision, 'recall': recall, 'f1': f1}
+    if iou:
+        union = tp + fp + fn
+        out['iou'] = tp / union if union > 0 else 0
+    return out
+
+
+def family_metrics(result, index=None):
+    """{'start', 'end', 'segment'} metric dicts for one transcript or the total.
+
+    `index` selects a transcript (or any leading-axis position) from
+    per-transcript counts; None sums over all transcripts.
+    """
+    out = {}
+    for family in FAMILIES:
+        counts = result[family]
+        if index is None:
+            values = [np.sum(counts[key]) for key in COUNT_KEYS]
+        else:
+            values = [counts[key][index] for key in COUNT_KEYS]
+        out[family] = metrics_from_counts(*values, iou=family == 'segment')
+    return out
+
+
+def sum_counts(counts_list):
+    """Add several families' count dicts (e.g. per-transcript results) together."""
+    totals = {family: {key: 0 for key in COUNT_KEYS} for family in FAMILIES}
+    for counts in counts_list:
+        for family in FAMILIES:
+            for key in COUNT_KEYS:
+                totals[family][key] += int(counts[family][key])
+    return totals
+
+
+def rates(tp, tn, fp, fn):
+    """Vectorised accuracy / precision / recall / F1 / IoU over count arrays.
+
+    Same formulas and zero guards as metrics_from_counts(), elementwise.
+    """
+    tp, tn, fp, fn = (np.asarray(x, dtype=float) for x in (tp, tn, fp, fn))
+
+    def ratio(num, den):
+        return np.divide(num, den, out=np.zeros(np.broadcast(num, den).shape), where=den > 0)
+
+    precision = ratio(tp, tp + fp)
+    recall = ratio(tp, tp + fn)
+    return {
+        'accuracy': ratio(tp + tn, tp + tn + fp + fn),
+        'precision': precision,
+        'recall': recall,
+        'f1': ratio(2 * (precision * recall), precision + recall),
+        'iou': ratio(tp, tp + fp + fn),
+    }
+
+
+def _window_counts(binary, k):
+    """Boundaries in each window binary[i:i+k], for i in 0..len-k."""
+    cumulative = np.concatenate(([0], np.cumsum(np.asarray(binary, dtype=np.int64))))
+    return cumulative[k:] - cumulative[:len(cumulative) - k]
+
+
+def pk(ref, hyp, k=None):
+    """Pk of a 0/1 hypothesis against a 0/1 reference (as nltk's pk)."""
+    ref = np.asarray(ref, dtype=np.int64)
+    hyp = np.asarray(hyp, dtype=np.int64)
+    if len(ref) != len(hyp):
+        raise ValueError("Segmentations have unequal length")
+    if k is None:
+        k = int(round(len(ref) / (max(int(ref.sum()), 1) * 2.0)))
+    return float(np.mean((_window_counts(ref, k) > 0) != (_window_counts(hyp, k) > 0)))
+
+
+def windowdiff(ref, hyp, k):
+    """WinDiff of a 0/1 hypothesis against a 0/1 reference (as nltk's windowdiff)."""
+    ref = np.asarray(ref, dtype=np.int64)
+    hyp = np.asarray(hyp, dtype=np.int64)
+    if len(ref) != len(hyp):
+        raise ValueError("Segmentations have unequal length")
+    if k > len(ref):
+        raise ValueError("Window width k should be smaller or equal than segmentation lengths")
+    return float(np.mean(_window_counts(ref, k) != _window_counts(hyp, k)))
+
+
+def pk_windiff(ref, hyp):
+    """(Pk, WinDiff) with the project's k conventions, or (nan, nan).
+
+    Pk uses its default k (half the mean reference segment length);
+    WinDiff uses the same k but at least 2 and at most len - 1, as
+    compare_to_llm.py does.  A reference without boundaries, or shorter
+    than two rows, scores nan.
+    """
+    ref = np.asarray(ref, dtype=np.int64)
+    num_boundaries = int(ref.sum())
+    if num_boundaries == 0 or len(ref) < 2:
+        return float('nan'), float('nan')
+    k = max(2, int(round(len(ref) / (num_boundaries * 2.0))))
+    if k >= len(ref):
+        k = len(ref) - 1
+    return pk(ref, hyp), windowdiff(ref, hyp, k)
+
+
+# --- Boundary tolerance ----------------------------------------------------
+#
+# Exact START/END matching scores a boundary one line off as a full FP plus
+# a full FN.  For each tolerance k these count, per transcript:
+#   pred_near  — predicted boundaries with a human boundary within ±k lines
+#   truth_near — human boundaries with a predicted boundary within ±k lines
+#   matched    — size of an optimal one-to-one matching of predicted to
+#                human boundaries at most k lines apart
+# The "window" rates (pred_near / pred, truth_near / truth) let one boundary
+# vouch for several; the "matched" rates do not, and at k = 0 equal the exact
+# START/END precision and recall.
+
+TOLERANCES = (0, 1, 2, 3, 5)
+
+
+def _distance_to_nearest(binary):
+    """Per-row distance to the nearest True row (one forward, one backward sweep).
+
+    Every row gets the maximum int64 when the array has no True row.
+    """
+    binary = np.asarray(binary, dtype=bool)
+    n = len(binary)
+    if not binary.any():
+        return np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+    index = np.arange(n)
+    previous = np.maximum.accumulate(np.where(binary, index, -2 * n - 2))
+    following = np.minimum.accumulate(np.where(binary, index, 3 * n + 3)[::-1])[::-1]
+    return np.minimum(index - previous, following - index)
+
+
+def _matching_size(truth_positions, pred_positions, k):
+    """Maximum one-to-one matching of sorted positions at most k apart.
+
+    A single two-pointer sweep: a boundary that is too far left of the
+    other side's current boundary cannot match anything later, so it is
+    skipped; otherwise the two are matched.  This greedy choice is optimal
+    for points on a line.
+    """
+    i = j = matched = 0
+    while i < len(truth_positions) and j < len(pred_positions):
+        gap = pred_positions[j] - truth_positions[i]
+        if gap < -k:
+            j += 1
+        elif gap > k:
+            i += 1
+        else:
+            matched += 1
+            i += 1
+            j += 1
+    return matched
+
+
+def tolerance_counts(truth, pred, tolerances=None):
+    """Boundary counts for every tolerance k of one transcript.
+
+    Returns:
+        {str(k): {'pred', 'truth', 'pred_near', 'truth_near', 'matched'}}
+        (string keys, so the dict round-trips through JSON unchanged).
+    """
+    tolerances = TOLERANCES if tolerances is None else tolerances
+    truth = np.asarray(truth, dtype=bool)
+    pred = np.asarray(pred, dtype=bool)
+    truth_positions = np.flatnonzero(truth)
+    pred_positions = np.flatnonzero(pred)
+    ks = np.asarray(tolerances)
+
+    # Each boundary's distance to the other side, sorted once; the counts for
+    # every k are then one searchsorted call.
+    pred_distances = np.sort(_distance_to_nearest(truth)[pred_positions])
+    truth_distances = np.sort(_distance_to_nearest(pred)[truth_positions])
+    pred_near = np.searchsorted(pred_distances, ks, side='right')
+    truth_near = np.searchsorted(truth_distances, ks, side='right')
+
+    return {
+        str(k): {
+            'pred': len(pred_positions),
+            'truth': len(truth_positions),
+            'pred_near': int(pred_near[i]),
+            'truth_near': int(truth_near[i]),
+            'matched': _matching_size(truth_positions, pred_positions, k),
+        }
+        for i, k in enumerate(tolerances)
+    }
+
+
+def add_tolerance_counts(total, counts):
+    """Add one transcript's tolerance_counts() into a running total (in place)."""
+    for k, values in counts.items():
+        bucket = total.setdefault(k, dict.fromkeys(values, 0))
+        for key, value in values.items():
+            bucket[key] += value
+    return total
+
+
+def tolerance_rates(counts):
+    """Precision / recall / F1 for both variants of one tolerance's counts."""
+    def prf(hits_pred, hits_truth):
+        precision = hits_pred / counts['pred'] if counts['pred'] > 0 else 0
+        recall = hits_truth / counts['truth'] if counts['truth'] > 0 else 0
+        f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
+        return {'precision': precision, 'recall': recall, 'f1': f1}
+    return {
+        'window': prf(counts['pred_near'], counts['truth_near']),
+        'matched': prf(counts['matched'], counts['matched']),
+    }
+
+
+# --- Story-level matching --------------------------------------------------
+#
+# Line-level segment IoU does not say whether each human story was found as
+# a story of its own.  Stories are extracted as inclusive (start, end) row
+# intervals and a human and an LLM story count as the same story when their
+# IoU reaches a threshold.  Within one label set stories are disjoint and
+# sorted, so the overlapping pairs form chains that are found with two
+# searchsorted calls, and an optimal one-to-one matching is a single
+# left-to-right sweep over them.
+
+STORY_THRESHOLDS = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+def story_intervals(starts, ends):
+    """Inclusive (start, end) rows of each story of one transcript.
+
+    Follows segment_membership(): a story opens at a start row and closes
+    at the next end row, the row before another start, or the last row.
+    Returns two int arrays (story starts, story ends).
+    """
+    starts = np.asarray(starts, dtype=bool)
+    ends = np.asarray(ends, dtype=bool)
+    n = len(starts)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    inside = segment_membership(starts, ends)
+    closes_next = np.ones(n, dtype=bool)
+    closes_next[:-1] = starts[1:]
+    closing = np.flatnonzero(inside & (ends | closes_next))
+    story_starts = np.flatnonzero(starts)
+    return story_starts, closing[np.searchsorted(closing, story_starts)]
+
+
+def overlapping_pairs(truth, pred):
+    """Every overlapping (human, LLM) story pair and its IoU.
+
+    `truth` and `pred` are (starts, ends) as returned by story_intervals().
+    Returns (truth_index, pred_index, iou) arrays, ordered by truth index
+    and then pred index.
+    """
+    t_start, t_end = truth
+    p_start, p_end = pred
+    # LLM stories overlapping human story i: p_end >= t_start and p_start <= t_end
+    first = np.searchsorted(p_end, t_start, side='left')
+    last = np.searchsorted(p_start, t_end, side='right')
+    counts = np.maximum(last - first, 0)
+    ti = np.repeat(np.arange(len(t_start)), counts)
+    pi = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(first, counts)
+    intersection = np.minimum(t_end[ti], p_end[pi]) - np.maximum(t_start[ti], p_start[pi]) + 1
+    union = (t_end[ti] - t_start[ti] + 1) + (p_end[pi] - p_start[pi] + 1) - intersection
+    return ti, pi, intersection / union
+
+
+def story_counts(truth, pred, thresholds=None):
+    """Matched, human and LLM story counts at every IoU threshold.
+
+    A pair counts when its IoU >= the threshold; each story matches at
+    most one story of the other side.  Above 0.5 a story can reach the
+    threshold with at most one partner, so the count is a searchsorted;
+    otherwise the pairs are swept left to right, matching a pair when
+    neither side is taken (optimal, since the pairs form chains).
+
+    Returns:
+        {'truth': H, 'pred': P, 'matched': {str(threshold): count}}
+    """
+    thresholds = STORY_THRESHOLDS if thresholds is None else thresholds
+    ti, pi, iou = overlapping_pairs(truth, pred)
+    ordered = np.sort(iou)
+    matched = {}
+    for threshold in thresholds:
+        if threshold > 0.5:
+            matched[str(threshold)] = int(len(ordered) - np.searchsorted(ordered, threshold, side='left'))
+            continue
+        count = 0
+        last_t = last_p = -1
+        for t, p in zip(ti[iou >= threshold].tolist(), pi[iou >= threshold].tolist()):
+            if t != last_t and p != last_p:
+                count += 1
+                last_t, last_p = t, p
+        matched[str(threshold)] = count
+    return {'truth': len(truth[0]), 'pred': len(pred[0]), 'matched': matched}
+
+
+def story_rates(counts):
+    """{str(threshold): {'precision', 'recall', 'f1'}} from (summed) story_counts()."""
+    out = {}
+    for threshold, matched in counts['matched'].items():
+        precision = matched / counts['pred'] if counts['pred'] > 0 else 0
+        recall = matched / counts['truth'] if counts['truth'] > 0 else 0
+        f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
+        out[threshold] = {'precision': precision, 'recall': recall, 'f1': f1}
+    return out
+
+
+# --- Multi-source agreement -----------------------------------------------
+#
+# For S label sources over the same rows (an (S, N) boolean array), every
+# pairwise confusion matrix is four matrix products; row a is treated as
+# the reference and column b as the prediction.
+
+def pairwise_confusion(x):
+    """tp / tn / fp / fn, each an (S, S) int array, for all pairs of rows of x."""
+    x = np.asarray(x, dtype=bool)
+    on = x.astype(np.float64)
+    off = 1.0 - on
+    as_int = lambda m: np.rint(m).astype(np.int64)  # noqa: E731
+    return {
+        'tp': as_int(on @ on.T),
+        'tn': as_int(off @ off.T),
+        'fp': as_int(off @ on.T),
+        'fn': as_int(on @ off.T),
+    }
+
+
+def cohen_kappa(tp, tn, fp, fn):
+    """Cohen's kappa of two binary raters from their counts (elementwise).
+
+    Observed agreement against the agreement expected from each rater's
+    positive rate; 0 where the expected agreement is 1.
+    """
+    tp, tn, fp, fn = (np.asarray(v, dtype=float) for v in (tp, tn, fp, fn))
+    total = tp + tn + fp + fn
+    safe = np.where(total > 0, total, 1)
+    observed = (tp + tn) / safe
+    reference_rate = (tp + fn) / safe
+    prediction_rate = (tp + fp) / safe
+    expected = reference_rate * prediction_rate + (1 - reference_rate) * (1 - prediction_rate)
+    return np.divide(observed - expected, 1 - expected,
+                     out=np.zeros(np.broadcast(observed, expected).shape), where=expected < 1)
+
+
+def krippendorff_alpha(x):
+    """Krippendorff's alpha (nominal) of S binary raters over N units, no missing values.
+
+    x is (S, N).  From the coincidence matrix: alpha = 1 - (n - 1) *
+    sum_u 2 n1_u n0_u / (S - 1) / (2 n1 n0), where n1_u / n0_u count the
+    raters saying yes / no on unit u and n = S * N.  nan with fewer than
+    two raters or when every value is the same.
+    """
+    x = np.asarray(x, dtype=bool)
+    raters, units = x.shape
+    ones = x.sum(axis=0).astype(float)
+    zeros = raters - ones
+    n1, n0 = ones.sum(), zeros.sum()
+    if raters < 2 or n1 == 0 or n0 == 0:
+        return float('nan')
+    n = raters * units
+    disagreement = (2 * ones * zeros).sum() / (raters - 1)
+    return float(1 - (n - 1) * disagreement / (2 * n1 * n0))
+
+
+def pk_windiff_matrix(boundaries):
+    """(Pk, WinDiff) matrices for S boundary rows of one transcript.
+
+    boundaries is (S, n) 0/1.  Entry [a, b] scores row b against reference
+    row a with pk_windiff()'s conventions; row a is nan when it has no
+    boundaries.  Window counts are computed for all rows at once per
+    reference k.
+    """
+    boundaries = np.asarray(boundaries, dtype=np.int64)
+    sources, n = boundaries.shape
+    pk_out = np.full((sources, sources), np.nan)
+    wd_out = np.full((sources, sources), np.nan)
+    if n < 2:
+        return pk_out, wd_out
+    cumulative = np.concatenate((np.zeros((sources, 1), dtype=np.int64), np.cumsum(boundaries, axis=1)), axis=1)
+
+    def windows(k):
+        return cumulative[:, k:] - cumulative[:, :n + 1 - k]
+
+    for a in range(sources):
+        num_boundaries = int(boundaries[a].sum())
+        if num_boundaries == 0:
+            continue
+        k_pk = int(round(n / (num_boundaries * 2.0)))
+        counts = windows(k_pk) > 0
+        pk_out[a] = np.mean(counts != counts[a], axis=1)
+        k_wd = min(max(2, k_pk), n - 1)
+        counts = windows(k_wd)
+        wd_out[a] = np.mean(counts != counts[a], axis=1)
+    return pk_out, wd_out
+
+
+# --- Mergeable accumulator -------------------------------------------------
+
+class MetricsAccumulator:
+    """Corpus totals of analysis.py's per-transcript metrics, mergeable across shards.
+
+    Holds the START / END / SEGMENT confusion counts (for the segment
+    family tp is the intersection and tp + fp + fn the union), the
+    boundary tolerance counts, and every transcript's own metrics dict,
+    whose 'pk' / 'windiff' values are summed with math.fsum (correctly
+    rounded, so the mean does not depend on the order of the shards).
+    Everything is an integer sum or a disjoint union, so merge() is
+    associative and commutative: any grouping of shards reduces to the same
+    report as a single run.  A transcript may be added only once.
+
+    to_dict() / from_dict() (and save() / load()) round-trip through JSON.
+    """
+
+    VERSION = 1
+
+    def __init__(self):
+        self.counts = {family: dict.fromkeys(COUNT_KEYS, 0) for family in FAMILIES}
+        self.tolerance = {'start': {}, 'end': {}}
+        self.files = {}
+
+    def add(self, name, metrics):
+        """Add one transcript's metrics (as returned by analysis.analyze_transcript)."""
+        if name in self.files:
+            raise ValueError(f"{name} is already in this accumulator")
+        for family in FAMILIES:
+            for key in COUNT_KEYS:
+                self.counts[family][key] += int(metrics[family][key])
+        for family, counts in metrics.get('tolerance', {}).items():
+            add_tolerance_counts(self.tolerance[family], counts)
+        self.files[name] = metrics
+        return self
+
+    def merge(self, other):
+        """A new accumulator holding both; neither input is changed."""
+        shared = self.files.keys() & other.files.keys()
+        if shared:
+            raise ValueError(f"Transcripts in both accumulators: {', '.join(sorted(shared))}")
+        merged = MetricsAccumulator.from_dict(self.to_dict())
+        for family in FAMILIES:
+            for key in COUNT_KEYS:
+                merged.counts[family][key] += other.counts[family][key]
+        for family, counts in other.tolerance.items():
+            for k, values in counts.items():
+                add_tolerance_counts(merged.tolerance[family], {k: values})
+        merged.files.update(other.files)
+        return merged
+
+    __add__ = merge
+
+    def pk_sums(self):
+        """(Pk sum, WinDiff sum, transcripts) over the transcripts where Pk is defined."""
+        defined = [m for m in self.files.values() if m.get('pk') is not None]
+        return (math.fsum(m['pk'] for m in defined), math.fsum(m['windiff'] for m in defined), len(defined))
+
+    def overall(self):
+        """Overall metrics: the three families, tolerance counts and mean Pk / WinDiff (None if undefined)."""
+        pk_sum, windiff_sum, n = self.pk_sums()
+        return {
+            'start': metrics_from_counts(**self.counts['start']),
+            'end': metrics_from_counts(**self.counts['end']),
+            'segment': metrics_from_counts(**self.counts['segment'], iou=True),
+            'tolerance': self.tolerance,
+            'pk': pk_sum / n if n else None,
+            'windiff': windiff_sum / n if n else None,
+        }
+
+    def to_dict(self):
+        return {
+            'version': self.VERSION,
+            'counts': self.counts,
+            'tolerance': self.tolerance,
+            'files': self.files,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version') != cls.VERSION:
+            raise ValueError(f"Unsupported accumulator version: {data.get('version')}")
+        acc = cls()
+        acc.counts = {family: {key: int(data['counts'][family][key]) for key in COUNT_KEYS}
+                      for family in FAMILIES}
+        acc.tolerance = {family: {k: dict(v) for k, v in data['tolerance'].get(family, {}).items()}
+                         for family in ('start', 'end')}
+        acc.files = dict(data['files'])
+        return acc
+
+    def save(self, path):
+        """Write as JSON, atomically."""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls.from_dict(json.load(file))
@@ -0,0 +1,148 @@
+"""
+Paired Permutation Test Between Two Labeling Methods
+
+bootstrap.py gives confidence intervals; this script asks whether the
+difference between two methods (prompts, models, join variants) scored
+against the same human labels could be chance.  Under the null hypothesis
+the two methods are exchangeable on every transcript, so each permutation
+swaps the methods' labels on a random subset of transcripts (or, with
+--unit story, of human-annotated stories) and recomputes
+
+    START F1, END F1, SEGMENT F1, SEGMENT IoU    (pooled counts, as analysis.py)
+    Pk, WinDiff                                   (mean over transcripts)
+
+for both.  The two-sided p-value of each metric is the share of
+permutations whose |second - first| is at least the observed one, with the
+usual +1 correction.
+
+Like bootstrap.py it works on per-unit count arrays: a permutation is a
+0/1 swap vector, both methods' pooled counts are matrix products of the
+swap vectors with the stacked per-unit counts, and permutations run in
+chunks of about CHUNK_ELEMENTS swap entries (fewer permutations per chunk
+the more units there are), so 100k permutations take a few seconds and
+memory stays flat with --unit story.
+
+Input: two comparison directories written by analysis.py against the same
+human labels (e.g. data/siblings/siblings-compare-hum-5.2 and
+data/siblings/siblings-compare-hum-oss); only shared units are used.
+
+Usage:
+    python permutation.py FIRST_COMPARE_DIR SECOND_COMPARE_DIR
+                          [--permutations N] [--seed S] [--unit transcript|story]
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from bootstrap import METRICS, _align, load_compare_dir, statistics
+
+N_PERMUTATIONS = 100000
+SEED = 0
+
+# Entries of one chunk's (permutations, 2 * units) weight matrix; the
+# permutations per chunk follow from the number of units, which bounds
+# memory at large N and with --unit story (~1300 units)
+CHUNK_ELEMENTS = 1 << 21
+
+
+def chunk_rows(num_units):
+    """Permutations per chunk for `num_units` units."""
+    return max(1, CHUNK_ELEMENTS // (2 * max(num_units, 1)))
+
+
+def swapped_statistics(swaps, first, second):
+    """METRICS of both methods after swapping the units where swaps == 1.
+
+    `swaps` is (rows, units) 0/1; `first` / `second` are (counts, pk,
+    windiff) tuples over the same units.  Returns ({metric: values} for the
+    permuted first method, {...} for the permuted second method).
+    """
+    swaps = np.asarray(swaps, dtype=float)
+    stacked = tuple(np.concatenate((a, b)) for a, b in zip(first, second))
+    weights = np.hstack((1 - swaps, swaps))  # first method's units after the swap
+    permuted_first = statistics(weights, *stacked)
+    # The second method gets exactly the other units; reuse the buffer
+    np.subtract(1, weights, out=weights)
+    return permuted_first, statistics(weights, *stacked)
+
+
+def permutation_test(first, second, n_permutations=None, seed=None):
+    """Observed difference (second - first) and two-sided p-value per metric.
+
+    Returns:
+        {metric: (difference, p_value)} — p_value is nan when the metric is
+        undefined for these units (e.g. Pk with --unit story).
+    """
+    n_permutations = n_permutations or N_PERMUTATIONS
+    rng = np.random.default_rng(SEED if seed is None else seed)
+    num_units = len(first[0])
+
+    observed_a, observed_b = swapped_statistics(np.zeros((1, num_units)), first, second)
+    observed = {m: float(observed_b[m][0] - observed_a[m][0]) for m in METRICS}
+    at_least = dict.fromkeys(METRICS, 0)
+    # Draws do not depend on how they are split, so the chunk size does not
+    # change the p-values for a given seed
+    chunk = chunk_rows(num_units)
+    for done in range(0, n_permutations, chunk):
+        rows = min(chunk, n_permutations - done)
+        swaps = rng.integers(0, 2, size=(rows, num_units))
+        permuted_a, permuted_b = swapped_statistics(swaps, first, second)
+        for m in METRICS:
+            difference = np.abs(permuted_b[m] - permuted_a[m])
+            # Tolerance so ties with the observed value count as "at least"
+            at_least[m] += int(np.sum(difference >= abs(observed[m]) - 1e-12))
+
+    out = {}
+    for m in METRICS:
+        if np.isnan(observed[m]):
+            out[m] = (observed[m], float('nan'))
+        else:
+            out[m] = (observed[m], (at_least[m] + 1) / (n_permutations + 1))
+    return out
+
+
+def build_parser():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("first", metavar="FIRST_COMPARE_DIR", help="Comparison directory of the first method.")
+    p.add_argument("second", metavar="SECOND_COMPARE_DIR", help="Comparison directory of the second method.")
+    p.add_argument("--permutations", type=int, default=N_PERMUTATIONS,
+                   help=f"Random permutations (default: {N_PERMUTATIONS}).")
+    p.add_argument("--seed", type=int, default=SEED, help=f"Random seed (default: {SEED}).")
+    p.add_argument("--unit", choices=['transcript', 'story'], default='transcript',
+                   help="Swap methods per transcript or per human-annotated story (default: transcript).")
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    loaded_a = load_compare_dir(args.first, args.unit)
+    loaded_b = load_compare_dir(args.second, args.unit)
+    shared, first, second = _align(loaded_a, loaded_b)
+    if not shared:
+        raise SystemExit(f"No shared {args.unit}s between {args.first}/ and {args.second}/")
+
+    started = time.perf_counter()
+    results = permutation_test(first, second, args.permutations, args.seed)
+    elapsed = time.perf_counter() - started
+
+    print(f"\n{'='*60}")
+    print(f"Paired permutation test: {len(shared)} shared {args.unit}(s), {args.permutations} permutations")
+    print(f"  first:  {args.first}")
+    print(f"  second: {args.second}")
+    print(f"{'='*60}")
+    print(f"  {'Metric':<14} {'First':>9} {'Second':>9} {'Diff':>9} {'p-value':>9}")
+    print(f"  {'-'*14} {'-'*9} {'-'*9} {'-'*9} {'-'*9}")
+    ones = np.ones((1, len(shared)))
+    point_a, point_b = statistics(ones, *first), statistics(ones, *second)
+    for metric, (difference, p_value) in results.items():
+        if np.isnan(difference):
+            continue
+        print(f"  {metric:<14} {point_a[metric][0]:>9.4f} {point_b[metric][0]:>9.4f} "
+              f"{difference:>+9.4f} {p_value:>9.4f}")
+    print(f"\nPermutation time: {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
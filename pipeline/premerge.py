@@ -0,0 +1,118 @@
+"""
+Embedding Pre-Merge for the Join Step
+
+Many adjacent segment pairs sent to llm_combine_stories() are obviously
+the same story or obviously different.  A PreMerger embeds both sides
+locally with the Sentence-BERT model used by
+unsupervised_topic_segmentation/core.py (stsb-roberta-base) and decides
+the pair without an LLM call when their cosine similarity falls outside an
+ambiguity band:
+
+    similarity >= MERGE_ABOVE  -> 'TRUE'   (merge, no LLM call)
+    similarity <  SPLIT_BELOW  -> 'FALSE'  (keep apart, no LLM call)
+    otherwise                  -> None     (ask the LLM)
+
+EMBED_SOURCE chooses what is embedded: each segment's LLM summary
+("summary"), or its transcript lines ("lines"), max-pooled per segment the
+same way core.py pools utterance blocks.  Embeddings are cached by text,
+so a summary or line embedded once is never encoded again.
+
+The thresholds are cosine similarities for the chosen model and source and
+should be checked against a labeled run before being tightened; setting
+MERGE_ABOVE above 1 and SPLIT_BELOW to -1 disables the pre-merge while
+still recording similarities.
+
+Requires sentence-transformers (and torch), which are only imported when
+the first pair is decided:
+    pip install sentence-transformers
+"""
+
+import threading
+
+import numpy as np
+
+# Same Sentence-BERT model as unsupervised_topic_segmentation/core.py
+EMBEDDING_MODEL = "sentence-transformers/stsb-roberta-base"
+EMBED_SOURCE = "summary"   # "summary" or "lines"
+
+# Ambiguity band: only pairs with SPLIT_BELOW <= similarity < MERGE_ABOVE
+# reach the LLM.
+MERGE_ABOVE = 0.85
+SPLIT_BELOW = 0.30
+
+_MODEL = None
+# label_and_join.py runs transcripts on a thread pool; load the model once
+_MODEL_LOCK = threading.Lock()
+
+
+def _get_model():
+    """Load the embedding model lazily so the join step imports without it."""
+    global _MODEL
+    with _MODEL_LOCK:
+        if _MODEL is None:
+            from sentence_transformers import SentenceTransformer
+            _MODEL = SentenceTransformer(EMBEDDING_MODEL)
+    return _MODEL
+
+
+def _cosine(a, b):
+    na = np.linalg.norm(a)
+    nb = np.linalg.norm(b)
+    if na == 0 or nb == 0:
+        return 0.0
+    return float(np.dot(a, b) / (na * nb))
+
+
+class PreMerger:
+    """Decides clear-cut adjacent pairs from embeddings; counts what it avoided.
+
+    Counters (stats):
+        merged   — pairs decided 'TRUE' without an LLM call
+        split    — pairs decided 'FALSE' without an LLM call
+        asked    — pairs left to the LLM (inside the ambiguity band)
+    """
+
+    def __init__(self, merge_above=None, split_below=None, source=None, encode=None):
+        self.merge_above = MERGE_ABOVE if merge_above is None else merge_above
+        self.split_below = SPLIT_BELOW if split_below is None else split_below
+        self.source = source or EMBED_SOURCE
+        if self.source not in ('summary', 'lines'):
+            raise ValueError(f"Unknown EMBED_SOURCE: {self.source}")
+        # encode(list_of_texts) -> (N, D) array; defaults to the S-BERT model
+        self.encode = encode or (lambda texts: _get_model().encode(
+            texts, convert_to_numpy=True, show_progress_bar=False))
+        self.cache = {}
+        self.stats = {'merged': 0, 'split': 0, 'asked': 0}
+
+    def _embed_texts(self, texts):
+        # Replace empty strings so the encoder doesn't emit NaNs (as core.py).
+        texts = [t if t.strip() else "." for t in texts]
+        missing = list(dict.fromkeys(t for t in texts if t not in self.cache))
+        if missing:
+            for text, vector in zip(missing, self.encode(missing)):
+                self.cache[text] = np.asarray(vector)
+        return np.stack([self.cache[t] for t in texts])
+
+    def embed(self, summary, lines):
+        """One vector per segment: its summary, or its lines max-pooled."""
+        if self.source == 'summary':
+            return self._embed_texts([summary])[0]
+        return self._embed_texts(lines).max(axis=0)
+
+    def similarity(self, first, second):
+        """Cosine similarity of two segments given as (summary, lines) pairs."""
+        return _cosine(self.embed(*first), self.embed(*second))
+
+    def decide(self, first, second):
+        """'TRUE' / 'FALSE' for clear-cut pairs, None when the LLM should decide."""
+        similarity = self.similarity(first, second)
+        if similarity >= self.merge_above:
+            self.stats['merged'] += 1
+            print(f"    Pre-merge: similarity {similarity:.3f} >= {self.merge_above} -> same story")
+            return 'TRUE'
+        if similarity < self.split_below:
+            self.stats['split'] += 1
+            print(f"    Pre-merge: similarity {similarity:.3f} < {self.split_below} -> different stories")
+            return 'FALSE'
+        self.stats['asked'] += 1
+        return None
@@ -10,11 +10,12 @@ Algorithm overview:
        as the START of a new story segment.
     3. Summarize the story so far using the LLM (llm_summary).
     4. For each subsequent "in" row, ask the LLM whether the new line belongs
-       to a DIFFERENT story than the running summary (llm_different_story).
+       to a DIFFERENT story than the running summary (llm_verdict).
        - If FALSE (same story): re-summarize with all lines so far and continue.
        - If TRUE (different story): mark the previous "in" row as the END of
          the current story, then break out to detect the next segment.
-    5. Write start=TRUE / end=TRUE markers to the output CSV.
+    5. Set start=TRUE / end=TRUE markers in memory and write the output CSV
+       once the transcript is done.
 
     The in/out/ambiguous column and transcript text are preserved as-is from
     the input; only the start and end columns are overwritten by the LLM.
@@ -25,6 +26,38 @@ Input format  (to-label/*.csv):
 Output format (labeled-out/*_labeled.csv):
     Same 4 columns, but start/end reflect the LLM's predictions.
 
+Segment sidecar (labeled-out/*_labeled.segments.json):
+    One entry per closed story segment with its start/end row indices
+    (rows[0] is the header) and the final running summary computed for it,
+    which covers rows[start:summary_end].  That span stops before the row
+    judged to be a different story (the segment's end row), so it is an
+    approximation of the segment's summary: read_segments() keys it by the
+    segment's (start, end) anyway, and join_fixed.py / join_parallel.py use
+    it for that segment instead of summarising it again.  In sliding mode no
+    summaries exist, so each entry's summary is null.
+
+Verdict modes (VERDICT_MODE):
+    "free"        — the original unconstrained TRUE/FALSE prompt.
+    "constrained" — same prompt, but output is capped at VERDICT_MAX_TOKENS
+                    tokens and logprobs are requested where the backend
+                    supports them, so P(TRUE) is available as a confidence
+                    score.  Replies that cannot be parsed fall back to a
+                    free-form call.
+
+    In both modes the reply is normalised by parse_verdict(), so "False.",
+    "TRUE\n" or "'FALSE'" are read as the verdict they spell out.
+
+Detector modes (DETECTOR_MODE):
+    "summary" — the algorithm above.
+    "sliding" — steps 3 and the re-summarise are skipped; each verdict is
+                asked against the last CONTEXT_LINES raw lines of the current
+                story (bounded by CONTEXT_TOKEN_BUDGET) instead of a summary,
+                so every "in" line costs one request instead of two.  The
+                output format is identical.
+
+LLM traffic can be recorded to / replayed from per-transcript cassettes by
+setting LLM_CASSETTE_MODE=record|replay (see cassette.py).
+
 Dependencies:
     - openai (used with Hugging Face Inference base URL)
     - python-dotenv (loads HF_TOKEN from .env)
@@ -35,17 +68,25 @@ Usage:
 
 import csv
 import os
+import re
 import glob
-from openai import OpenAI
+import json
+import math
+import time
+import functools
+from openai import OpenAI, BadRequestError
 from dotenv import load_dotenv
 
+from cassette import REPLAYING, open_cassette
+
 load_dotenv()
 
 # To use OpenAI directly instead of Hugging Face, uncomment the line below
 # and comment out the Hugging Face client block.
 # client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-client = OpenAI(
+# No client (and no API key) is needed when replaying cassettes.
+client = None if REPLAYING else OpenAI(
     base_url="https://router.huggingface.co/v1",
     api_key=os.getenv("HF_TOKEN")
 )
@@ -54,8 +95,30 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 INPUT_DIR = os.path.join(SCRIPT_DIR, "to-label")
 OUTPUT_DIR = os.path.join(SCRIPT_DIR, "labeled-out")
 
+MODEL = "openai/gpt-oss-120b"
+
+# "free" or "constrained" — see the module docstring.
+VERDICT_MODE = "free"
+VERDICT_MAX_TOKENS = 2
+VERDICT_TOP_LOGPROBS = 5
+
+# Models that rejected the logprobs / max_tokens request; constrained calls
+# to these are sent with max_completion_tokens and no logprobs instead.
+_NO_LOGPROBS_MODELS = set()
+
+_VERDICT_RE = re.compile(r"\b(TRUE|FALSE)\b")
+
+# "summary" — verdicts are asked against a running LLM summary (2 calls per
+#             "in" line).
+# "sliding" — no summaries; verdicts are asked against the last CONTEXT_LINES
+#             raw lines of the current story, capped at CONTEXT_TOKEN_BUDGET
+#             (1 call per "in" line).
+DETECTOR_MODE = "summary"
+CONTEXT_LINES = 20
+CONTEXT_TOKEN_BUDGET = 1500
 
-def llm_summary(content):
+
+def llm_summary(content, llm_client=None, model=None):
     """Ask the LLM to produce a brief, objective summary of a transcript excerpt.
 
     Used to maintain a running summary of the current story segment so that
@@ -63,12 +126,14 @@ def llm_summary(content):
 
     Args:
         content: One or more transcript lines (newline-separated string).
+        llm_client: OpenAI-compatible client to use (default: module `client`).
+        model: Model name to use (default: MODEL).
 
     Returns:
         A short plain-text summary string from the LLM.
     """
-    response = client.chat.completions.create(
-        model="openai/gpt-oss-120b",
+    response = (llm_client or client).chat.completions.create(
+        model=model or MODEL,
         messages=[
             {"role": "user", "content": f'''What is the following story about? Note that the story is complete,
             nothing got cut off. Please output the summary and nothing else. Do not reference the user in
@@ -83,7 +148,17 @@ def llm_summary(content):
     return response.choices[0].message.content
 
 
-def llm_different_story(summary, content):
+def _different_story_prompt(summary, content):
+    """Build the different-story question shared by every verdict mode."""
+    return f'''Consider the following summary of a story: {summary}. \n Now
+            consider the following line of the transcript: {content}. \n Your job is to consider whether
+            or not the provided line is part of a different story than the one summarized above. If it is,
+            output 'TRUE'. If it is not, output 'FALSE'. Do not output anything else. Note that filler or
+            other lines not directly adding to the story are not necessarily part of a different story.
+            For example, "." or "you know" or "um" are not a different story.'''
+
+
+def llm_different_story(summary, content, llm_client=None, model=None):
     """Ask the LLM whether a single transcript line belongs to a different story.
 
     Compares one line against the running summary of the current story.
@@ -93,77 +168,233 @@ def llm_different_story(summary, content):
     Args:
         summary: The current story summary produced by llm_summary().
         content: A single transcript line to evaluate.
+        llm_client: OpenAI-compatible client to use (default: module `client`).
+        model: Model name to use (default: MODEL).
 
     Returns:
         'TRUE' if the LLM considers the line part of a different story,
-        'FALSE' otherwise.  (Raw LLM text — exact casing is not guaranteed.)
+        'FALSE' otherwise.  (Raw LLM text — exact casing is not guaranteed;
+        use parse_verdict() to normalise it.)
     """
-    response = client.chat.completions.create(
-        model="openai/gpt-oss-120b",
+    response = (llm_client or client).chat.completions.create(
+        model=model or MODEL,
         messages=[
-            {"role": "user", "content": f'''Consider the following summary of a story: {summary}. \n Now
-            consider the following line of the transcript: {content}. \n Your job is to consider whether
-            or not the provided line is part of a different story than the one summarized above. If it is,
-            output 'TRUE'. If it is not, output 'FALSE'. Do not output anything else. Note that filler or
-            other lines not directly adding to the story are not necessarily part of a different story.
-            For example, "." or "you know" or "um" are not a different story.'''}
+            {"role": "user", "content": _different_story_prompt(summary, content)}
         ]
     )
     return response.choices[0].message.content
 
 
-def create_output_file(input_path, output_path):
-    """Copy the input CSV to output_path, resetting all start/end values to FALSE.
+def parse_verdict(text):
+    """Normalise a raw TRUE/FALSE reply.
+
+    Case, whitespace, quotes and trailing punctuation are ignored, so
+    "False.", "TRUE\n" and "'FALSE'" all parse.  The first TRUE/FALSE word
+    in the reply wins.
 
-    This creates a clean slate so process_transcript() can selectively flip
-    individual rows to TRUE as it detects boundaries.
+    Returns:
+        'TRUE', 'FALSE', or None if the reply contains neither.
     """
-    with open(input_path, 'r', encoding='utf-8') as file:
-        reader = csv.reader(file)
-        rows = list(reader)
-    
-    with open(output_path, 'w', encoding='utf-8', newline='') as file:
-        writer = csv.writer(file)
-        
-        # Write header row as-is
-        writer.writerow(rows[0])
-        
-        # Write data rows with start and end set to FALSE
-        index = 1
-        while index < len(rows):
-            row = rows[index]
-            row[1] = 'FALSE'  # start column
-            row[2] = 'FALSE'  # end column
-            writer.writerow(row)
-            index += 1
+    if not text:
+        return None
+    match = _VERDICT_RE.search(text.upper())
+    return match.group(1) if match else None
+
+
+def _p_true_from_logprobs(choice):
+    """Return P(TRUE) from the first generated token's top logprobs.
+
+    Tokens are matched by prefix ("TR", "True", " FALSE" ...), and the
+    probability mass on TRUE is renormalised against the mass on FALSE.
+    Returns None if the response carries no usable logprobs.
+    """
+    logprobs = getattr(choice, 'logprobs', None)
+    content = getattr(logprobs, 'content', None) if logprobs else None
+    if not content:
+        return None
+    true_mass = 0.0
+    false_mass = 0.0
+    for candidate in content[0].top_logprobs or []:
+        token = candidate.token.strip().strip("'\"`").upper()
+        if not token:
+            continue
+        if 'TRUE'.startswith(token):
+            true_mass += math.exp(candidate.logprob)
+        elif 'FALSE'.startswith(token):
+            false_mass += math.exp(candidate.logprob)
+    if true_mass + false_mass == 0:
+        return None
+    return true_mass / (true_mass + false_mass)
+
+
+def _ask_verdict(prompt, mode, llm_client, model):
+    """Send a TRUE/FALSE prompt in the given verdict mode; see llm_verdict()."""
+    mode = mode or VERDICT_MODE
+    llm_client = llm_client or client
+    model = model or MODEL
+    if mode not in ('free', 'constrained'):
+        raise ValueError(f"Unknown verdict mode: {mode}")
+
+    messages = [{"role": "user", "content": prompt}]
+    verdict = None
+    p_true = None
+    if mode == 'constrained':
+        response = None
+        if model not in _NO_LOGPROBS_MODELS:
+            try:
+                response = llm_client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=VERDICT_MAX_TOKENS,
+                    logprobs=True,
+                    top_logprobs=VERDICT_TOP_LOGPROBS,
+                )
+            except BadRequestError as e:
+                print(f"    Constrained verdict rejected by {model} ({e}); retrying without logprobs")
+                _NO_LOGPROBS_MODELS.add(model)
+        if response is None:
+            response = llm_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_completion_tokens=VERDICT_MAX_TOKENS,
+            )
+        choice = response.choices[0]
+        verdict = parse_verdict(choice.message.content)
+        if verdict is not None:
+            p_true = _p_true_from_logprobs(choice)
+
+    if verdict is None:
+        response = llm_client.chat.completions.create(model=model, messages=messages)
+        verdict = parse_verdict(response.choices[0].message.content) or 'TRUE'
+    if p_true is None:
+        p_true = 1.0 if verdict == 'TRUE' else 0.0
+    return verdict, p_true
+
+
+def llm_verdict(summary, content, mode=None, llm_client=None, model=None):
+    """Ask whether `content` starts a different story and parse the answer.
+
+    In "free" mode the prompt of llm_different_story() is sent as one
+    unconstrained request and the reply is read with parse_verdict().
+    In "constrained" mode the reply is capped at VERDICT_MAX_TOKENS tokens and
+    logprobs are requested; backends that reject logprobs are retried
+    without them and remembered in _NO_LOGPROBS_MODELS.  If the capped reply
+    does not parse (e.g. a reasoning model spent its budget thinking), the
+    free-mode request is sent as well and its answer is used.
+
+    Returns:
+        (verdict, p_true) — verdict is 'TRUE' or 'FALSE' (an unparseable
+        reply counts as 'TRUE', matching the original behaviour of treating
+        anything but 'FALSE' as a boundary); p_true is the model's
+        probability of TRUE when logprobs were available, otherwise 1.0 or
+        0.0 from the parsed verdict.
+    """
+    return _ask_verdict(_different_story_prompt(summary, content), mode, llm_client, model)
 
 
-def update_output_row(output_path, row_index, start_value=None, end_value=None):
-    """Read-modify-write a single row's start/end columns in the output CSV.
+def _context_story_prompt(context, content):
+    """Different-story question asked against raw story lines (sliding mode)."""
+    return f'''Consider the following excerpt from a story, given as the most recent lines of the
+            transcript: \n\n {context} \n\n Now consider the following line of the transcript: {content}.
+            \n Your job is to consider whether or not the provided line is part of a different story than
+            the excerpt above. If it is, output 'TRUE'. If it is not, output 'FALSE'. Do not output
+            anything else. Note the few capital letters starting each line are the names of the
+            characters. Note that filler or other lines not directly adding to the story are not
+            necessarily part of a different story. For example, "." or "you know" or "um" are not a
+            different story.'''
+
+
+def llm_context_verdict(context, content, mode=None, llm_client=None, model=None):
+    """Sliding-context counterpart of llm_verdict().
 
     Args:
-        output_path: Path to the CSV file to modify.
-        row_index:   1-based data row index (rows[0] is the header).
-        start_value: If provided, overwrite the start column for this row.
-        end_value:   If provided, overwrite the end column for this row.
+        context: The most recent raw lines of the current story
+                 (newline-separated string, see sliding_context()).
+        content: A single transcript line to evaluate.
+
+    Returns:
+        (verdict, p_true), as for llm_verdict().
+    """
+    return _ask_verdict(_context_story_prompt(context, content), mode, llm_client, model)
+
+
+def _approx_tokens(text):
+    """Cheap token estimate (~4 characters per token) for context budgeting."""
+    return len(text) // 4 + 1
+
+
+def sliding_context(lines, max_lines=None, token_budget=None):
+    """Return the tail of `lines` that fits in CONTEXT_LINES / CONTEXT_TOKEN_BUDGET.
+
+    Lines are taken from the end backwards.  The most recent line is always
+    kept, even if it alone exceeds the token budget.
     """
-    with open(output_path, 'r', encoding='utf-8') as file:
+    max_lines = max_lines or CONTEXT_LINES
+    token_budget = token_budget or CONTEXT_TOKEN_BUDGET
+    kept = []
+    tokens = 0
+    for line in reversed(lines[-max_lines:]):
+        tokens += _approx_tokens(line)
+        if kept and tokens > token_budget:
+            break
+        kept.append(line)
+    kept.reverse()
+    return '\n'.join(kept)
+
+
+def read_rows(path):
+    """Read a CSV into a list of rows (rows[0] is the header)."""
+    with open(path, 'r', encoding='utf-8') as file:
         reader = csv.reader(file)
-        rows = list(reader)
-    
-    # row_index is 1-based (matching the data), rows[0] is header
-    if start_value is not None:
-        rows[row_index][1] = start_value
-    if end_value is not None:
-        rows[row_index][2] = end_value
-    
-    with open(output_path, 'w', encoding='utf-8', newline='') as file:
+        return list(reader)
+
+
+def write_rows(path, rows):
+    """Write a list of rows (header included) to a CSV."""
+    with open(path, 'w', encoding='utf-8', newline='') as file:
         writer = csv.writer(file)
         writer.writerows(rows)
 
 
-def process_transcript(input_path, output_path):
-    """Run the story-boundary detection algorithm on one transcript.
+def segments_path(labeled_path):
+    """Sidecar path for a labeled CSV: 10_labeled.csv -> 10_labeled.segments.json."""
+    return os.path.splitext(labeled_path)[0] + '.segments.json'
+
+
+def write_segments(labeled_path, segments):
+    """Write the segment sidecar for a labeled CSV (see module docstring)."""
+    with open(segments_path(labeled_path), 'w', encoding='utf-8') as file:
+        json.dump({'segments': segments}, file, indent=1, ensure_ascii=False)
+
+
+def read_segments(labeled_path):
+    """Load a labeled CSV's sidecar as {(start, end): summary} (see segment_summaries()).
+
+    Returns an empty dict if there is no sidecar or it has no summaries.
+    """
+    path = segments_path(labeled_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    return segment_summaries(data['segments'])
+
+
+def segment_summaries(segments):
+    """{(start, end): summary} for the segments (as from label_rows) that have one.
+
+    Deliberately approximate: the summary covers rows[start:summary_end],
+    which never includes the segment's end row (the line judged to be a
+    different story) and may miss "out" rows before it.  No exact key is
+    possible without an extra summary call per segment, which would only
+    move the call from the join step to labeling, so the near-complete
+    running summary stands in for the whole segment.
+    """
+    return {(seg['start'], seg['end']): seg['summary'] for seg in segments if seg['summary'] is not None}
+
+
+def label_rows(rows, summarize=None, verdict=None, detector=None, llm_client=None):
+    """Run the story-boundary detection algorithm on one parsed transcript.
 
     Outer loop: scans rows for the first "in" label (story start).
     Inner loop: continues from that point, asking the LLM whether each
@@ -174,19 +405,42 @@ def process_transcript(input_path, output_path):
     The variable `recent_in` tracks the last row labeled "in" so that
     the end marker lands on actual story content, not on an intervening
     "out" row.
+
+    `rows` is not modified, so one parse of a transcript can be labeled
+    by several models (see label_multi.py).
+
+    Args:
+        rows:        Parsed transcript, rows[0] is the header.
+        summarize:   Callable(content) -> summary (default: llm_summary).
+        verdict:     Callable(summary, line) -> (verdict, p_true)
+                     (default: llm_verdict, or llm_context_verdict in
+                     sliding mode).  Lets callers such as cascade.py route
+                     calls to other models.
+        detector:    "summary" or "sliding" (default: DETECTOR_MODE).
+        llm_client:  Client for the default summarize/verdict callables
+                     (default: module `client`), e.g. a cassette.
+
+    Returns:
+        (out_rows, verdicts, segments) — out_rows is a copy of `rows` with
+        every start/end reset to FALSE and the detected boundaries set to
+        TRUE; verdicts is a list of (row_index, verdict, p_true) tuples, one
+        per verdict asked, so callers can inspect the model's confidence;
+        segments is the sidecar content, one dict per closed segment with
+        'start', 'end', 'summary' and 'summary_end'.
     """
-    print(f"\n{'='*60}")
-    print(f"Processing: {input_path}")
-    print(f"Output to: {output_path}")
-    print(f"{'='*60}")
-    
-    # Create the output file with initialized columns
-    create_output_file(input_path, output_path)
-    
-    with open(input_path, 'r', encoding='utf-8') as file:
-        reader = csv.reader(file)
-        rows = list(reader)
-    
+    detector = detector or DETECTOR_MODE
+    if detector not in ('summary', 'sliding'):
+        raise ValueError(f"Unknown detector mode: {detector}")
+    sliding = detector == 'sliding'
+    summarize = summarize or functools.partial(llm_summary, llm_client=llm_client)
+    verdict = verdict or functools.partial(llm_context_verdict if sliding else llm_verdict,
+                                           llm_client=llm_client)
+
+    # Header as-is, data rows with start and end set to FALSE
+    out_rows = [list(rows[0])] + [[row[0], 'FALSE', 'FALSE'] + row[3:] for row in rows[1:]]
+
+    verdicts = []
+    segments = []
     index = 1
     run_length = len(rows) - 1  # -1 because rows is 0-indexed
     while index <= run_length:
@@ -198,9 +452,12 @@ def process_transcript(input_path, output_path):
             line = row[3]
             print(f"  >>> STORY START at line {start + 1}")
             print(f"  >>> First line: {line}")
-            update_output_row(output_path, start, start_value='TRUE')
-            summary = llm_summary(line)
-            print(f"  >>> Initial summary: {summary}")
+            out_rows[start][1] = 'TRUE'
+            summary = None
+            summary_end = start + 1
+            if not sliding:
+                summary = summarize(line)
+                print(f"  >>> Initial summary: {summary}")
             index += 1
             recent_in = start
             while index <= run_length:
@@ -210,12 +467,21 @@ def process_transcript(input_path, output_path):
                 if row[0] == 'in':
                     recent_in = index
                     print(f"    Found 'in' at line {file_line}: {row[3][:40]}...")
-                    different_story = llm_different_story(summary, row[3])
-                    print(f"    LLM says different story? {different_story}")
-                    if different_story == 'FALSE':
+                    if sliding:
+                        window = rows[max(start, index - CONTEXT_LINES):index]
+                        context = sliding_context([r[3] for r in window])
+                        different_story, p_true = verdict(context, row[3])
+                    else:
+                        different_story, p_true = verdict(summary, row[3])
+                    verdicts.append((index, different_story, p_true))
+                    print(f"    LLM says different story? {different_story} (P(TRUE)={p_true:.3f})")
+                    if different_story == 'FALSE' and sliding:
+                        print(f"    Same story, context slides on")
+                    elif different_story == 'FALSE':
                         story_lines = [r[3] for r in rows[start:index+1]]
                         print(f"    Updating summary with lines {start + 1}-{file_line}")
-                        summary = llm_summary('\n'.join(story_lines))
+                        summary = summarize('\n'.join(story_lines))
+                        summary_end = index + 1
                         print(f"    New summary: {summary}")
                     else:
                         print(f"  <<< STORY END - LLM said TRUE, breaking")
@@ -225,10 +491,37 @@ def process_transcript(input_path, output_path):
                 print(f"  <<< Reached run length, breaking")
                 break
             print(f"  <<< STORY END at line {recent_in + 1}")
-            update_output_row(output_path, recent_in, end_value='TRUE')
+            out_rows[recent_in][2] = 'TRUE'
+            segments.append({'start': start, 'end': recent_in,
+                             'summary': summary, 'summary_end': summary_end})
         index += 1
-    
+
+    return out_rows, verdicts, segments
+
+
+def process_transcript(input_path, output_path, summarize=None, verdict=None, detector=None,
+                       llm_client=None):
+    """Label one transcript file and write the result to output_path.
+
+    Reads the input once, runs label_rows() in memory and writes the
+    labeled CSV and its segment sidecar once.  See label_rows() for the
+    arguments.
+
+    Returns:
+        The list of (row_index, verdict, p_true) tuples from label_rows().
+    """
+    print(f"\n{'='*60}")
+    print(f"Processing: {input_path}")
+    print(f"Output to: {output_path}")
+    print(f"{'='*60}")
+
+    rows = read_rows(input_path)
+    out_rows, verdicts, segments = label_rows(rows, summarize, verdict, detector, llm_client)
+    write_rows(output_path, out_rows)
+    write_segments(output_path, segments)
+
     print(f"\nCompleted: {input_path}")
+    return verdicts
 
 
 def main():
@@ -247,6 +540,7 @@ def main():
         print(f"  - {f}")
     
     # Process each file
+    timings = []
     for input_path in input_files:
         filename = os.path.basename(input_path)
         # Create output filename (add _labeled suffix)
@@ -254,10 +548,16 @@ def main():
         output_filename = f"{name}_labeled{ext}"
         output_path = os.path.join(OUTPUT_DIR, output_filename)
         
-        process_transcript(input_path, output_path)
+        started = time.perf_counter()
+        with open_cassette('process_data', name, client) as llm_client:
+            verdicts = process_transcript(input_path, output_path, llm_client=llm_client)
+        timings.append((filename, len(verdicts), time.perf_counter() - started))
     
     print(f"\n{'='*60}")
     print(f"All files processed! Output in {OUTPUT_DIR}/")
+    print(f"Detector mode: {DETECTOR_MODE}")
+    for filename, num_verdicts, seconds in timings:
+        print(f"  {filename:<20} {num_verdicts:>6} verdicts {seconds:>9.1f} s")
     print(f"{'='*60}")
 
 
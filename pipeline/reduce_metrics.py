@@ -0,0 +1,49 @@
+"""
+Reduce Sharded Analysis Metrics
+
+When transcripts are labeled and analyzed in shards (several workers or
+machines, each running analysis.py on its own files with --shard-out), this
+command merges the shards' metrics.MetricsAccumulator files and prints the
+same per-file tables and overall report that one analysis.py run over all
+the transcripts prints, without re-reading any comparison CSV.
+
+Merging only adds counts and joins disjoint per-file maps, so shards can
+be reduced in any order or grouping (a reduced file can itself be reduced
+again).  A transcript present in two shards is an error.
+
+Usage:
+    python reduce_metrics.py SHARD.json [SHARD.json ...]
+                             [--out MERGED.json] [--summary PATH]
+"""
+
+import argparse
+from functools import reduce
+
+from analysis import print_report, write_summary
+from metrics import MetricsAccumulator
+
+
+def build_parser():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("shards", nargs='+', metavar="SHARD", help="Accumulator files from analysis.py --shard-out.")
+    p.add_argument("--out", default=None, help="Write the merged accumulator here.")
+    p.add_argument("--summary", default=None, help="Write per-file and overall metrics here (.json or .csv).")
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    accumulator = reduce(MetricsAccumulator.merge, (MetricsAccumulator.load(path) for path in args.shards))
+    print(f"Merged {len(args.shards)} shard(s), {len(accumulator.files)} transcript(s)")
+    print_report(accumulator)
+
+    if args.out:
+        accumulator.save(args.out)
+        print(f"\nMerged accumulator written to {args.out}")
+    if args.summary:
+        write_summary(args.summary, list(accumulator.files.items()), accumulator.overall())
+        print(f"Summary written to {args.summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Story-Level Agreement (segment-instance precision / recall)
+
+analysis.py's segment IoU is line-level: it says how many lines both sides
+put inside some story, not whether each human story was found as a story
+of its own.  This script extracts the human and LLM stories of every
+transcript as (start, end) row intervals and matches them one-to-one by
+IoU (metrics.story_counts()), then reports
+
+    story precision = matched LLM stories / LLM stories
+    story recall    = matched human stories / human stories
+    story F1
+
+at every IoU threshold of the grid, per comparison folder (and optionally
+per file).  Counts are pooled over the transcripts of a folder.
+
+Input: comparison CSVs as written by analysis.py.  With no arguments every
+*-compare-* folder under data/ is scored, plus labeled-compare/ if it has
+files, in one call.
+
+Usage:
+    python stories.py [COMPARE_DIR ...] [--thresholds 0.1 0.5 0.9]
+                      [--per-file] [--summary PATH.csv]
+"""
+
+import os
+import csv
+import glob
+import time
+import argparse
+
+import numpy as np
+
+from metrics import STORY_THRESHOLDS, flags, story_counts, story_intervals, story_rates
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(SCRIPT_DIR, "..", "data")
+COMPARE_DIR = os.path.join(SCRIPT_DIR, "labeled-compare")
+
+
+def default_compare_dirs():
+    """Every *-compare-* folder under data/, then labeled-compare/ if it has files."""
+    dirs = sorted(d for d in glob.glob(os.path.join(DATA_DIR, "*", "*-compare-*")) if os.path.isdir(d))
+    if glob.glob(os.path.join(COMPARE_DIR, "*_compare.csv")):
+        dirs.append(COMPARE_DIR)
+    return dirs
+
+
+def compare_file_counts(path, thresholds):
+    """story_counts() of one *_compare.csv (start/end columns 1-4)."""
+    with open(path, 'r', encoding='utf-8') as file:
+        rows = [r for r in list(csv.reader(file))[1:] if len(r) >= 5]
+    sh, sl, eh, el = (flags([r[c] for r in rows], ignore_case=True) for c in (1, 2, 3, 4))
+    return story_counts(story_intervals(sh, eh), story_intervals(sl, el), thresholds)
+
+
+def add_story_counts(total, counts):
+    """Add one transcript's story_counts() into a running total (in place)."""
+    total['truth'] = total.get('truth', 0) + counts['truth']
+    total['pred'] = total.get('pred', 0) + counts['pred']
+    matched = total.setdefault('matched', {})
+    for threshold, value in counts['matched'].items():
+        matched[threshold] = matched.get(threshold, 0) + value
+    return total
+
+
+def score_dir(compare_dir, thresholds):
+    """(per-file counts, pooled counts) for one comparison folder."""
+    per_file = {}
+    total = {}
+    for path in sorted(glob.glob(os.path.join(compare_dir, "*_compare.csv"))):
+        name = os.path.basename(path).rsplit("_compare.csv", 1)[0]
+        per_file[name] = compare_file_counts(path, thresholds)
+        add_story_counts(total, per_file[name])
+    return per_file, total
+
+
+def _print_table(label, counts):
+    print(f"  {label}: {counts['truth']} human stories, {counts['pred']} LLM stories")
+    print(f"    {'IoU >=':>7} {'Matched':>8} {'Prec':>8} {'Recall':>8} {'F1':>8}")
+    for threshold, r in story_rates(counts).items():
+        print(f"    {threshold:>7} {counts['matched'][threshold]:>8} "
+              f"{r['precision']:>8.4f} {r['recall']:>8.4f} {r['f1']:>8.4f}")
+
+
+def write_summary(path, results):
+    """One CSV row per (folder, file, threshold); file is OVERALL for pooled counts."""
+    fields = ['folder', 'file', 'threshold', 'human_stories', 'llm_stories', 'matched',
+              'precision', 'recall', 'f1']
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+        for folder, (per_file, total) in results.items():
+            for name, counts in [*per_file.items(), ('OVERALL', total)]:
+                for threshold, r in story_rates(counts).items():
+                    writer.writerow({'folder': folder, 'file': name, 'threshold': threshold,
+                                     'human_stories': counts['truth'], 'llm_stories': counts['pred'],
+                                     'matched': counts['matched'][threshold], **r})
+
+
+def build_parser():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("compare_dirs", nargs='*', metavar="COMPARE_DIR",
+                   help="Comparison directories (default: every *-compare-* folder under data/).")
+    p.add_argument("--thresholds", type=float, nargs='+', default=list(STORY_THRESHOLDS),
+                   help=f"IoU thresholds (default: {' '.join(map(str, STORY_THRESHOLDS))}).")
+    p.add_argument("--per-file", action="store_true", help="Also print every file's table.")
+    p.add_argument("--summary", default=None, help="Write all counts and rates to this CSV.")
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    compare_dirs = args.compare_dirs or default_compare_dirs()
+    if not compare_dirs:
+        print(f"No comparison folders found under {DATA_DIR}/ or {COMPARE_DIR}/")
+        return
+    thresholds = sorted(set(args.thresholds))
+
+    started = time.perf_counter()
+    results = {}
+    for compare_dir in compare_dirs:
+        folder = os.path.basename(os.path.normpath(compare_dir))
+        per_file, total = score_dir(compare_dir, thresholds)
+        if not per_file:
+            print(f"\nNo *_compare.csv files in {compare_dir}/")
+            continue
+        results[folder] = (per_file, total)
+
+        print(f"\n{'='*60}")
+        print(f"{folder}: {len(per_file)} file(s)")
+        print(f"{'='*60}")
+        if args.per_file:
+            for name, counts in per_file.items():
+                _print_table(name, counts)
+        _print_table("OVERALL", total)
+
+    if results:
+        print(f"\n{'='*60}")
+        print("STORY F1 BY FOLDER")
+        print(f"{'='*60}")
+        print(f"  {'Folder':<36} " + " ".join(f"{'@' + str(t):>7}" for t in thresholds))
+        for folder, (_, total) in results.items():
+            rates_by_threshold = story_rates(total)
+            print(f"  {folder:<36} " + " ".join(f"{rates_by_threshold[str(t)]['f1']:>7.4f}" for t in thresholds))
+    print(f"\nScored {sum(len(r[0]) for r in results.values())} file(s) in {time.perf_counter() - started:.2f} s")
+
+    if args.summary and results:
+        write_summary(args.summary, results)
+        print(f"Summary written to {args.summary}")
+
+
+if __name__ == "__main__":
+    main()
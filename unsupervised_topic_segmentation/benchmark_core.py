@@ -0,0 +1,246 @@
+"""Equivalence check and benchmark for the vectorised kernels in ``core.py``.
+
+``core.block_comparison_score``, ``depth_score``, ``smooth`` and
+``get_local_maxima`` used to be Python loops (``depth_score`` quadratic on
+monotone stretches).  This script keeps those loops as the reference
+implementations, checks the current kernels against them on random and
+adversarial inputs (monotone runs, plateaus, ties, zigzags, very short
+series, ``k = 0`` and constant rows), and times both on synthetic
+transcripts from 100 to 100k utterances.
+
+The scores of ``block_comparison_score`` agree to float32 rounding; the
+other three kernels must match the reference exactly.
+
+No model is loaded: embeddings are random ``float32`` matrices of the
+S-BERT width (768 by default), so the timings measure the kernels only.
+
+Examples:
+
+    python benchmark_core.py
+    python benchmark_core.py --sizes 100 1000 --dim 384 --window 5
+    python benchmark_core.py --reference-limit 10000   # skip the slow loop above 10k
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable, List
+
+import numpy as np
+
+import core
+from seg_types import TextTilingHyperparameters
+
+SIZES = (100, 1000, 10000, 100000)
+DIM = 768
+# Agreement expected between the vectorised and reference scores: both run
+# in the embeddings' float32, with different summation orders.
+TOLERANCE = 1e-5
+# Largest monotone series the quadratic reference depth_score is timed on.
+DEPTH_REFERENCE_LIMIT = 5000
+
+
+# --- Reference (original loop) implementations ----------------------------
+
+def _reference_cosine(a: np.ndarray, b: np.ndarray) -> float:
+    na = np.linalg.norm(a)
+    nb = np.linalg.norm(b)
+    if na == 0 or nb == 0:
+        return 0.0
+    return float(np.dot(a, b) / (na * nb))
+
+
+def _reference_block_embedding(embeddings: np.ndarray, start: int, end: int) -> np.ndarray:
+    block = embeddings[start:end]
+    if block.shape[0] == 0:
+        return np.zeros(embeddings.shape[1], dtype=embeddings.dtype)
+    return block.max(axis=0)
+
+
+def reference_block_comparison_score(embeddings: np.ndarray, k: int) -> List[float]:
+    scores = []
+    n = embeddings.shape[0]
+    for i in range(k, n - k):
+        left = _reference_block_embedding(embeddings, i - k, i + 1)
+        right = _reference_block_embedding(embeddings, i + 1, i + k + 2)
+        scores.append(_reference_cosine(left, right))
+    return scores
+
+
+def reference_depth_score(timeseries: List[float]) -> List[float]:
+    depth_scores = []
+    for i in range(1, len(timeseries) - 1):
+        left, right = i - 1, i + 1
+        while left > 0 and timeseries[left - 1] > timeseries[left]:
+            left -= 1
+        while right < (len(timeseries) - 1) and timeseries[right + 1] > timeseries[right]:
+            right += 1
+        depth_scores.append(
+            (timeseries[right] - timeseries[i]) + (timeseries[left] - timeseries[i])
+        )
+    return depth_scores
+
+
+def reference_smooth(timeseries: List[float], n: int, s: int) -> List[float]:
+    smoothed = list(timeseries)
+    for _ in range(n):
+        for index in range(len(smoothed)):
+            neighbours = smoothed[max(0, index - s): min(len(timeseries) - 1, index + s)]
+            if neighbours:
+                smoothed[index] = sum(neighbours) / len(neighbours)
+    return smoothed
+
+
+def reference_get_local_maxima(array: List[float]):
+    local_maxima_indices = []
+    local_maxima_values = []
+    for i in range(1, len(array) - 1):
+        if array[i - 1] < array[i] and array[i] > array[i + 1]:
+            local_maxima_indices.append(i)
+            local_maxima_values.append(array[i])
+    return local_maxima_indices, local_maxima_values
+
+
+# --- Checks -----------------------------------------------------------------
+
+def _max_difference(a: List[float], b: List[float]) -> float:
+    if len(a) != len(b):
+        raise AssertionError(f"length {len(a)} != {len(b)}")
+    if not a:
+        return 0.0
+    return float(np.max(np.abs(np.asarray(a) - np.asarray(b))))
+
+
+def check_block_comparison_score(rng: np.random.Generator) -> None:
+    """Vectorised vs reference on random and edge-case embeddings."""
+    cases = []
+    for _ in range(200):
+        n = int(rng.integers(0, 60))
+        k = int(rng.integers(0, 8))
+        cases.append((rng.standard_normal((n, int(rng.integers(1, 16)))).astype(np.float32), k))
+    cases.append((np.zeros((12, 4), dtype=np.float32), 2))               # zero rows -> 0 similarity
+    cases.append((np.ones((12, 4), dtype=np.float32), 3))                # constant rows -> 1
+    cases.append((-np.abs(rng.standard_normal((15, 4))), 2))             # all negative, float64
+    cases.append((rng.standard_normal((7, 4)).astype(np.float32), 3))    # n == 2k + 1
+    for embeddings, k in cases:
+        got = core.block_comparison_score(embeddings, k)
+        want = reference_block_comparison_score(embeddings, k)
+        diff = _max_difference(got, want)
+        if diff > TOLERANCE:
+            raise AssertionError(f"block_comparison_score differs by {diff} (n={len(embeddings)}, k={k})")
+    print(f"  block_comparison_score: {len(cases)} cases match the reference")
+
+
+def _series_cases(rng: np.random.Generator) -> List[List[float]]:
+    """Random series plus the shapes the loops handled specially."""
+    cases: List[List[float]] = [[], [0.5], [0.5, 0.2], [0.2, 0.5, 0.2], [0.5, 0.2, 0.5]]
+    for _ in range(300):
+        n = int(rng.integers(3, 80))
+        values = rng.random(n)
+        if rng.random() < 0.5:
+            values = np.round(values, 1)  # many ties and plateaus
+        cases.append(values.tolist())
+    for n in (3, 10, 257):
+        ramp = np.linspace(0.0, 1.0, n)
+        cases += [ramp.tolist(), ramp[::-1].tolist(), [0.3] * n,                       # monotone, constant
+                  np.where(np.arange(n) % 2, 1.0, 0.0).tolist(),                       # zigzag
+                  np.abs(np.linspace(-1.0, 1.0, n)).tolist(),                          # single valley
+                  (1 - np.abs(np.linspace(-1.0, 1.0, n))).tolist(),                    # single peak
+                  np.repeat(rng.random(n // 3 + 1), 3)[:n].tolist()]                  # plateaus of 3
+    return cases
+
+
+def check_series_kernels(rng: np.random.Generator) -> None:
+    """depth_score, smooth and get_local_maxima vs the reference loops, exactly."""
+    cases = _series_cases(rng)
+    for series in cases:
+        if core.depth_score(series) != reference_depth_score(series):
+            raise AssertionError(f"depth_score differs on {series[:10]}... (len {len(series)})")
+        if core.get_local_maxima(series) != reference_get_local_maxima(series):
+            raise AssertionError(f"get_local_maxima differs on {series[:10]}... (len {len(series)})")
+        for passes in (0, 1, 2, 3):
+            for half_width in (0, 1, 2, 3):
+                if core.smooth(series, passes, half_width) != reference_smooth(series, passes, half_width):
+                    raise AssertionError(f"smooth(n={passes}, s={half_width}) differs on {series[:10]}...")
+    print(f"  depth_score, smooth, get_local_maxima: {len(cases)} series match the reference exactly")
+
+
+# --- Benchmark --------------------------------------------------------------
+
+def _time(fn: Callable[[], object]) -> tuple:
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def _benchmark_series(sizes: List[int], reference_limit: int, rng: np.random.Generator) -> None:
+    tt = TextTilingHyperparameters()
+    kernels = [
+        ("smooth", lambda x: core.smooth(x, tt.SMOOTHING_PASSES, tt.SMOOTHING_WINDOW),
+         lambda x: reference_smooth(x, tt.SMOOTHING_PASSES, tt.SMOOTHING_WINDOW)),
+        ("depth_score", core.depth_score, reference_depth_score),
+        ("get_local_maxima", core.get_local_maxima, reference_get_local_maxima),
+    ]
+    for shape in ("random", "monotone"):
+        print(f"\n  Series kernels on {shape} series (depth_score's loop is quadratic on monotone ones)")
+        print(f"  {'kernel':<17} {'N':>8} {'current s':>10} {'loop s':>10} {'speedup':>8}")
+        for n in sizes:
+            series = (rng.random(n) if shape == "random" else np.linspace(0.0, 1.0, n)).tolist()
+            # The quadratic loop gets its own, smaller limit on monotone input
+            limit = reference_limit if shape == "random" else min(reference_limit, DEPTH_REFERENCE_LIMIT)
+            for name, fast_fn, slow_fn in kernels:
+                got, fast = _time(lambda: fast_fn(series))
+                if n <= (limit if name == "depth_score" else reference_limit):
+                    want, slow = _time(lambda: slow_fn(series))
+                    if got != want:
+                        raise AssertionError(f"{name} differs from the reference at N={n}")
+                    print(f"  {name:<17} {n:>8} {fast:>10.4f} {slow:>10.4f} {slow / max(fast, 1e-9):>7.1f}x")
+                else:
+                    print(f"  {name:<17} {n:>8} {fast:>10.4f} {'-':>10} {'-':>8}")
+
+
+def benchmark(sizes: List[int], dim: int, window: int, reference_limit: int, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    print(f"\n  block_comparison_score, D={dim}, k={window}")
+    print(f"  {'N':>8} {'vectorised s':>13} {'loop s':>10} {'speedup':>8} {'max |diff|':>11}")
+    for n in sizes:
+        embeddings = rng.standard_normal((n, dim)).astype(np.float32)
+        got, fast = _time(lambda: core.block_comparison_score(embeddings, window))
+        if n <= reference_limit:
+            want, slow = _time(lambda: reference_block_comparison_score(embeddings, window))
+            diff = _max_difference(got, want)
+            print(f"  {n:>8} {fast:>13.4f} {slow:>10.4f} {slow / fast:>7.1f}x {diff:>11.2e}")
+        else:
+            print(f"  {n:>8} {fast:>13.4f} {'-':>10} {'-':>8} {'-':>11}")
+    _benchmark_series(sizes, reference_limit, rng)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description="Check core.py's vectorised kernels against the original loops and time them.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    p.add_argument("--sizes", type=int, nargs="+", default=list(SIZES),
+                   help="Utterances per synthetic transcript (default: 100 1000 10000 100000).")
+    p.add_argument("--dim", type=int, default=DIM, help=f"Embedding width (default: {DIM}).")
+    p.add_argument("--window", type=int, default=TextTilingHyperparameters().SENTENCE_COMPARISON_WINDOW,
+                   help="Block size k (default: SENTENCE_COMPARISON_WINDOW).")
+    p.add_argument("--reference-limit", type=int, default=max(SIZES),
+                   help="Largest N to also time the reference loop on.")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--skip-checks", action="store_true", help="Only run the benchmark.")
+    return p
+
+
+def main(argv=None) -> None:
+    args = build_parser().parse_args(argv)
+    if not args.skip_checks:
+        print("Equivalence checks:")
+        check_block_comparison_score(np.random.default_rng(args.seed))
+        check_series_kernels(np.random.default_rng(args.seed))
+    benchmark(args.sizes, args.dim, args.window, args.reference_limit, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Utterance throughput of corpus-wide vs per-meeting encoding.
+
+``core.topic_segmentation_bert`` used to call ``model.encode`` once per
+transcript (``core._encode_utterances``), so every batch was limited to
+one transcript's lines and padded to the longest of them.  It now goes
+through ``core.encode_corpus``: the distinct utterances of the whole corpus
+are encoded once, sorted by token count into tightly padded batches
+(``core.encode_bucketed``), and scattered back per meeting.
+
+This script encodes the same transcripts without the embedding cache:
+
+    per-meeting        every line, one ``model.encode`` call per transcript
+    per-meeting dedup  the same calls, but each distinct utterance only in
+                       the first transcript it appears in
+    corpus             ``core.encode_corpus``
+
+Throughput (Utt/s) counts the utterances each path actually encoded, so
+the gain from encoding repeated lines once (per-meeting vs per-meeting
+dedup) is reported apart from the gain from length-sorted batching
+(per-meeting dedup vs corpus), which encode the same distinct texts.  The
+largest cosine distance between the per-meeting and corpus vectors is
+printed too (padding changes the arithmetic slightly; the vectors should
+agree to float32 rounding).
+
+Requires sentence-transformers (and torch).  Runs on the CPU by default.
+
+Examples:
+
+    python benchmark_encoding.py
+    python benchmark_encoding.py --input-dir ../data/in-person-adult/in-person-adult-human --threads 8
+    python benchmark_encoding.py --algorithm bert --limit 10 --batch-tokens 32768
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from typing import Dict, List
+
+import numpy as np
+
+import core
+from dataset import CAPTION_COL, MEETING_ID_COL, load_directory
+from embedding_cache import normalise
+from seg_types import TopicSegmentationAlgorithm
+
+INPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "siblings", "siblings-human")
+
+_ALG_CHOICES = {
+    "bert": TopicSegmentationAlgorithm.BERT,
+    "sbert": TopicSegmentationAlgorithm.SBERT,
+}
+
+
+def _per_meeting(meetings: Dict[str, List[str]], algorithm: TopicSegmentationAlgorithm) -> Dict[str, np.ndarray]:
+    # Normalised as encode_corpus does, so both paths see the same texts
+    return {meeting_id: core._encode_utterances([normalise(s) for s in sentences], algorithm)
+            for meeting_id, sentences in meetings.items()}
+
+
+def _first_occurrences(meetings: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Each transcript's normalised lines not seen in an earlier transcript (or earlier in it)."""
+    seen = set()
+    out = {}
+    for meeting_id, sentences in meetings.items():
+        fresh = []
+        for text in map(normalise, sentences):
+            if text not in seen:
+                seen.add(text)
+                fresh.append(text)
+        out[meeting_id] = fresh
+    return out
+
+
+def _max_cosine_distance(a: Dict[str, np.ndarray], b: Dict[str, np.ndarray]) -> float:
+    worst = 0.0
+    for meeting_id, x in a.items():
+        y = b[meeting_id].astype(np.float64)
+        x = x.astype(np.float64)
+        cosines = np.einsum("ij,ij->i", x, y) / (np.linalg.norm(x, axis=1) * np.linalg.norm(y, axis=1))
+        worst = max(worst, float(np.max(1 - cosines)))
+    return worst
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--input-dir", default=INPUT_DIR, help="Directory of project CSVs (default: siblings-human).")
+    p.add_argument("--algorithm", choices=list(_ALG_CHOICES), default="sbert",
+                   help="Which encoder to benchmark (default: sbert).")
+    p.add_argument("--limit", type=int, default=None, help="Only use the first N transcripts.")
+    p.add_argument("--batch-tokens", type=int, default=core.BATCH_TOKENS,
+                   help=f"Padded tokens per corpus batch (default: {core.BATCH_TOKENS}).")
+    p.add_argument("--batch-size", type=int, default=core.BATCH_SIZE,
+                   help=f"Utterances per corpus batch at most (default: {core.BATCH_SIZE}).")
+    p.add_argument("--device", default="cpu", help="Torch device to encode on (default: cpu).")
+    p.add_argument("--threads", type=int, default=None, help="torch.set_num_threads (default: torch's choice).")
+    return p
+
+
+def main(argv=None) -> None:
+    args = build_parser().parse_args(argv)
+    import torch
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    core.BATCH_TOKENS = args.batch_tokens
+    core.BATCH_SIZE = args.batch_size
+    algorithm = _ALG_CHOICES[args.algorithm]
+
+    df = load_directory(args.input_dir)
+    meeting_ids = sorted(set(df[MEETING_ID_COL]))[:args.limit]
+    meetings = {meeting_id: list(df.loc[df[MEETING_ID_COL] == meeting_id, CAPTION_COL].astype(str))
+                for meeting_id in meeting_ids}
+    total = sum(len(sentences) for sentences in meetings.values())
+    unique = len({normalise(s) for sentences in meetings.values() for s in sentences})
+
+    model = core._get_model(algorithm).to(args.device)
+    model.encode(["warm up"], show_progress_bar=False)  # first call allocates; keep it out of the timings
+    print(f"{len(meetings)} transcript(s), {total} utterances, {unique} distinct, "
+          f"{args.algorithm} on {args.device} ({torch.get_num_threads()} threads)")
+
+    started = time.perf_counter()
+    per_meeting = _per_meeting(meetings, algorithm)
+    per_meeting_s = time.perf_counter() - started
+
+    deduplicated = {meeting_id: fresh for meeting_id, fresh in _first_occurrences(meetings).items() if fresh}
+    started = time.perf_counter()
+    _per_meeting(deduplicated, algorithm)
+    deduplicated_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    corpus = core.encode_corpus(meetings, algorithm)
+    corpus_s = time.perf_counter() - started
+
+    print(f"\n  {'Path':<18} {'Encoded':>8} {'Seconds':>9} {'Utt/s':>9}")
+    for name, encoded, seconds in (("per-meeting", total, per_meeting_s),
+                                   ("per-meeting dedup", unique, deduplicated_s),
+                                   ("corpus", unique, corpus_s)):
+        print(f"  {name:<18} {encoded:>8} {seconds:>9.2f} {encoded / seconds:>9.1f}")
+    print(f"\n  Speedup: {per_meeting_s / corpus_s:.2f}x overall, "
+          f"{per_meeting_s / deduplicated_s:.2f}x from deduplication, "
+          f"{deduplicated_s / corpus_s:.2f}x from batching")
+    print(f"  Max cosine distance between per-meeting and corpus vectors: "
+          f"{_max_cosine_distance(per_meeting, corpus):.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,7 @@ import glob
 import os
 from typing import Dict, List, Tuple
 
+import numpy as np
 from nltk.metrics.segmentation import pk, windowdiff
 
 from core import topic_segmentation
@@ -30,6 +31,7 @@ from dataset import (
     MEETING_ID_COL, START_COL, END_COL, CAPTION_COL,
     START_LBL_COL, END_LBL_COL, load_directory, human_boundary_labels,
 )
+from embedding_cache import CACHE_DIR
 from eval import (
     boundaries_to_binary, binary_to_nltk_string,
     compute_pipeline_metrics, compute_pk_windiff,
@@ -38,6 +40,9 @@ from seg_types import (
     TopicSegmentationAlgorithm, TopicSegmentationConfig, TextTilingHyperparameters,
 )
 
+# The confusion-matrix / IoU kernel is shared with pipeline/analysis.py.
+from pipeline_metrics import compare_labels, family_metrics, flags
+
 
 DATA_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data"))
 
@@ -67,86 +72,54 @@ DATASETS = [
 
 # --- Metric aggregation helpers -----------------------------------------
 
-def _metrics(tp, tn, fp, fn):
-    total = tp + tn + fp + fn
-    acc = (tp + tn) / total if total else 0.0
-    prec = tp / (tp + fp) if (tp + fp) else 0.0
-    rec = tp / (tp + fn) if (tp + fn) else 0.0
-    f1 = 2 * prec * rec / (prec + rec) if (prec + rec) else 0.0
-    return {"accuracy": acc, "precision": prec, "recall": rec, "f1": f1}
+def _concat(parts: List[np.ndarray]) -> np.ndarray:
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=bool)
+
+
+def _boundary_list(starts: np.ndarray) -> List[int]:
+    """Start flags as a 0/1 list with the first-row "boundary" dropped (Pk/WinDiff convention)."""
+    out = starts.astype(int).tolist()
+    if out:
+        out[0] = 0
+    return out
 
 
 def _aggregate_compare_csvs(compare_dir: str) -> Tuple[Dict, List[Tuple[str, List[int], List[int]]]]:
     """Walk every ``*_compare.csv`` in ``compare_dir`` and aggregate stats.
 
+    The start/end columns and the stored segment-membership columns of all
+    files are concatenated and scored in one pass of the shared kernel.
+
     Returns:
         metrics dict (start/end/segment with accuracy/precision/recall/f1 + segment IoU)
         per-file (meeting_id, human_boundaries_binary, llm_boundaries_binary) list
             — used to feed Pk / WinDiff computation.
     """
-    s = {"tp": 0, "tn": 0, "fp": 0, "fn": 0}
-    e = {"tp": 0, "tn": 0, "fp": 0, "fn": 0}
-    g = {"tp": 0, "tn": 0, "fp": 0, "fn": 0}
-    inter = union = 0
+    columns: Dict[int, List[np.ndarray]] = {c: [] for c in (1, 2, 3, 4, 6, 7)}
     files_info: List[Tuple[str, List[int], List[int]]] = []
 
     for path in sorted(glob.glob(os.path.join(compare_dir, "*.csv"))):
         mid = os.path.basename(path).rsplit("_compare.csv", 1)[0]
         with open(path, "r", encoding="utf-8") as f:
             rdr = csv.reader(f)
-            rows = list(rdr)[1:]
-        hb: List[int] = []
-        lb: List[int] = []
-        for r in rows:
-            if len(r) < 10:
-                continue
-            sh, sl, eh, el, hseg, lseg = (
-                r[1].upper() == "TRUE", r[2].upper() == "TRUE",
-                r[3].upper() == "TRUE", r[4].upper() == "TRUE",
-                r[6].upper() == "TRUE", r[7].upper() == "TRUE",
-            )
-            # START
-            if sh and sl: s["tp"] += 1
-            elif sl and not sh: s["fp"] += 1
-            elif sh and not sl: s["fn"] += 1
-            else: s["tn"] += 1
-            # END
-            if eh and el: e["tp"] += 1
-            elif el and not eh: e["fp"] += 1
-            elif eh and not el: e["fn"] += 1
-            else: e["tn"] += 1
-            # SEGMENT
-            if hseg and lseg: g["tp"] += 1
-            elif lseg and not hseg: g["fp"] += 1
-            elif hseg and not lseg: g["fn"] += 1
-            else: g["tn"] += 1
-            if hseg and lseg: inter += 1
-            if hseg or lseg: union += 1
-
-            hb.append(1 if sh else 0)
-            lb.append(1 if sl else 0)
-        # Convention: drop the first-row "boundary" for Pk/WinDiff
-        if hb: hb[0] = 0
-        if lb: lb[0] = 0
-        files_info.append((mid, hb, lb))
-
-    metrics = {
-        "start": _metrics(**s),
-        "end": _metrics(**e),
-        "segment": {**_metrics(**g), "iou": inter / union if union else 0.0},
-    }
-    return metrics, files_info
+            rows = [r for r in list(rdr)[1:] if len(r) >= 10]
+        for c in columns:
+            columns[c].append(flags([r[c] for r in rows], ignore_case=True))
+        files_info.append((mid, _boundary_list(columns[1][-1]), _boundary_list(columns[2][-1])))
+
+    sh, sl, eh, el, hseg, lseg = (_concat(columns[c]) for c in (1, 2, 3, 4, 6, 7))
+    result = compare_labels(sh, eh, sl, el, human_segment=hseg, llm_segment=lseg)
+    return family_metrics(result), files_info
 
 
 def _aggregate_raw_llm_vs_human(human_dir: str, llm_dir: str) -> Tuple[Dict, List[Tuple[str, List[int], List[int]]]]:
     """Same as ``_aggregate_compare_csvs`` but computes from raw human + LLM CSVs.
 
-    Used when the corresponding compare folder is empty.
+    Used when the corresponding compare folder is empty.  Segment
+    membership is derived per file by the kernel's toggle.
     """
-    s = {"tp": 0, "tn": 0, "fp": 0, "fn": 0}
-    e = {"tp": 0, "tn": 0, "fp": 0, "fn": 0}
-    g = {"tp": 0, "tn": 0, "fp": 0, "fn": 0}
-    inter = union = 0
+    columns: Dict[str, List[np.ndarray]] = {"sh": [], "sl": [], "eh": [], "el": []}
+    lengths: List[int] = []
     files_info: List[Tuple[str, List[int], List[int]]] = []
 
     for human_path in sorted(glob.glob(os.path.join(human_dir, "*.csv"))):
@@ -159,56 +132,18 @@ def _aggregate_raw_llm_vs_human(human_dir: str, llm_dir: str) -> Tuple[Dict, Lis
         with open(llm_path, "r", encoding="utf-8") as f:
             lrows = list(csv.reader(f))[1:]
         n = min(len(hrows), len(lrows))
+        pairs = [(hr, lr) for hr, lr in zip(hrows[:n], lrows[:n]) if len(hr) >= 3 and len(lr) >= 3]
 
-        toggle_h = toggle_l = False
-        hb: List[int] = []
-        lb: List[int] = []
-        for i in range(n):
-            hr, lr = hrows[i], lrows[i]
-            if len(hr) < 3 or len(lr) < 3:
-                continue
-            sh = hr[1].upper() == "TRUE"
-            sl = lr[1].upper() == "TRUE"
-            eh = hr[2].upper() == "TRUE"
-            el = lr[2].upper() == "TRUE"
-
-            if sh: toggle_h = True
-            hseg = toggle_h
-            if eh: toggle_h = False
-            if sl: toggle_l = True
-            lseg = toggle_l
-            if el: toggle_l = False
-
-            if sh and sl: s["tp"] += 1
-            elif sl and not sh: s["fp"] += 1
-            elif sh and not sl: s["fn"] += 1
-            else: s["tn"] += 1
-
-            if eh and el: e["tp"] += 1
-            elif el and not eh: e["fp"] += 1
-            elif eh and not el: e["fn"] += 1
-            else: e["tn"] += 1
-
-            if hseg and lseg: g["tp"] += 1
-            elif lseg and not hseg: g["fp"] += 1
-            elif hseg and not lseg: g["fn"] += 1
-            else: g["tn"] += 1
-            if hseg and lseg: inter += 1
-            if hseg or lseg: union += 1
-
-            hb.append(1 if sh else 0)
-            lb.append(1 if sl else 0)
-
-        if hb: hb[0] = 0
-        if lb: lb[0] = 0
-        files_info.append((mid, hb, lb))
-
-    metrics = {
-        "start": _metrics(**s),
-        "end": _metrics(**e),
-        "segment": {**_metrics(**g), "iou": inter / union if union else 0.0},
-    }
-    return metrics, files_info
+        columns["sh"].append(flags([hr[1] for hr, _ in pairs], ignore_case=True))
+        columns["sl"].append(flags([lr[1] for _, lr in pairs], ignore_case=True))
+        columns["eh"].append(flags([hr[2] for hr, _ in pairs], ignore_case=True))
+        columns["el"].append(flags([lr[2] for _, lr in pairs], ignore_case=True))
+        lengths.append(len(pairs))
+        files_info.append((mid, _boundary_list(columns["sh"][-1]), _boundary_list(columns["sl"][-1])))
+
+    sh, sl, eh, el = (_concat(columns[c]) for c in ("sh", "sl", "eh", "el"))
+    result = compare_labels(sh, eh, sl, el, lengths=lengths)
+    return family_metrics(result), files_info
 
 
 def _pk_windiff_from_file_infos(files_info: List[Tuple[str, List[int], List[int]]]) -> Dict[str, float]:
@@ -232,7 +167,8 @@ def _pk_windiff_from_file_infos(files_info: List[Tuple[str, List[int], List[int]
 
 # --- Embedding-baseline pipeline ---------------------------------------
 
-def _run_sbert(human_dir: str, window: int = 10, threshold: float = 0.6) -> Tuple[Dict, Dict]:
+def _run_sbert(human_dir: str, window: int = 10, threshold: float = 0.6,
+               cache_dir: str | None = CACHE_DIR) -> Tuple[Dict, Dict]:
     df = load_directory(human_dir)
     cfg = TopicSegmentationConfig(
         TEXT_TILING=TextTilingHyperparameters(
@@ -241,6 +177,7 @@ def _run_sbert(human_dir: str, window: int = 10, threshold: float = 0.6) -> Tupl
             SMOOTHING_WINDOW=1,
             TOPIC_CHANGE_THRESHOLD=threshold,
         ),
+        EMBEDDING_CACHE_DIR=cache_dir,
     )
     boundaries = topic_segmentation(
         TopicSegmentationAlgorithm.SBERT, df,
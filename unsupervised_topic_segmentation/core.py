@@ -8,6 +8,8 @@ what's changed is:
   of the original code's (broken) RoBERTa+fairseq mix.  This matches
   the paper's second tested embedding method (S-BERT) and is the one
   recommended for practical use in their implementation notes.
+- Embeddings can be kept in an on-disk cache (``embedding_cache.py``)
+  so that re-running with other hyperparameters does not re-encode.
 - Timestamp columns are replaced with row indices, since our CSV
   transcripts don't carry audio timestamps.
 - Import of ``types`` renamed to ``seg_types`` to avoid shadowing the
@@ -30,31 +32,47 @@ The algorithm (from Section 3.2 of the paper):
 
 from __future__ import annotations
 
-from typing import Dict, List
+import os
+from typing import TYPE_CHECKING, Dict, List
 
 import numpy as np
 import pandas as pd
-import torch
-from sentence_transformers import SentenceTransformer
 
 import baselines as topic_segmentation_baselines
+from embedding_cache import EmbeddingCache, normalise
 from seg_types import (
     TopicSegmentationAlgorithm,
     TopicSegmentationConfig,
 )
 
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
-# Global embedding models are loaded lazily on first use so that importing
-# this module (e.g. from baselines.py or eval.py) stays cheap.
+
+# Global embedding models (and torch / sentence_transformers themselves) are
+# loaded lazily on first use so that importing this module (e.g. from
+# baselines.py, eval.py or benchmark_core.py) stays cheap.
 _SBERT_MODEL: SentenceTransformer | None = None
 _BERT_MODEL: SentenceTransformer | None = None
 
+SBERT_MODEL_NAME = "sentence-transformers/stsb-roberta-base"
+BERT_MODEL_NAME = "sentence-transformers/all-distilroberta-v1"
+
+# Open embedding caches, keyed by (directory, model name, dtype)
+_EMBEDDING_CACHES: Dict[tuple, EmbeddingCache] = {}
+
+# Corpus-wide encoding sorts utterances by token count and cuts them into
+# batches of at most BATCH_SIZE utterances and BATCH_TOKENS padded tokens.
+BATCH_TOKENS = 16384
+BATCH_SIZE = 256
+
 
 def _get_sbert_model() -> SentenceTransformer:
     """Load Sentence-BERT (stsb-roberta-base, same as the paper)."""
     global _SBERT_MODEL
     if _SBERT_MODEL is None:
-        _SBERT_MODEL = SentenceTransformer("sentence-transformers/stsb-roberta-base")
+        from sentence_transformers import SentenceTransformer
+        _SBERT_MODEL = SentenceTransformer(SBERT_MODEL_NAME)
     return _SBERT_MODEL
 
 
@@ -67,7 +85,8 @@ def _get_bert_model() -> SentenceTransformer:
     """
     global _BERT_MODEL
     if _BERT_MODEL is None:
-        _BERT_MODEL = SentenceTransformer("sentence-transformers/all-distilroberta-v1")
+        from sentence_transformers import SentenceTransformer
+        _BERT_MODEL = SentenceTransformer(BERT_MODEL_NAME)
     return _BERT_MODEL
 
 
@@ -77,49 +96,104 @@ def depth_score(timeseries: List[float]) -> List[float]:
     The depth score at position i is the sum of the gaps between i and
     the nearest peaks to its left and right.  Large depth scores mark
     valleys, which are candidate topic-boundary locations.
+
+    The peaks are found by climbing from i-1 leftwards and from i+1
+    rightwards while the series strictly rises.  Rather than climbing
+    from every i, one sweep each way records where the climb from every
+    position ends: leftwards it stops at the last position at or before j
+    that is not lower than its left neighbour, rightwards at the first
+    position at or after j that is not lower than its right neighbour.
     """
-    depth_scores = []
-    for i in range(1, len(timeseries) - 1):
-        left, right = i - 1, i + 1
-        while left > 0 and timeseries[left - 1] > timeseries[left]:
-            left -= 1
-        while right < (len(timeseries) - 1) and timeseries[right + 1] > timeseries[right]:
-            right += 1
-        depth_scores.append(
-            (timeseries[right] - timeseries[i]) + (timeseries[left] - timeseries[i])
-        )
-    return depth_scores
+    values = np.asarray(timeseries, dtype=float)
+    n = len(values)
+    if n < 3:
+        return []
+    index = np.arange(n)
+    rises_left = np.zeros(n, dtype=bool)
+    rises_left[1:] = values[:-1] > values[1:]
+    rises_right = np.zeros(n, dtype=bool)
+    rises_right[:-1] = values[1:] > values[:-1]
+    left_peak = np.maximum.accumulate(np.where(rises_left, 0, index))
+    right_peak = np.minimum.accumulate(np.where(rises_right, n - 1, index)[::-1])[::-1]
+
+    interior = values[1:-1]
+    return ((values[right_peak[2:]] - interior) + (values[left_peak[:-2]] - interior)).tolist()
 
 
 def smooth(timeseries: List[float], n: int, s: int) -> List[float]:
-    """Simple box-filter smoothing with ``n`` passes and half-width ``s``."""
+    """Simple box-filter smoothing with ``n`` passes and half-width ``s``.
+
+    Each pass updates the series in place, left to right: position i
+    becomes the mean of positions [i-s, min(len-1, i+s)), of which the
+    ones before i already hold this pass's smoothed values.  Because of
+    that recursion a pass is not a convolution (and is kept as is).  For
+    the default s = 1 the window is just the smoothed previous value and
+    the current one, so the pass runs as a two-term recurrence; wider
+    windows sum their slice in the same order as before.
+    """
     smoothed = list(timeseries)
+    length = len(smoothed)
+    end_bound = length - 1
+    if s == 1:
+        for _ in range(n):
+            if length < 2:
+                break
+            # Position 0 averages only itself; the last position takes the
+            # smoothed value before it.
+            previous = smoothed[0]
+            for index in range(1, end_bound):
+                previous = (previous + smoothed[index]) / 2
+                smoothed[index] = previous
+            smoothed[end_bound] = previous
+        return smoothed
+
     for _ in range(n):
-        for index in range(len(smoothed)):
-            neighbours = smoothed[max(0, index - s): min(len(timeseries) - 1, index + s)]
+        for index in range(length):
+            neighbours = smoothed[max(0, index - s): min(end_bound, index + s)]
             if neighbours:
                 smoothed[index] = sum(neighbours) / len(neighbours)
     return smoothed
 
 
-def _cosine(a: np.ndarray, b: np.ndarray) -> float:
-    na = np.linalg.norm(a)
-    nb = np.linalg.norm(b)
-    if na == 0 or nb == 0:
-        return 0.0
-    return float(np.dot(a, b) / (na * nb))
+def _cosine_rows(a: np.ndarray, b: np.ndarray, na: np.ndarray, nb: np.ndarray) -> np.ndarray:
+    """Cosine similarity of each row of ``a`` with the same row of ``b`` (0 for zero rows).
+
+    ``na`` / ``nb`` are the rows' norms.
+    """
+    dots = np.einsum("ij,ij->i", a, b)
+    nonzero = (na != 0) & (nb != 0)
+    scores = np.zeros(len(dots), dtype=dots.dtype)
+    scores[nonzero] = dots[nonzero] / (na[nonzero] * nb[nonzero])
+    return scores
 
 
-def _block_embedding(embeddings: np.ndarray, start: int, end: int) -> np.ndarray:
-    """Max-pool over rows [start:end] of the embedding matrix.
+def _sliding_max(embeddings: np.ndarray, width: int) -> np.ndarray:
+    """Max-pool every window ``embeddings[j:j+width]``, for j in 0..N.
 
     Max pooling (instead of mean) is the paper's key robustness trick:
     it lets semantically-rich tokens dominate over fillers/disfluencies.
+
+    van Herk / Gil-Werman: the rows are cut into blocks of ``width``; a
+    running max forward and one backward within each block give every
+    window's max as ``max(backward[j], forward[j + width - 1])``, so the
+    cost is O(N·D) whatever the width.  Windows running past the last row
+    are truncated as slicing would, and the empty window at j = N pools
+    to zeros.
     """
-    block = embeddings[start:end]
-    if block.shape[0] == 0:
-        return np.zeros(embeddings.shape[1], dtype=embeddings.dtype)
-    return block.max(axis=0)
+    n, d = embeddings.shape
+    blocks = -(-(n + width) // width)
+    forward = np.full((blocks, width, d), -np.inf, dtype=embeddings.dtype)
+    forward.reshape(-1, d)[:n] = embeddings
+    backward = forward.copy()
+    # One contiguous (blocks, D) maximum per position in the block, each way
+    for j in range(1, width):
+        np.maximum(forward[:, j], forward[:, j - 1], out=forward[:, j])
+        np.maximum(backward[:, width - 1 - j], backward[:, width - j], out=backward[:, width - 1 - j])
+    forward = forward.reshape(-1, d)
+    backward = backward.reshape(-1, d)
+    pooled = np.maximum(backward[:n + 1], forward[width - 1:n + width], out=backward[:n + 1])
+    pooled[n] = 0
+    return pooled
 
 
 def block_comparison_score(embeddings: np.ndarray, k: int) -> List[float]:
@@ -129,25 +203,71 @@ def block_comparison_score(embeddings: np.ndarray, k: int) -> List[float]:
     against a right block [i+1..i+k+2] using max-pooled embeddings and
     cosine similarity.  Returns a 1-D list of similarities aligned to
     gap indices starting at i=k.
+
+    Both blocks have k+1 rows (the right one truncated at the end), so
+    they are all windows of one sliding max: gap i compares window i-k
+    with window i+1.  All gaps are scored in one row-wise cosine.
     """
-    scores = []
     n = embeddings.shape[0]
-    for i in range(k, n - k):
-        left = _block_embedding(embeddings, i - k, i + 1)
-        right = _block_embedding(embeddings, i + 1, i + k + 2)
-        scores.append(_cosine(left, right))
+    if n - k <= k:
+        return []
+    return _pooled_comparison_score(_sliding_max(np.asarray(embeddings), k + 1), k)
+
+
+def _pooled_comparison_score(pooled: np.ndarray, k: int) -> List[float]:
+    """``block_comparison_score`` from the ``_sliding_max`` of width k + 1."""
+    n = len(pooled) - 1
+    norms = np.sqrt(np.einsum("ij,ij->i", pooled, pooled))
+    left, right = slice(0, n - 2 * k), slice(k + 1, n - k + 1)
+    return _cosine_rows(pooled[left], pooled[right], norms[left], norms[right]).tolist()
+
+
+def _widen_sliding_max(pooled: np.ndarray, width: int, new_width: int) -> np.ndarray:
+    """``_sliding_max`` of a larger width from that of ``width``.
+
+    A window of ``new_width <= 2 * width`` rows is covered by the two
+    ``width`` windows starting at j and j + new_width - width, so one
+    maximum widens every window; windows whose second half would start at
+    or past the last row are already complete.  Larger steps double first.
+    """
+    while new_width > width:
+        step = min(width, new_width - width)
+        n = len(pooled) - 1
+        widened = pooled.copy()
+        np.maximum(pooled[:n - step], pooled[step:n], out=widened[:n - step])
+        pooled, width = widened, width + step
+    return pooled
+
+
+def block_comparison_scores(embeddings: np.ndarray, windows: List[int]) -> Dict[int, List[float]]:
+    """``block_comparison_score`` for several block sizes at once.
+
+    The sliding max is computed once, for the smallest window, and widened
+    to each larger one (``_widen_sliding_max``) instead of being recomputed
+    per window.  The scores are identical to separate calls.
+    """
+    n = embeddings.shape[0]
+    scores: Dict[int, List[float]] = {}
+    pooled, width = None, 0
+    for k in sorted(set(windows)):
+        if n - k <= k:
+            scores[k] = []
+            continue
+        if pooled is None:
+            pooled, width = _sliding_max(np.asarray(embeddings), k + 1), k + 1
+        pooled, width = _widen_sliding_max(pooled, width, k + 1), k + 1
+        scores[k] = _pooled_comparison_score(pooled, k)
     return scores
 
 
 def get_local_maxima(array: List[float]):
     """Return (indices, values) of strict local maxima in a 1-D sequence."""
-    local_maxima_indices = []
-    local_maxima_values = []
-    for i in range(1, len(array) - 1):
-        if array[i - 1] < array[i] and array[i] > array[i + 1]:
-            local_maxima_indices.append(i)
-            local_maxima_values.append(array[i])
-    return local_maxima_indices, local_maxima_values
+    values = np.asarray(array, dtype=float)
+    if len(values) < 3:
+        return [], []
+    interior = values[1:-1]
+    indices = np.flatnonzero((values[:-2] < interior) & (interior > values[2:])) + 1
+    return indices.tolist(), values[indices].tolist()
 
 
 def depth_score_to_topic_change_indexes(
@@ -200,23 +320,141 @@ def depth_score_to_topic_change_indexes(
     ]
 
 
+def _model_name(algorithm: TopicSegmentationAlgorithm) -> str:
+    if algorithm == TopicSegmentationAlgorithm.SBERT:
+        return SBERT_MODEL_NAME
+    if algorithm == TopicSegmentationAlgorithm.BERT:
+        return BERT_MODEL_NAME
+    raise ValueError(f"Cannot encode with algorithm: {algorithm}")
+
+
+def embedding_cache(
+    algorithm: TopicSegmentationAlgorithm,
+    topic_segmentation_configs: TopicSegmentationConfig,
+) -> EmbeddingCache | None:
+    """The on-disk cache for this algorithm's model, or None if caching is off.
+
+    Caches are opened once per process and shared between calls.
+    """
+    directory = topic_segmentation_configs.EMBEDDING_CACHE_DIR
+    if not directory:
+        return None
+    key = (os.path.abspath(directory), _model_name(algorithm), topic_segmentation_configs.EMBEDDING_CACHE_DTYPE)
+    if key not in _EMBEDDING_CACHES:
+        _EMBEDDING_CACHES[key] = EmbeddingCache(*key)
+    return _EMBEDDING_CACHES[key]
+
+
+def open_embedding_caches() -> List[EmbeddingCache]:
+    """Every cache ``embedding_cache`` has opened in this process, in opening order."""
+    return list(_EMBEDDING_CACHES.values())
+
+
+def _get_model(algorithm: TopicSegmentationAlgorithm) -> SentenceTransformer:
+    _model_name(algorithm)  # rejects algorithms without an encoder
+    return _get_sbert_model() if algorithm == TopicSegmentationAlgorithm.SBERT else _get_bert_model()
+
+
 def _encode_utterances(
     sentences: List[str],
     algorithm: TopicSegmentationAlgorithm,
+    cache: EmbeddingCache | None = None,
 ) -> np.ndarray:
-    """Return an ``(N, D)`` numpy array of utterance embeddings."""
-    if algorithm == TopicSegmentationAlgorithm.SBERT:
-        model = _get_sbert_model()
-    elif algorithm == TopicSegmentationAlgorithm.BERT:
-        model = _get_bert_model()
-    else:
-        raise ValueError(f"Cannot encode with algorithm: {algorithm}")
+    """Return an ``(N, D)`` numpy array of one transcript's utterance embeddings.
+
+    This is the per-meeting path (one ``model.encode`` call per
+    transcript); ``encode_corpus`` encodes all transcripts together.
+    With a ``cache`` only the distinct utterances it does not hold yet are
+    encoded (in their normalised form, see ``embedding_cache.normalise``),
+    and the model is not loaded at all when it holds every one.
+    """
+    def encode(texts: List[str]) -> np.ndarray:
+        import torch
+
+        model = _get_model(algorithm)
+        with torch.no_grad():
+            return model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
 
+    _model_name(algorithm)  # rejects algorithms without an encoder
+    if cache is not None:
+        return cache.get(sentences, encode)
     # Replace empty strings so the encoder doesn't emit NaNs.
-    cleaned = [s if (isinstance(s, str) and s.strip()) else "." for s in sentences]
-    with torch.no_grad():
-        emb = model.encode(cleaned, convert_to_numpy=True, show_progress_bar=False)
-    return emb
+    return encode([s if (isinstance(s, str) and s.strip()) else "." for s in sentences])
+
+
+def encode_bucketed(
+    texts: List[str],
+    model: SentenceTransformer,
+    batch_tokens: int = BATCH_TOKENS,
+    batch_size: int = BATCH_SIZE,
+) -> np.ndarray:
+    """Encode ``texts`` in token-length order, in large, tightly padded batches.
+
+    Texts are sorted by their token count (as the model truncates them) and
+    cut into consecutive batches that grow while the batch, padded to its
+    longest text, stays within ``batch_tokens`` tokens and ``batch_size``
+    texts.  Short backchannels therefore share big batches and long lines
+    are not padded against short ones.  Rows come back in input order.
+    """
+    import torch
+
+    if not texts:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    lengths = np.array([len(ids) for ids in model.tokenizer(
+        texts, truncation=True, max_length=model.max_seq_length)["input_ids"]])
+    order = np.argsort(lengths, kind="stable")
+
+    out: np.ndarray | None = None
+    start = 0
+    while start < len(order):
+        # Lengths ascend, so a batch is padded to the length of its last text
+        stop = start + 1
+        while (stop < len(order) and stop - start < batch_size
+               and (stop - start + 1) * lengths[order[stop]] <= batch_tokens):
+            stop += 1
+        batch = order[start:stop]
+        with torch.no_grad():
+            vectors = model.encode([texts[i] for i in batch], batch_size=len(batch),
+                                   convert_to_numpy=True, show_progress_bar=False)
+        if out is None:
+            out = np.empty((len(texts), vectors.shape[1]), dtype=vectors.dtype)
+        out[batch] = vectors
+        start = stop
+    return out
+
+
+def encode_corpus(
+    meetings: Dict[str, List[str]],
+    algorithm: TopicSegmentationAlgorithm,
+    cache: EmbeddingCache | None = None,
+) -> Dict[str, np.ndarray]:
+    """Embed every transcript of a corpus in one encoding stage.
+
+    The distinct normalised utterances of all meetings are collected once,
+    the ones not in ``cache`` (all of them without one) are encoded by
+    ``encode_bucketed``, and the vectors are scattered back into one
+    ``(N, D)`` matrix per meeting.
+
+    Args:
+        meetings: ``{meeting_id: utterances in row order}``.
+
+    Returns:
+        ``{meeting_id: (N, D) embeddings}``.
+    """
+    _model_name(algorithm)
+    texts = {meeting_id: [normalise(s) for s in sentences] for meeting_id, sentences in meetings.items()}
+    unique = list(dict.fromkeys(t for sentences in texts.values() for t in sentences))
+    if not unique:
+        return {meeting_id: np.zeros((0, 0), dtype=np.float32) for meeting_id in texts}
+
+    def encode(missing: List[str]) -> np.ndarray:
+        return encode_bucketed(missing, _get_model(algorithm))
+
+    vectors = cache.get(unique, encode) if cache is not None else encode(unique)
+    position = {t: j for j, t in enumerate(unique)}
+    return {
+        meeting_id: vectors[[position[t] for t in sentences]] for meeting_id, sentences in texts.items()
+    }
 
 
 def topic_segmentation_bert(
@@ -247,19 +485,28 @@ def topic_segmentation_bert(
         within that meeting.
     """
     tt = topic_segmentation_configs.TEXT_TILING
+    cache = embedding_cache(algorithm, topic_segmentation_configs)
 
-    segments: Dict[str, List[int]] = {}
+    # Meetings too short for this window size get no boundaries (and are not
+    # encoded); the others are encoded together, across meetings.
+    meetings: Dict[str, List[str]] = {}
     for meeting_id in sorted(set(df[meeting_id_col_name])):
         meeting_data = df[df[meeting_id_col_name] == meeting_id]
-        sentences = list(meeting_data[caption_col_name].astype(str))
-        n = len(sentences)
+        meetings[meeting_id] = list(meeting_data[caption_col_name].astype(str))
+    long_enough = {
+        meeting_id: sentences for meeting_id, sentences in meetings.items()
+        if len(sentences) >= 2 * tt.SENTENCE_COMPARISON_WINDOW + 3
+    }
+    corpus_embeddings = encode_corpus(long_enough, algorithm, cache)
 
-        if n < 2 * tt.SENTENCE_COMPARISON_WINDOW + 3:
-            # Too short for this window size — skip boundary detection.
+    segments: Dict[str, List[int]] = {}
+    for meeting_id, sentences in meetings.items():
+        n = len(sentences)
+        if meeting_id not in corpus_embeddings:
             segments[meeting_id] = []
             continue
 
-        embeddings = _encode_utterances(sentences, algorithm)
+        embeddings = corpus_embeddings[meeting_id]
 
         sim_series = block_comparison_score(embeddings, k=tt.SENTENCE_COMPARISON_WINDOW)
         sim_series = smooth(sim_series, n=tt.SMOOTHING_PASSES, s=tt.SMOOTHING_WINDOW)
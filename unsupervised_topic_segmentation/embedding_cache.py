@@ -0,0 +1,178 @@
+"""Persistent on-disk cache of utterance embeddings.
+
+Every run used to re-encode every utterance, although the segmenter's
+hyperparameters (window, smoothing, threshold) never change an embedding.
+An ``EmbeddingCache`` stores one vector per (model name, normalised text)
+so that re-segmenting a corpus does no encoder work, and the model itself
+is not even loaded when every utterance is already cached.
+
+Layout of ``<cache dir>/<model name with / replaced by __>/``:
+
+    meta.json     {"model", "dim", "dtype", "version"}
+    keys.txt      one SHA-256 hex digest per line; line i is vector row i
+    vectors.bin   the vectors, row-major, appended in the same order and
+                  read back through ``np.memmap``
+
+Texts are normalised before hashing (surrounding whitespace stripped,
+inner runs collapsed to one space, empty text replaced by "." as
+``core._encode_utterances`` does) and the normalised text is what gets
+encoded, so a cached vector is exactly what the encoder returns for it.
+A lookup deduplicates its texts first, so the many repeated short lines of
+a corpus ("Okay.", "Yeah.", ".") are encoded and stored once.
+
+Vectors are written before their keys, so an interrupted append leaves at
+worst some unindexed bytes, which are ignored (and overwritten) on the
+next open.  The cache is meant for one writer at a time.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+# Default location used by run.py and compare_to_llm.py
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding-cache")
+
+VERSION = 1
+DTYPES = ("float32", "float16")
+
+
+def normalise(text) -> str:
+    """The form a text is hashed and encoded in."""
+    text = " ".join(text.split()) if isinstance(text, str) else ""
+    return text or "."
+
+
+def text_key(text: str) -> str:
+    """SHA-256 hex digest of the normalised text."""
+    return hashlib.sha256(normalise(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Append-only, memory-mapped embedding store for one encoder model.
+
+    Counters (stats):
+        hits     — unique texts found in the cache
+        encoded  — unique texts passed to the encoder and appended
+    """
+
+    def __init__(self, directory: str, model_name: str, dtype: str = "float32"):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown embedding cache dtype: {dtype} (expected one of {DTYPES})")
+        self.model_name = model_name
+        self.directory = os.path.join(directory, model_name.replace("/", "__"))
+        self.dtype = np.dtype(dtype)
+        self.dim: int | None = None
+        self.rows: Dict[str, int] = {}
+        self._vectors: np.ndarray | None = None
+        self.stats = {"hits": 0, "encoded": 0}
+        self._load()
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.directory, "meta.json")
+
+    @property
+    def _keys_path(self) -> str:
+        return os.path.join(self.directory, "keys.txt")
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.directory, "vectors.bin")
+
+    def _load(self) -> None:
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != VERSION or meta.get("model") != self.model_name:
+            raise ValueError(f"{self.directory} holds an incompatible embedding cache: {meta}")
+        # An existing cache keeps the dtype it was created with
+        self.dtype = np.dtype(meta["dtype"])
+        self.dim = int(meta["dim"])
+        lines = [""]
+        if os.path.exists(self._keys_path):
+            with open(self._keys_path, "r", encoding="utf-8") as f:
+                lines = f.read().split("\n")
+        row_bytes = self.dim * self.dtype.itemsize
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        # Keys are appended after their vectors, one complete line each;
+        # anything beyond the shorter of the two is an interrupted append
+        keys = lines[:-1][:size // row_bytes]
+        self.rows = {key: row for row, key in enumerate(keys)}
+        if lines[-1] or len(keys) < len(lines) - 1:
+            with open(self._keys_path, "w", encoding="utf-8") as f:
+                f.write("".join(f"{key}\n" for key in keys))
+        if size != len(keys) * row_bytes:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(len(keys) * row_bytes)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _matrix(self) -> np.ndarray:
+        """All stored vectors, memory-mapped (reopened after every append)."""
+        if self._vectors is None:
+            self._vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r",
+                                      shape=(len(self.rows), self.dim))
+        return self._vectors
+
+    def lookup(self, texts: Sequence[str]) -> np.ndarray:
+        """Cache row of every text, -1 where it is not cached."""
+        return np.array([self.rows.get(text_key(t), -1) for t in texts], dtype=np.int64)
+
+    def add(self, texts: Sequence[str], vectors: np.ndarray) -> None:
+        """Append the vectors of texts not cached yet (one per distinct text)."""
+        vectors = np.asarray(vectors)
+        if len(texts) != len(vectors):
+            raise ValueError(f"{len(texts)} texts but {len(vectors)} vectors")
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._meta_path, "w", encoding="utf-8") as f:
+                json.dump({"model": self.model_name, "dim": self.dim,
+                           "dtype": self.dtype.name, "version": VERSION}, f)
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Vectors of width {vectors.shape[1]} for a cache of width {self.dim}")
+
+        new_keys: List[str] = []
+        new_rows: List[int] = []
+        for j, text in enumerate(texts):
+            key = text_key(text)
+            if key not in self.rows:
+                self.rows[key] = len(self.rows)
+                new_keys.append(key)
+                new_rows.append(j)
+        if not new_keys:
+            return
+        with open(self._vectors_path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors[new_rows], dtype=self.dtype).tobytes())
+        with open(self._keys_path, "a", encoding="utf-8") as f:
+            f.write("".join(f"{key}\n" for key in new_keys))
+        self._vectors = None
+
+    def get(self, texts: Sequence[str], encode: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """``(len(texts), D)`` float32 embeddings, encoding only what is missing.
+
+        ``encode(list_of_normalised_texts) -> (M, D)`` is called at most
+        once, with every distinct uncached text, and not at all when
+        everything is cached.
+        """
+        normalised = [normalise(t) for t in texts]
+        unique = list(dict.fromkeys(normalised))
+        rows = self.lookup(unique)
+        missing = [t for t, row in zip(unique, rows) if row < 0]
+        self.stats["hits"] += len(unique) - len(missing)
+        if missing:
+            self.add(missing, encode(missing))
+            self.stats["encoded"] += len(missing)
+            rows = self.lookup(unique)
+        if not normalised:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        position = {t: j for j, t in enumerate(unique)}
+        order = rows[[position[t] for t in normalised]]
+        return np.asarray(self._matrix()[order], dtype=np.float32)
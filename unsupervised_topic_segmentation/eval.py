@@ -25,6 +25,7 @@ import csv
 import os
 from typing import Dict, List, Tuple
 
+import numpy as np
 import pandas as pd
 from nltk.metrics.segmentation import pk, windowdiff
 
@@ -40,6 +41,11 @@ from dataset import (
     human_boundary_labels,
 )
 
+# The confusion-matrix / IoU kernel is shared with pipeline/analysis.py.
+from pipeline_metrics import (
+    add_tolerance_counts, compare_labels, family_metrics, flags, tolerance_counts, tolerance_rates,
+)
+
 
 # --- Boundary ↔ binary-vector conversions --------------------------------
 
@@ -109,7 +115,7 @@ def compute_pk_windiff(
     return {"per_file": per_file, "average": avg}
 
 
-# --- Line-level confusion-matrix metrics (matches pipeline/analysis.py) --
+# --- Line-level confusion-matrix metrics (pipeline/metrics.py kernel) ----
 
 def _segment_membership(binary: List[int]) -> List[int]:
     """Given a boundary-at-start binary vector, return per-row segment IDs.
@@ -126,31 +132,13 @@ def _segment_membership(binary: List[int]) -> List[int]:
     return ids
 
 
-def _human_story_membership(df_meeting: pd.DataFrame) -> List[bool]:
-    """Per-row boolean: is this row inside any human-annotated story segment?
-
-    Matches the toggle logic in ``pipeline/analysis.py``: turn on at
-    ``start_lbl == TRUE``, include the ``end_lbl == TRUE`` row, then
-    turn off.
-    """
-    inside = False
-    out: List[bool] = []
-    for _, row in df_meeting.iterrows():
-        if str(row[START_LBL_COL]).upper() == "TRUE":
-            inside = True
-        out.append(inside)
-        if str(row[END_LBL_COL]).upper() == "TRUE":
-            inside = False
-    return out
-
-
 def compute_pipeline_metrics(
     df: pd.DataFrame,
     predicted_binary: Dict[str, List[int]],
 ) -> Dict[str, Dict]:
     """Compute start-match, end-match, and segment-IoU vs human labels.
 
-    This mirrors the metrics in ``pipeline/analysis.py`` so that
+    This uses the same kernel as ``pipeline/analysis.py`` (pipeline/metrics.py) so that
     baseline numbers are directly comparable to the LLM pipeline's
     numbers from the main project.
 
@@ -164,109 +152,58 @@ def compute_pipeline_metrics(
     approach — it doesn't distinguish story vs non-story, only
     topic-A vs topic-B.  Expect high recall / low precision on the
     segment-IoU metric compared to LLM approaches.
-    """
-    start_counts = {"tp": 0, "fp": 0, "fn": 0, "tn": 0}
-    end_counts = {"tp": 0, "fp": 0, "fn": 0, "tn": 0}
-    seg_counts = {"tp": 0, "fp": 0, "fn": 0, "tn": 0}
-    inter = 0
-    union = 0
-
-    per_file: Dict[str, Dict] = {}
 
-    for meeting_id in sorted(set(df[MEETING_ID_COL])):
-        sub = df[df[MEETING_ID_COL] == meeting_id].sort_values(START_COL).reset_index(drop=True)
-        n = len(sub)
+    Each file's metrics (and the overall ones) also carry a ``tolerance``
+    entry: the ±k boundary counts of ``metrics.tolerance_counts`` for
+    ``start`` and ``end``, as reported by ``pipeline/analysis.py``.
+    """
+    # All meetings are concatenated (sorted by meeting id, then row) and
+    # scored in one pass of the shared kernel; counts come back per meeting.
+    ordered = df.sort_values([MEETING_ID_COL, START_COL])
+    lengths = ordered.groupby(MEETING_ID_COL, sort=True).size()
+    meeting_ids = list(lengths.index)
+
+    pred_starts: List[np.ndarray] = []
+    pred_ends: List[np.ndarray] = []
+    for meeting_id, n in zip(meeting_ids, lengths):
         pred_bin = predicted_binary.get(meeting_id, [0] * n)
         if len(pred_bin) != n:
             pred_bin = pred_bin[:n] + [0] * max(0, n - len(pred_bin))
 
-        # Build predicted start/end row indices from boundaries.
-        pred_starts = [i for i, b in enumerate(pred_bin) if b == 1 or i == 0]
-        pred_ends: List[int] = []
-        for i, s in enumerate(pred_starts):
-            next_start = pred_starts[i + 1] if i + 1 < len(pred_starts) else n
-            pred_ends.append(next_start - 1)
-
-        pred_start_set = set(pred_starts)
-        pred_end_set = set(pred_ends)
-
-        human_start_rows = {
-            i for i, v in enumerate(sub[START_LBL_COL]) if str(v).upper() == "TRUE"
-        }
-        human_end_rows = {
-            i for i, v in enumerate(sub[END_LBL_COL]) if str(v).upper() == "TRUE"
-        }
-
-        human_seg = _human_story_membership(sub)
-        # Embedding baseline considers every row to be inside some segment.
-        llm_seg = [True] * n
-
-        file_start = {"tp": 0, "fp": 0, "fn": 0, "tn": 0}
-        file_end = {"tp": 0, "fp": 0, "fn": 0, "tn": 0}
-        file_seg = {"tp": 0, "fp": 0, "fn": 0, "tn": 0}
-        file_inter = 0
-        file_union = 0
-
-        for i in range(n):
-            h_s = i in human_start_rows
-            p_s = i in pred_start_set
-            if h_s and p_s: file_start["tp"] += 1
-            elif p_s and not h_s: file_start["fp"] += 1
-            elif h_s and not p_s: file_start["fn"] += 1
-            else: file_start["tn"] += 1
-
-            h_e = i in human_end_rows
-            p_e = i in pred_end_set
-            if h_e and p_e: file_end["tp"] += 1
-            elif p_e and not h_e: file_end["fp"] += 1
-            elif h_e and not p_e: file_end["fn"] += 1
-            else: file_end["tn"] += 1
-
-            h_g = human_seg[i]
-            p_g = llm_seg[i]
-            if h_g and p_g: file_seg["tp"] += 1
-            elif p_g and not h_g: file_seg["fp"] += 1
-            elif h_g and not p_g: file_seg["fn"] += 1
-            else: file_seg["tn"] += 1
-
-            if h_g and p_g: file_inter += 1
-            if h_g or p_g: file_union += 1
-
-        per_file[meeting_id] = {
-            "start": _metrics_from_counts(file_start),
-            "end": _metrics_from_counts(file_end),
-            "segment": _metrics_from_counts(file_seg, inter=file_inter, union=file_union),
-        }
-
-        for k in start_counts: start_counts[k] += file_start[k]
-        for k in end_counts: end_counts[k] += file_end[k]
-        for k in seg_counts: seg_counts[k] += file_seg[k]
-        inter += file_inter
-        union += file_union
-
-    overall = {
-        "start": _metrics_from_counts(start_counts),
-        "end": _metrics_from_counts(end_counts),
-        "segment": _metrics_from_counts(seg_counts, inter=inter, union=union),
+        # Predicted start = first row of each predicted segment (row 0 and
+        # every boundary); predicted end = the row before the next start,
+        # and the last row.
+        starts = np.asarray(pred_bin) == 1
+        starts[0] = True
+        ends = np.empty(n, dtype=bool)
+        ends[:-1] = starts[1:]
+        ends[-1] = True
+        pred_starts.append(starts)
+        pred_ends.append(ends)
+
+    human_starts = flags(ordered[START_LBL_COL], ignore_case=True)
+    human_ends = flags(ordered[END_LBL_COL], ignore_case=True)
+    # Embedding baseline considers every row to be inside some segment.
+    result = compare_labels(
+        human_starts, human_ends, np.concatenate(pred_starts), np.concatenate(pred_ends),
+        lengths=lengths.to_numpy(), llm_segment=np.ones(len(ordered), dtype=bool),
+    )
+
+    per_file: Dict[str, Dict] = {
+        meeting_id: family_metrics(result, index=j) for j, meeting_id in enumerate(meeting_ids)
     }
-
+    overall = family_metrics(result)
+
+    offsets = np.cumsum(lengths.to_numpy())[:-1]
+    overall["tolerance"] = {"start": {}, "end": {}}
+    for family, truth, pred in (("start", human_starts, pred_starts), ("end", human_ends, pred_ends)):
+        for meeting_id, meeting_truth, meeting_pred in zip(meeting_ids, np.split(truth, offsets), pred):
+            counts = tolerance_counts(meeting_truth, meeting_pred)
+            per_file[meeting_id].setdefault("tolerance", {})[family] = counts
+            add_tolerance_counts(overall["tolerance"][family], counts)
     return {"per_file": per_file, "overall": overall}
 
 
-def _metrics_from_counts(c: Dict[str, int], inter: int | None = None, union: int | None = None):
-    tp, tn, fp, fn = c["tp"], c["tn"], c["fp"], c["fn"]
-    total = tp + tn + fp + fn
-    acc = (tp + tn) / total if total else 0.0
-    prec = tp / (tp + fp) if (tp + fp) else 0.0
-    rec = tp / (tp + fn) if (tp + fn) else 0.0
-    f1 = 2 * prec * rec / (prec + rec) if (prec + rec) else 0.0
-    out = {"tp": tp, "tn": tn, "fp": fp, "fn": fn,
-           "accuracy": acc, "precision": prec, "recall": rec, "f1": f1}
-    if inter is not None and union is not None:
-        out["iou"] = inter / union if union else 0.0
-    return out
-
-
 # --- CSV output in the project's 4-column format -------------------------
 
 def write_labeled_csvs(
@@ -0,0 +1,50 @@
+"""The project's shared metrics kernel, ``pipeline/metrics.py``.
+
+``eval.py`` and ``compare_to_llm.py`` score the baseline with the same
+START / END / SEGMENT kernel as ``pipeline/analysis.py``.  This module is
+the one place that reaches it: the kernel is loaded from its file path,
+once, and its public names are re-exported here.  Nothing is added to
+``sys.path``, so importing this folder's modules does not change how any
+other import resolves (``pipeline/`` has modules of its own, such as
+``benchmark.py``, that would otherwise shadow or be shadowed).
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import os
+import sys
+
+METRICS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pipeline", "metrics.py")
+
+# Registered under its own name so it cannot clash with a ``metrics`` module
+_MODULE_NAME = "_pipeline_metrics"
+
+
+def _load_kernel():
+    if _MODULE_NAME in sys.modules:
+        return sys.modules[_MODULE_NAME]
+    spec = importlib.util.spec_from_file_location(_MODULE_NAME, METRICS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[_MODULE_NAME] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+_kernel = _load_kernel()
+
+add_tolerance_counts = _kernel.add_tolerance_counts
+compare_labels = _kernel.compare_labels
+family_metrics = _kernel.family_metrics
+flags = _kernel.flags
+tolerance_counts = _kernel.tolerance_counts
+tolerance_rates = _kernel.tolerance_rates
+
+__all__ = [
+    "add_tolerance_counts",
+    "compare_labels",
+    "family_metrics",
+    "flags",
+    "tolerance_counts",
+    "tolerance_rates",
+]
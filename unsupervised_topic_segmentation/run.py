@@ -22,9 +22,10 @@ from typing import Dict
 
 import pandas as pd
 
-from core import topic_segmentation
+from core import open_embedding_caches, topic_segmentation
 from dataset import MEETING_ID_COL, load_directory, load_files
-from eval import evaluate, write_labeled_csvs
+from embedding_cache import CACHE_DIR, DTYPES
+from eval import evaluate, tolerance_rates, write_labeled_csvs
 from seg_types import (
     TextTilingHyperparameters,
     TopicSegmentationAlgorithm,
@@ -67,6 +68,13 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--cap-segments", action="store_true",
                    help="Cap segment count by expected average length.")
 
+    p.add_argument("--embedding-cache", default=CACHE_DIR, metavar="DIR",
+                   help="On-disk embedding cache, shared by all runs (default: embedding-cache/).")
+    p.add_argument("--no-embedding-cache", action="store_true",
+                   help="Encode every utterance without reading or writing the cache.")
+    p.add_argument("--embedding-dtype", choices=DTYPES, default="float32",
+                   help="Storage type of newly created caches (default: float32).")
+
     p.add_argument("--quiet", action="store_true", help="Suppress per-file printing.")
     return p
 
@@ -85,6 +93,13 @@ def _print_pipeline_summary(pipe_m: Dict):
           f"R={o['end']['recall']:.4f}  F1={o['end']['f1']:.4f}")
     print(f"    SEGMENT   Acc={o['segment']['accuracy']:.4f}  P={o['segment']['precision']:.4f}  "
           f"R={o['segment']['recall']:.4f}  F1={o['segment']['f1']:.4f}  IoU={o['segment']['iou']:.4f}")
+    print("  Boundary tolerance F1 (window / one-to-one matched):")
+    for family in ("start", "end"):
+        cells = []
+        for k, counts in o["tolerance"][family].items():
+            r = tolerance_rates(counts)
+            cells.append(f"±{k}={r['window']['f1']:.4f}/{r['matched']['f1']:.4f}")
+        print(f"    {family.upper():<9} " + "  ".join(cells))
 
 
 def run_one(
@@ -147,6 +162,8 @@ def main(argv=None):
             TOPIC_CHANGE_THRESHOLD=args.threshold,
         ),
         MAX_SEGMENTS_CAP=args.cap_segments,
+        EMBEDDING_CACHE_DIR=None if args.no_embedding_cache else args.embedding_cache,
+        EMBEDDING_CACHE_DTYPE=args.embedding_dtype,
     )
 
     if args.algorithm == "all":
@@ -163,6 +180,10 @@ def main(argv=None):
     for alg in algorithms:
         summary[alg.name] = run_one(df, alg, cfg, args.output_dir, args.quiet)
 
+    for cache in open_embedding_caches():
+        print(f"\nEmbedding cache {cache.directory}: {cache.stats['hits']} cached, "
+              f"{cache.stats['encoded']} newly encoded unique utterance(s), {len(cache)} stored")
+
     if len(algorithms) > 1:
         print(f"\n{'='*60}\nCOMPARISON SUMMARY\n{'='*60}")
         print(f"  {'Algorithm':<10} {'Pk':>8} {'WinDiff':>10} {'Seg F1':>10} {'Seg IoU':>10}")
@@ -35,3 +35,5 @@ class TopicSegmentationConfig(NamedTuple):
     TEXT_TILING: Optional[TextTilingHyperparameters] = None
     MAX_SEGMENTS_CAP: bool = False                   # set True to cap segment count
     MAX_SEGMENTS_CAP__AVERAGE_SEGMENT_LENGTH: int = 60
+    EMBEDDING_CACHE_DIR: Optional[str] = None        # on-disk embedding cache (None = encode every run)
+    EMBEDDING_CACHE_DTYPE: str = "float32"           # "float16" halves the cache size
@@ -0,0 +1,284 @@
+"""Hyperparameter sweep for the BERT / S-BERT segmenter.
+
+Tuning the four ``TextTilingHyperparameters`` with ``run.py`` takes one
+invocation per combination.  This script encodes each dataset once
+(``core.encode_corpus``, through the embedding cache) and evaluates the
+full grid
+
+    SENTENCE_COMPARISON_WINDOW x SMOOTHING_PASSES x SMOOTHING_WINDOW x TOPIC_CHANGE_THRESHOLD
+
+sharing work along the grid, per transcript:
+
+- the sliding max of the smallest window is widened to every larger one
+  (``core.block_comparison_scores``) rather than recomputed;
+- smoothing passes are applied one at a time, so n passes continue from
+  n - 1;
+- each depth-score series is computed once and reused for every threshold.
+
+Transcripts are segmented in parallel worker processes, and every grid
+point is then scored, also in parallel, as ``eval.evaluate`` does: Pk /
+WinDiff and the line-level START / END / SEGMENT metrics of
+``pipeline/analysis.py``.  Boundaries are exactly those ``run.py`` gives
+for the same hyperparameters.
+
+For every dataset a ranked table is printed (best --top rows) and all grid
+points are written to ``sweep-out/<dataset>.csv``.  With no input folder
+every ``*-human`` folder under ``../data/`` is a dataset.
+
+Examples:
+
+    python sweep.py
+    python sweep.py ../data/siblings/siblings-human --windows 5 10 --thresholds 0.5 0.6 0.7
+    python sweep.py --rank-by segment_f1 --top 10 --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import glob
+import itertools
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core import (
+    block_comparison_scores, depth_score, depth_score_to_topic_change_indexes, embedding_cache,
+    encode_corpus, smooth,
+)
+from dataset import CAPTION_COL, MEETING_ID_COL, human_boundary_labels, load_directory
+from embedding_cache import CACHE_DIR, DTYPES
+from eval import boundaries_to_binary, compute_pipeline_metrics, compute_pk_windiff
+from seg_types import TextTilingHyperparameters, TopicSegmentationAlgorithm, TopicSegmentationConfig
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_ROOT = os.path.join(SCRIPT_DIR, "..", "data")
+OUTPUT_DIR = os.path.join(SCRIPT_DIR, "sweep-out")
+
+WINDOWS = (3, 5, 8, 10, 15)
+SMOOTHING_PASSES = (0, 1, 2, 3)
+SMOOTHING_WINDOWS = (1, 2)
+THRESHOLDS = (0.3, 0.4, 0.5, 0.6, 0.7, 0.8)
+
+# Rankable metrics: (column, lower is better)
+METRICS = {
+    "pk": True,
+    "windiff": True,
+    "start_f1": False,
+    "end_f1": False,
+    "segment_f1": False,
+    "segment_iou": False,
+}
+
+_ALG_CHOICES = {
+    "bert": TopicSegmentationAlgorithm.BERT,
+    "sbert": TopicSegmentationAlgorithm.SBERT,
+}
+
+# A grid point: (window, smoothing passes, smoothing window, threshold)
+Point = Tuple[int, int, int, float]
+
+# Set in every worker process by _init_worker: the dataset, its human
+# boundary vectors and its transcript lengths (shared by all grid points)
+_DF: pd.DataFrame | None = None
+_REFERENCE: Dict[str, List[int]] = {}
+_LENGTHS: Dict[str, int] = {}
+
+
+def _init_worker(df: pd.DataFrame) -> None:
+    global _DF, _REFERENCE, _LENGTHS
+    _DF = df
+    _REFERENCE = human_boundary_labels(df)
+    _LENGTHS = df.groupby(MEETING_ID_COL).size().to_dict()
+
+
+def default_input_dirs() -> List[str]:
+    """Every ``<dataset>/<dataset>-human`` folder under data/."""
+    return sorted(d for d in glob.glob(os.path.join(DATA_ROOT, "*", "*-human")) if os.path.isdir(d))
+
+
+def meeting_grid(
+    embeddings: np.ndarray,
+    windows: List[int],
+    passes: List[int],
+    smoothing_windows: List[int],
+    thresholds: List[float],
+    cap_segments: bool,
+) -> Dict[Point, List[int]]:
+    """Boundary gaps of one transcript at every grid point (as ``topic_segmentation_bert``)."""
+    n = len(embeddings)
+    out: Dict[Point, List[int]] = {}
+    scores = block_comparison_scores(embeddings, windows)
+    for k in windows:
+        too_short = n < 2 * k + 3
+        for s in smoothing_windows:
+            series = scores[k]
+            for p in range(max(passes) + 1):
+                if p in passes:
+                    depth = [] if too_short else depth_score(series)
+                    for threshold in thresholds:
+                        cfg = TopicSegmentationConfig(
+                            TEXT_TILING=TextTilingHyperparameters(
+                                SENTENCE_COMPARISON_WINDOW=k, SMOOTHING_PASSES=p,
+                                SMOOTHING_WINDOW=s, TOPIC_CHANGE_THRESHOLD=threshold,
+                            ),
+                            MAX_SEGMENTS_CAP=cap_segments,
+                        )
+                        positions = depth_score_to_topic_change_indexes(depth, n, cfg)
+                        out[(k, p, s, threshold)] = [k + pos + 1 for pos in positions]
+                if not too_short:
+                    series = smooth(series, n=1, s=s)
+    return out
+
+
+def _score_point(point: Point, boundaries: Dict[str, List[int]]) -> Dict:
+    """One result row: the grid point and its metrics on _DF (as eval.evaluate())."""
+    predicted_binary = {
+        meeting_id: boundaries_to_binary(boundaries.get(meeting_id, []), n) for meeting_id, n in _LENGTHS.items()
+    }
+    pk_m = compute_pk_windiff(predicted_binary, _REFERENCE)
+    pipe_m = compute_pipeline_metrics(_DF, predicted_binary)
+    o = pipe_m["overall"]
+    return {
+        "window": point[0], "smoothing_passes": point[1], "smoothing_window": point[2],
+        "threshold": point[3], "boundaries": sum(len(b) for b in boundaries.values()),
+        "pk": pk_m["average"]["pk"], "windiff": pk_m["average"]["windiff"],
+        "start_f1": o["start"]["f1"], "end_f1": o["end"]["f1"],
+        "segment_f1": o["segment"]["f1"], "segment_iou": o["segment"]["iou"],
+    }
+
+
+def sweep(
+    df: pd.DataFrame,
+    embeddings: Dict[str, np.ndarray],
+    grid: Tuple[List[int], List[int], List[int], List[float]],
+    cap_segments: bool,
+    workers: int | None,
+) -> List[Dict]:
+    """Segment every transcript at every grid point and score each point."""
+    windows, passes, smoothing_windows, thresholds = grid
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(df,)) as pool:
+        meeting_ids = list(embeddings)
+        per_meeting = pool.map(
+            meeting_grid, [embeddings[m] for m in meeting_ids],
+            *(itertools.repeat(arg) for arg in (windows, passes, smoothing_windows, thresholds, cap_segments)),
+        )
+        by_point: Dict[Point, Dict[str, List[int]]] = {}
+        for meeting_id, grid_boundaries in zip(meeting_ids, per_meeting):
+            for point, boundaries in grid_boundaries.items():
+                by_point.setdefault(point, {})[meeting_id] = boundaries
+        return list(pool.map(_score_point, by_point, by_point.values()))
+
+
+def rank(rows: List[Dict], metric: str) -> List[Dict]:
+    """Best first by ``metric``; undefined values last."""
+    lower_is_better = METRICS[metric]
+
+    def key(row):
+        value = row[metric]
+        if value is None or math.isnan(value):
+            return (1, 0.0)
+        return (0, value if lower_is_better else -value)
+
+    return sorted(rows, key=key)
+
+
+def write_rows(path: str, rows: List[Dict]) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _print_table(title: str, rows: List[Dict], top: int) -> None:
+    print(f"\n{'='*104}\n{title}\n{'='*104}")
+    print(f"  {'#':>4} {'k':>3} {'pass':>4} {'s':>3} {'thr':>5} {'bounds':>7} {'Pk':>8} {'WinDiff':>8} "
+          f"{'Start F1':>9} {'End F1':>8} {'Seg F1':>8} {'Seg IoU':>8}")
+    print("  " + "-" * 100)
+    for i, r in enumerate(rows[:top], 1):
+        print(f"  {i:>4} {r['window']:>3} {r['smoothing_passes']:>4} {r['smoothing_window']:>3} "
+              f"{r['threshold']:>5.2f} {r['boundaries']:>7} {r['pk']:>8.4f} {r['windiff']:>8.4f} "
+              f"{r['start_f1']:>9.4f} {r['end_f1']:>8.4f} {r['segment_f1']:>8.4f} {r['segment_iou']:>8.4f}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("input_dirs", nargs="*", metavar="INPUT_DIR",
+                   help="Human-labeled CSV folders, one dataset each (default: every *-human folder under data/).")
+    p.add_argument("--algorithm", choices=list(_ALG_CHOICES), default="sbert",
+                   help="Encoder to sweep (default: sbert).")
+    p.add_argument("--windows", type=int, nargs="+", default=list(WINDOWS),
+                   help=f"SENTENCE_COMPARISON_WINDOW values (default: {' '.join(map(str, WINDOWS))}).")
+    p.add_argument("--smoothing-passes", type=int, nargs="+", default=list(SMOOTHING_PASSES),
+                   help=f"SMOOTHING_PASSES values (default: {' '.join(map(str, SMOOTHING_PASSES))}).")
+    p.add_argument("--smoothing-windows", type=int, nargs="+", default=list(SMOOTHING_WINDOWS),
+                   help=f"SMOOTHING_WINDOW values (default: {' '.join(map(str, SMOOTHING_WINDOWS))}).")
+    p.add_argument("--thresholds", type=float, nargs="+", default=list(THRESHOLDS),
+                   help=f"TOPIC_CHANGE_THRESHOLD values (default: {' '.join(map(str, THRESHOLDS))}).")
+    p.add_argument("--cap-segments", action="store_true",
+                   help="Cap segment count by expected average length (as run.py).")
+    p.add_argument("--rank-by", choices=list(METRICS), default="pk",
+                   help="Metric the table is ranked by (default: pk).")
+    p.add_argument("--top", type=int, default=20, help="Rows printed per dataset (default: 20).")
+    p.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU).")
+    p.add_argument("--output-dir", default=OUTPUT_DIR, help="Where to write <dataset>.csv (default: sweep-out/).")
+    p.add_argument("--embedding-cache", default=CACHE_DIR, metavar="DIR",
+                   help="On-disk embedding cache (default: embedding-cache/).")
+    p.add_argument("--no-embedding-cache", action="store_true",
+                   help="Encode every utterance without reading or writing the cache.")
+    p.add_argument("--embedding-dtype", choices=DTYPES, default="float32",
+                   help="Storage type of newly created caches (default: float32).")
+    return p
+
+
+def main(argv=None) -> None:
+    args = build_parser().parse_args(argv)
+    input_dirs = args.input_dirs or default_input_dirs()
+    if not input_dirs:
+        print(f"No *-human folders found under {DATA_ROOT}/")
+        return
+    algorithm = _ALG_CHOICES[args.algorithm]
+    grid = (sorted(set(args.windows)), sorted(set(args.smoothing_passes)),
+            sorted(set(args.smoothing_windows)), sorted(set(args.thresholds)))
+    cache = embedding_cache(algorithm, TopicSegmentationConfig(
+        EMBEDDING_CACHE_DIR=None if args.no_embedding_cache else args.embedding_cache,
+        EMBEDDING_CACHE_DTYPE=args.embedding_dtype,
+    ))
+    os.makedirs(args.output_dir, exist_ok=True)
+    print(f"Grid: {len(list(itertools.product(*grid)))} point(s) "
+          f"(windows {grid[0]}, passes {grid[1]}, smoothing windows {grid[2]}, thresholds {grid[3]})")
+
+    for input_dir in input_dirs:
+        dataset = os.path.basename(os.path.normpath(input_dir))
+        dataset = dataset[:-len("-human")] if dataset.endswith("-human") else dataset
+        df = load_directory(input_dir)
+
+        started = time.perf_counter()
+        meetings = {meeting_id: list(df.loc[df[MEETING_ID_COL] == meeting_id, CAPTION_COL].astype(str))
+                    for meeting_id in sorted(set(df[MEETING_ID_COL]))}
+        embeddings = encode_corpus(meetings, algorithm, cache)
+        encoded = time.perf_counter() - started
+
+        started = time.perf_counter()
+        rows = rank(sweep(df, embeddings, grid, args.cap_segments, args.workers), args.rank_by)
+        swept = time.perf_counter() - started
+
+        _print_table(f"{dataset}: {len(meetings)} transcript(s), {len(df)} utterances, "
+                     f"ranked by {args.rank_by}", rows, args.top)
+        print(f"\n  Encoding {encoded:.1f} s, segmenting and scoring {len(rows)} point(s) {swept:.1f} s")
+        path = os.path.join(args.output_dir, f"{dataset}.csv")
+        write_rows(path, rows)
+        print(f"  All grid points written to {path}")
+
+    if cache is not None:
+        print(f"\nEmbedding cache {cache.directory}: {cache.stats['hits']} cached, "
+              f"{cache.stats['encoded']} newly encoded unique utterance(s), {len(cache)} stored")
+
+
+if __name__ == "__main__":
+    main()